@@ -1,17 +1,21 @@
 #!/usr/bin/python
 
 # Standard imports
-import logging
-import logging.handlers
 import os
-import pytz
-from datetime import datetime
+import logging
+from decouple import config
 from pathlib import Path
 
+# Custom imports
+from psql.config.Logging import pipeline
+
+# Backend loggers share psql's queue-based pipeline (psql/config/Logging.py): callers only enqueue,
+# one writer thread does the file I/O. LOG_CONSOLE also copies backend records to stdout (docker logs).
+LOG_CONSOLE = config('LOG_CONSOLE', default=True, cast=bool)
+
 class Logger:
     def __init__(self, file_name: str):
         self.logger = logging.getLogger(file_name)
-        self.logger.setLevel(logging.DEBUG)
         
         if self.logger.handlers:
             return
@@ -23,26 +27,7 @@ class Logger:
         log_dir = Path(os.path.dirname(os.path.abspath(__file__))) / "logs"
         log_dir.mkdir(parents=True, exist_ok=True)
         
-        # Configure handlers
-        file_handler = logging.FileHandler(log_dir / f"{save_name}_logs.txt")
-        
-        # Set format and add handlers
-        eastern = pytz.timezone('America/New_York')
-        
-        # Custom formatter that uses Eastern Time
-        class EasternFormatter(logging.Formatter):
-            def formatTime(self, record, datefmt=None):
-                dt = datetime.fromtimestamp(record.created, eastern)
-                if datefmt:
-                    return dt.strftime(datefmt)
-                else:
-                    return dt.strftime('%Y-%m-%d %H:%M:%S')
-        
-        formatter = EasternFormatter("[ %(asctime)s ] - %(levelname)s - %(message)s")
-        
-        file_handler.setFormatter(formatter)
-        self.logger.addHandler(file_handler)
+        pipeline.attach(self.logger, str(log_dir / f"{save_name}_logs.txt"), console=LOG_CONSOLE)
     
     def get(self):
         return self.logger
-
@@ -1,5 +1,6 @@
 from django.apps import AppConfig
 import asyncio
+import logging
 import threading
 
 
@@ -24,7 +25,7 @@ class ApiConfig(AppConfig):
             try:
                 loop.run_until_complete(start_pg_listener())
             except Exception as e:
-                print(f"PostgreSQL Listener thread error: {e}")
+                logging.getLogger('api.consumers').error("PostgreSQL Listener thread error: %s", e)
             finally:
                 loop.close()
         
@@ -1,76 +1,556 @@
 import json
 import asyncio
+import hashlib
+import itertools
+import time
+from collections import Counter, deque
+from urllib.parse import parse_qs
 import psycopg2
 import psycopg2.extensions
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.layers import get_channel_layer
 from asgiref.sync import sync_to_async
 from decouple import config
+from psql import asyncPsqlManager
+from psql.cache import profileCache, roleCache
+import Logging
+
+logger = Logging.Logger(__name__).get()
+
+# Tables clients may subscribe to, and the row fields they may subscribe by (first is the default)
+SUBSCRIPTION_KEYS = {
+    'profiles': ('unique_identifier', 'email'),
+    'registrations': ('unique_identifier', 'email'),
+    'roles': ('id', 'name'),
+}
+OPERATIONS = ('INSERT', 'UPDATE', 'DELETE')
+
+# Consumer-side coalescing: changes to the same row within the window are merged and flushed as
+# batches every WS_COALESCE_WINDOW_MS or once WS_COALESCE_MAX_EVENTS rows are pending (0 ms: off)
+COALESCE_WINDOW = config('WS_COALESCE_WINDOW_MS', default=0, cast=int) / 1000
+COALESCE_MAX_EVENTS = config('WS_COALESCE_MAX_EVENTS', default=100, cast=int)
+
+# Backpressure: frames waiting for one client are capped at WS_QUEUE_MAX_MESSAGES, and those of
+# every client in the process at WS_PENDING_BUDGET_MB. When full, WS_QUEUE_POLICY decides:
+#   drop_oldest - drop the oldest change frames and tell the client to resync those tables
+#   coalesce    - merge further changes per row until the queue drains (WS_QUEUE_MAX_PENDING_ROWS)
+#   disconnect  - close with SLOW_CLIENT_CLOSE_CODE; the client reconnects with resume_from
+# daphne's send() returns as soon as the frame is handed to Twisted, which buffers without limit, so
+# a frame only stops counting once the client acknowledges it ({"type": "ack", "frames": <received>}).
+# At most WS_ACK_WINDOW frames are sent ahead of the client's acks, the rest wait in the queue and
+# count towards both caps until acked (0 turns acks off: the queue then drains straight into daphne).
+ACK_WINDOW = config('WS_ACK_WINDOW', default=32, cast=int)
+# Seconds a sent frame may go unacknowledged before the client is closed as too slow (0: no limit)
+ACK_TIMEOUT = config('WS_ACK_TIMEOUT', default=10.0, cast=float)
+QUEUE_MAX_MESSAGES = config('WS_QUEUE_MAX_MESSAGES', default=100, cast=int)
+QUEUE_POLICY = config('WS_QUEUE_POLICY', default='drop_oldest')
+QUEUE_MAX_PENDING_ROWS = config('WS_QUEUE_MAX_PENDING_ROWS', default=10000, cast=int)
+PENDING_BUDGET = config('WS_PENDING_BUDGET_MB', default=64.0, cast=float) * 1024 * 1024
+SLOW_CLIENT_CLOSE_CODE = 4001
+
+# The listener attaches per-row keys and rows to events whenever a consumer may need to merge them
+CARRY_ROWS = bool(COALESCE_WINDOW) or QUEUE_POLICY == 'coalesce'
+
+# Change log: how many rows one subscription may replay on resume before a full resync is asked
+# for instead, how long entries are kept and how often the listener prunes them
+MAX_REPLAY = config('WS_MAX_REPLAY', default=1000, cast=int)
+CHANGE_LOG_RETENTION = config('CHANGE_LOG_RETENTION_HOURS', default=24.0, cast=float) * 3600
+CHANGE_LOG_PRUNE_INTERVAL = config('CHANGE_LOG_PRUNE_INTERVAL', default=3600.0, cast=float)
+
+# Advisory lock held by the one listener that fans out when several processes share a channel layer
+FANOUT_LOCK_ID = 815_001
+
+# group_send calls the listener keeps in flight at once (each may hold a pool connection), and how
+# many sends go into one group_send_many with layers that have it (PostgresChannelLayer)
+FANOUT_CONCURRENCY = config('WS_FANOUT_CONCURRENCY', default=8, cast=int)
+FANOUT_BATCH = 500
+
+# Above this many changed profiles in one event the profile cache is cleared instead
+PROFILE_INVALIDATION_LIMIT = 1000
+
+
+def table_group(table):
+    return f"db_changes.{table}"
+
+
+def key_group(table, field, value):
+    # Group names only allow ASCII letters, digits, hyphens, underscores and periods
+    digest = hashlib.sha1(f"{field}:{value}".encode()).hexdigest()
+    return f"db_changes.{table}.{digest}"
+
+
+def is_visible(row):
+    """The trigger marks UPDATE rows where only excluded columns (a password) changed."""
+    return not (row and row.get("_excluded"))
+
+
+class SendBudget:
+    """Bytes queued for every WebSocket client of this process; consumers all run on one loop."""
+    
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.connections = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.disconnects = 0
+    
+    def fits(self, size):
+        return self.used + size <= self.limit
+    
+    def getStats(self):
+        return {
+            'connections': self.connections,
+            'pending_bytes': self.used,
+            'budget_bytes': self.limit,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'disconnects': self.disconnects
+        }
+
+
+send_budget = SendBudget(PENDING_BUDGET)
+
+
+def get_send_stats():
+    return send_budget.getStats()
+
+
+# Groups joined by this process's consumers, and by how many of them. With a process-local layer the
+# listener skips every group nobody joined; cross-process layers answer that themselves (active_groups).
+joined_groups = Counter()
+
+
+def count_groups(added, removed):
+    joined_groups.update(added)
+    joined_groups.subtract(removed)
+    for group in removed:
+        if joined_groups[group] <= 0:
+            del joined_groups[group]
+
+
+def change_frame(table, operation, row_texts):
+    """WebSocket frame for already-encoded rows: db_change for one row, db_change_batch for more."""
+    if len(row_texts) == 1:
+        message_type, data = "db_change", row_texts[0]
+    else:
+        message_type, data = "db_change_batch", "[" + ",".join(row_texts) + "]"
+    text = f'{{"type":"{message_type}","table":{json.dumps(table)},"operation":{json.dumps(operation)},"data":{data}}}'
+    return message_type, text
 
 
 class DatabaseChangesConsumer(AsyncWebsocketConsumer):
     """WebSocket consumer that sends database change notifications to clients."""
     
     async def connect(self):
-        print(f"WebSocket: Connection attempt from {self.scope.get('client', 'unknown')}")
-        self.group_name = "db_changes"
+        logger.debug("WebSocket: Connection attempt from %s", self.scope.get('client', 'unknown'))
+        # table -> {'operations': set, 'keys': set of (field, value), or None for the whole table}
+        self.subscriptions = {}
+        self.groups = set()
+        # (table, row id) -> (operation, encoded row), flushed by _flush
+        self.pending = {}
+        self.flush_task = None
+        self.unkeyed = itertools.count()
+        # (text, size, table, droppable) waiting for _writer, and the tables it had to drop frames of
+        self.outbox = deque()
+        # (size, sent at) of the frames sent but not yet acknowledged by the client, oldest first
+        self.unacked = deque()
+        self.frames_sent = 0
+        self.frames_acked = 0
+        self.outbox_ready = asyncio.Event()
+        self.dropped_tables = set()
+        self.closing = False
+        self.writer_task = None
+        self.stats = {'queued': 0, 'sent': 0, 'acked': 0, 'dropped': 0, 'coalesced': 0, 'max_depth': 0}
+        # ws/changes/?resume_from=<last _seq seen>: subscriptions replay what was missed
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        resume_from = query.get('resume_from', [None])[0]
+        self.resume_from = int(resume_from) if resume_from and resume_from.isdigit() else None
         
         try:
             await self.accept()
-            print("WebSocket: Connection accepted")
+            logger.debug("WebSocket: Connection accepted")
+            send_budget.connections += 1
+            self.writer_task = asyncio.create_task(self._writer())
             
-            # Add to group after accepting
-            if self.channel_layer:
-                await self.channel_layer.group_add(
-                    self.group_name,
-                    self.channel_name
-                )
-                print("WebSocket: Added to group")
-            
-            # Send confirmation message
-            await self.send(text_data=json.dumps({
+            # Nothing is delivered until the client subscribes
+            self._send_json({
                 'type': 'connection_established',
                 'message': 'Connected to real-time updates'
-            }))
-            print("WebSocket: Confirmation sent")
+            })
+            logger.debug("WebSocket: Confirmation sent")
             
         except Exception as e:
-            print(f"WebSocket: Error in connect - {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("WebSocket: Error in connect - %s", e)
     
     async def disconnect(self, close_code):
-        print(f"WebSocket: Disconnected with code {close_code}")
+        logger.info("WebSocket: Disconnected with code %s", close_code)
+        if getattr(self, 'flush_task', None):
+            self.flush_task.cancel()
+        if getattr(self, 'writer_task', None):
+            self.writer_task.cancel()
+            send_budget.connections -= 1
+            send_budget.used -= sum(entry[1] for entry in self.outbox) + sum(entry[0] for entry in self.unacked)
+            self.outbox.clear()
+            self.unacked.clear()
+            logger.debug("WebSocket: Send stats %s", self.stats)
+        count_groups((), getattr(self, 'groups', ()))
         try:
-            if self.channel_layer and hasattr(self, 'group_name'):
-                await self.channel_layer.group_discard(
-                    self.group_name,
-                    self.channel_name
-                )
+            if self.channel_layer:
+                for group in getattr(self, 'groups', ()):
+                    await self.channel_layer.group_discard(group, self.channel_name)
         except Exception as e:
-            print(f"WebSocket: Error in disconnect - {e}")
+            logger.error("WebSocket: Error in disconnect - %s", e)
     
     async def receive(self, text_data):
         """Handle incoming messages from WebSocket."""
         try:
             data = json.loads(text_data)
-            print(f"WebSocket: Received message - {data}")
-            if data.get('type') == 'ping':
-                await self.send(text_data=json.dumps({'type': 'pong'}))
+            logger.debug("WebSocket: Received message - %s", data)
+            message_type = data.get('type')
+            if message_type == 'ack':
+                self._ack(data.get('frames'))
+            elif message_type == 'ping':
+                self._send_json({'type': 'pong'})
+            elif message_type == 'subscribe':
+                await self.subscribe(data)
+            elif message_type == 'unsubscribe':
+                await self.unsubscribe(data)
         except Exception as e:
-            print(f"WebSocket: Error in receive - {e}")
+            logger.error("WebSocket: Error in receive - %s", e)
+    
+    ################################################ SUBSCRIPTIONS ################################################
+    
+    async def subscribe(self, data):
+        """
+        {"type": "subscribe", "table": "profiles", "operations": ["UPDATE"], "key_field": "email", "key": "..."}
+        operations defaults to all of them; without a key the whole table is subscribed.
+        """
+        table = data.get('table')
+        if table not in SUBSCRIPTION_KEYS:
+            return self._reject(data, f'Unknown table {table}')
+        
+        operations = data.get('operations') or OPERATIONS
+        if not set(operations) <= set(OPERATIONS):
+            return self._reject(data, f'Unknown operations {operations}')
+        
+        key = data.get('key')
+        key_field = data.get('key_field') or SUBSCRIPTION_KEYS[table][0]
+        if key is not None and key_field not in SUBSCRIPTION_KEYS[table]:
+            return self._reject(data, f'Cannot subscribe to {table} by {key_field}')
+        
+        subscription = self.subscriptions.setdefault(table, {'operations': set(), 'keys': set()})
+        subscription['operations'].update(operations)
+        if key is None:
+            subscription['keys'] = None
+        elif subscription['keys'] is not None:
+            subscription['keys'].add((key_field, str(key)))
+        
+        await self._sync_groups()
+        
+        resume_from = data.get('resume_from', self.resume_from)
+        if resume_from is None:
+            # Position to resume from should the connection drop before the first change arrives
+            self._send_json({'type': 'subscribed', 'table': table, 'last_seq': await self._latest_seq()})
+        else:
+            self._send_json({'type': 'subscribed', 'table': table})
+            keys = None if key is None else {(key_field, str(key))}
+            await self._replay(table, operations, keys, int(resume_from))
+    
+    async def unsubscribe(self, data):
+        """Same shape as subscribe; drops the key, the operations, or the whole table."""
+        table = data.get('table')
+        subscription = self.subscriptions.get(table)
+        if subscription is not None:
+            key = data.get('key')
+            if key is not None:
+                if subscription['keys'] is not None:
+                    key_field = data.get('key_field') or SUBSCRIPTION_KEYS[table][0]
+                    subscription['keys'].discard((key_field, str(key)))
+                    if not subscription['keys']:
+                        del self.subscriptions[table]
+            elif data.get('operations'):
+                subscription['operations'].difference_update(data['operations'])
+                if not subscription['operations']:
+                    del self.subscriptions[table]
+            else:
+                del self.subscriptions[table]
+        
+        await self._sync_groups()
+        self._send_json({'type': 'unsubscribed', 'table': table})
+    
+    async def _sync_groups(self):
+        """Join and leave channel layer groups to match the current subscriptions."""
+        wanted = set()
+        for table, subscription in self.subscriptions.items():
+            if subscription['keys'] is None:
+                wanted.add(table_group(table))
+            else:
+                wanted.update(key_group(table, field, value) for field, value in subscription['keys'])
+        
+        added, removed = wanted - self.groups, self.groups - wanted
+        if self.channel_layer:
+            for group in added:
+                await self.channel_layer.group_add(group, self.channel_name)
+            for group in removed:
+                await self.channel_layer.group_discard(group, self.channel_name)
+        count_groups(added, removed)
+        self.groups = wanted
+    
+    async def _latest_seq(self):
+        try:
+            async with asyncPsqlManager.Manager(__name__) as manager:
+                return await manager.getLatestChangeSeq()
+        except Exception as e:
+            logger.warning("WebSocket: Error reading the change log position - %s", e)
+            return None
+    
+    async def _replay(self, table, operations, keys, after_seq):
+        """Send the logged changes after after_seq; live events queue behind this, so nothing is lost."""
+        try:
+            async with asyncPsqlManager.Manager(__name__) as manager:
+                oldest = await manager.getOldestChangeSeq()
+                changes = [] if after_seq + 1 < oldest else await manager.getChangesSince(table, operations, after_seq, MAX_REPLAY + 1)
+        except Exception as e:
+            logger.error("WebSocket: Error in replay - %s", e)
+            changes, oldest = None, None
+        
+        if changes is None or after_seq + 1 < oldest or len(changes) > MAX_REPLAY:
+            # Pruned past the client's position, too far behind, or the log is unavailable
+            self._send_json({'type': 'resync_required', 'table': table})
+            return
+        
+        # Consecutive changes with the same operation go out as one frame
+        frames = []
+        for seq, operation, row_text in changes:
+            row = json.loads(row_text)
+            if not is_visible(row):
+                continue
+            if keys is not None and not any(str(row.get(field)) == value for field, value in keys):
+                continue
+            if frames and frames[-1][0] == operation:
+                frames[-1][1].append(row_text)
+            else:
+                frames.append((operation, [row_text]))
+        
+        for operation, row_texts in frames:
+            _, text = change_frame(table, operation, row_texts)
+            self._enqueue(text, table)
+        
+        # Repeated changes from below after_seq can make up the whole replay
+        last_seq = max(changes[-1][0], after_seq) if changes else after_seq
+        self._send_json({'type': 'replay_complete', 'table': table, 'last_seq': last_seq})
+    
+    def _reject(self, data, error):
+        self._send_json({'type': 'subscription_error', 'table': data.get('table'), 'error': error})
+    
+    def _wants(self, event):
+        subscription = self.subscriptions.get(event.get('table'))
+        return subscription is not None and event.get('operation') in subscription['operations']
+    
+    ################################################ EVENTS ################################################
     
     async def db_change(self, event):
         """Handle database change events and send to WebSocket."""
+        await self._forward(event)
+    
+    async def db_change_batch(self, event):
+        """Handle a statement's worth of changes as a single WebSocket message."""
+        await self._forward(event)
+    
+    async def _forward(self, event):
+        if not self._wants(event):
+            return
+        # The listener serialized the frame once for every subscriber
+        text = event.get('text') or json.dumps({
+            'type': event.get('type'),
+            'table': event.get('table'),
+            'operation': event.get('operation'),
+            'data': event.get('data')
+        })
+        # While merged rows are pending, newer changes merge into them too: sent on their own they
+        # would go out ahead of the older pending values, which would then overwrite them
+        if 'rows' in event and (COALESCE_WINDOW or self.pending or (QUEUE_POLICY == 'coalesce' and not self._has_room(len(text)))):
+            self._coalesce(event)
+            return
+        self._enqueue(text, event.get('table'))
+    
+    ################################################ OUTBOX ################################################
+    
+    def _send_json(self, message):
+        # Control frames are small and never dropped, only change frames are
+        self._enqueue(json.dumps(message), droppable=False)
+    
+    def _depth(self):
+        # Frames the client has not processed yet: queued here, or sent and not acknowledged
+        return len(self.outbox) + len(self.unacked)
+    
+    def _has_room(self, size):
+        return self._depth() < QUEUE_MAX_MESSAGES and send_budget.fits(size)
+    
+    def _enqueue(self, text, table=None, droppable=True):
+        """Queue a frame for _writer; when the outbox is full QUEUE_POLICY decides what gives."""
+        if self.closing:
+            return
+        size = len(text)
+        if droppable and not self._has_room(size):
+            if QUEUE_POLICY != 'drop_oldest':
+                # coalesce only gets here for frames it cannot merge
+                self._close_slow()
+                return
+            while not self._has_room(size) and self._drop_oldest():
+                pass
+            if not self._has_room(size):
+                # Other clients hold the budget: this frame goes instead
+                self._count_drop(table)
+                return
+        
+        self.outbox.append((text, size, table, droppable))
+        send_budget.used += size
+        self.stats['queued'] += 1
+        self.stats['max_depth'] = max(self.stats['max_depth'], self._depth())
+        self.outbox_ready.set()
+    
+    def _drop_oldest(self):
+        for index, entry in enumerate(self.outbox):
+            if entry[3]:
+                del self.outbox[index]
+                send_budget.used -= entry[1]
+                self._count_drop(entry[2])
+                return True
+        return False
+    
+    def _count_drop(self, table):
+        self.stats['dropped'] += 1
+        send_budget.dropped += 1
+        if table:
+            self.dropped_tables.add(table)
+    
+    def _close_slow(self):
+        if self.closing:
+            return
+        self.closing = True
+        send_budget.disconnects += 1
+        # The hint goes out next, nothing queued after it
+        self.outbox_ready.set()
+        logger.warning("WebSocket: Slow client, closing with %d frames unprocessed - %s", self._depth(), self.stats)
+        asyncio.create_task(self._close_with_hint())
+    
+    async def _close_with_hint(self):
+        # Skips the queue: tell the client why, then close so it reconnects with resume_from
         try:
-            await self.send(text_data=json.dumps({
-                'type': 'db_change',
-                'table': event.get('table'),
-                'operation': event.get('operation'),
-                'data': event.get('data')
-            }))
-        except Exception as e:
-            print(f"WebSocket: Error in db_change - {e}")
+            await self.send(text_data=json.dumps({'type': 'slow_client', 'resume': True}))
+        except Exception:
+            pass
+        await self.close(code=SLOW_CLIENT_CLOSE_CODE)
+    
+    def _ack(self, frames):
+        """The client has processed its first `frames` frames: they no longer count against it."""
+        if not isinstance(frames, int):
+            return
+        acked = min(frames, self.frames_sent) - self.frames_acked
+        if acked <= 0 or not self.unacked:
+            return
+        for _ in range(min(acked, len(self.unacked))):
+            send_budget.used -= self.unacked.popleft()[0]
+        self.frames_acked += acked
+        self.stats['acked'] += acked
+        self.outbox_ready.set()
+    
+    def _ack_deadline(self):
+        # Seconds until the oldest unacknowledged frame times out, None when nothing is waiting on one
+        if not ACK_TIMEOUT or not self.unacked:
+            return None
+        return max(self.unacked[0][1] + ACK_TIMEOUT - time.monotonic(), 0)
+    
+    async def _writer(self):
+        """Sends the outbox in order, one frame at a time, at most ACK_WINDOW frames ahead of the client."""
+        while not self.closing:
+            if not self.outbox:
+                if self.dropped_tables:
+                    # The client missed changes to these tables and has to reload them
+                    for table in sorted(self.dropped_tables):
+                        self._send_json({'type': 'resync_required', 'table': table})
+                    self.dropped_tables.clear()
+                elif self.pending and self.flush_task is None and self._has_room(0):
+                    # Changes merged while the client was behind
+                    self._flush()
+            if not self.outbox or (ACK_WINDOW and len(self.unacked) >= ACK_WINDOW):
+                # Nothing to send, or waiting for the client to acknowledge what it has
+                self.outbox_ready.clear()
+                try:
+                    await asyncio.wait_for(self.outbox_ready.wait(), self._ack_deadline())
+                except asyncio.TimeoutError:
+                    logger.warning("WebSocket: No ack for %ss", ACK_TIMEOUT)
+                    self._close_slow()
+                    return
+                continue
+            
+            text, size, table, _ = self.outbox.popleft()
+            if ACK_WINDOW:
+                self.unacked.append((size, time.monotonic()))
+            else:
+                send_budget.used -= size
+            self.frames_sent += 1
+            try:
+                await self.send(text_data=text)
+                self.stats['sent'] += 1
+            except Exception as e:
+                logger.error("WebSocket: Error sending %s - %s", table or 'message', e)
+    
+    ################################################ COALESCING ################################################
+    
+    def _coalesce(self, event):
+        """Merge changes per row: later values win, a DELETE is never overwritten."""
+        table = event['table']
+        operation = event['operation']
+        for key, row_text in zip(event['keys'].split(','), event['rows'].split('\n')):
+            pending_key = (table, key) if key else (table, f"unkeyed-{next(self.unkeyed)}")
+            merged = operation
+            previous = self.pending.get(pending_key)
+            if previous is not None:
+                self.stats['coalesced'] += 1
+                send_budget.coalesced += 1
+                if previous[0] == 'DELETE':
+                    continue
+                if operation == 'UPDATE':
+                    # UPDATE rows only carry the changed columns: apply them on top of what is pending.
+                    # The client never saw a pending INSERT, so it stays an insert with the latest values.
+                    merged = previous[0]
+                    row = {**json.loads(previous[1]), **json.loads(row_text)}
+                    row_text = json.dumps(row)
+            self.pending[pending_key] = (merged, row_text)
+        
+        if QUEUE_POLICY == 'coalesce' and not self._has_room(0):
+            # The client is behind: keep merging, _writer flushes once the outbox drains
+            if len(self.pending) > QUEUE_MAX_PENDING_ROWS:
+                self._close_slow()
+        elif not COALESCE_WINDOW or len(self.pending) >= COALESCE_MAX_EVENTS:
+            self._flush()
+        elif self.flush_task is None:
+            self.flush_task = asyncio.create_task(self._flush_later())
+    
+    async def _flush_later(self):
+        await asyncio.sleep(COALESCE_WINDOW)
+        self.flush_task = None
+        if QUEUE_POLICY == 'coalesce' and not self._has_room(0):
+            return
+        self._flush()
+    
+    def _flush(self):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        pending, self.pending = self.pending, {}
+        
+        # One frame per table and operation, rows in the order they first changed
+        grouped = {}
+        for (table, _), (operation, row_text) in pending.items():
+            grouped.setdefault((table, operation), []).append(row_text)
+        for (table, operation), row_texts in grouped.items():
+            _, text = change_frame(table, operation, row_texts)
+            # Under the coalesce policy merged frames are what is left to send: never drop them
+            self._enqueue(text, table, droppable=QUEUE_POLICY != 'coalesce')
 
 
 class PostgreSQLListener:
@@ -81,6 +561,18 @@ class PostgreSQLListener:
     def __init__(self):
         self.conn = None
         self.running = False
+        self.loop = None
+        self.leader = False
+        self._fd = None
+        self._readable = None
+        self._error = None
+        self._send_slots = asyncio.Semaphore(FANOUT_CONCURRENCY)
+        
+        self.connects = 0
+        self.notifications = 0
+        self.events = 0
+        self.rows = 0
+        self.send_failures = 0
     
     def get_connection(self):
         """Create a new PostgreSQL connection for LISTEN."""
@@ -96,6 +588,8 @@ class PostgreSQLListener:
     async def start(self):
         """Start listening for PostgreSQL notifications."""
         self.running = True
+        self.loop = asyncio.get_running_loop()
+        self._readable = asyncio.Event()
         
         # Wait a bit for Django to fully initialize
         await asyncio.sleep(2)
@@ -103,63 +597,265 @@ class PostgreSQLListener:
         channel_layer = get_channel_layer()
         
         if channel_layer is None:
-            print("PostgreSQL Listener: No channel layer available")
+            logger.warning("PostgreSQL Listener: No channel layer available")
             return
         
-        print("PostgreSQL Listener: Starting...")
+        logger.info("PostgreSQL Listener: Starting...")
+        prune_task = self.loop.create_task(self._prune_change_log())
         
         while self.running:
             try:
                 self.conn = await sync_to_async(self.get_connection)()
                 cursor = self.conn.cursor()
                 await sync_to_async(cursor.execute)("LISTEN db_changes;")
-                print("PostgreSQL Listener: Listening for db_changes")
+                logger.info("PostgreSQL Listener: Listening for db_changes")
+                self.connects += 1
+                
+                # Caches can trust NOTIFY-driven invalidation from here on; warm them up
+                roleCache.cache.setListening(True)
+                profileCache.cache.setListening(True)
+                await self._warm_caches()
+                
+                # With a cross-process channel layer every process listens (for its caches) but
+                # only the holder of the advisory lock fans out, or clients would get each change once per process
+                shared_layer = getattr(channel_layer, "cross_process", False)
+                self.leader = False
+                
+                # The loop watches the socket itself: no worker thread, no wake-ups while idle
+                self._watch()
                 
                 while self.running:
-                    await sync_to_async(self._wait_for_notify)()
+                    await self._readable.wait()
+                    self._readable.clear()
+                    if self._error is not None:
+                        raise self._error
+                    
+                    if not self.leader:
+                        self.leader = not shared_layer or self._try_lead()
                     
-                    while self.conn.notifies:
-                        notify = self.conn.notifies.pop(0)
-                        print(f"PostgreSQL Listener: Notification - {notify.payload[:100]}...")
-                        
-                        try:
-                            payload = json.loads(notify.payload)
-                            await channel_layer.group_send(
-                                "db_changes",
-                                {
-                                    "type": "db_change",
-                                    "table": payload.get("table"),
-                                    "operation": payload.get("operation"),
-                                    "data": payload.get("data")
-                                }
-                            )
-                        except json.JSONDecodeError as e:
-                            print(f"PostgreSQL Listener: Invalid JSON - {e}")
+                    # Drain everything poll() collected; one statement's chunks arrive together
+                    notifies = self.conn.notifies[:]
+                    del self.conn.notifies[:]
+                    
+                    for event in self._build_events(notifies):
+                        self._invalidate_caches(event["table"], event["rows"])
+                        if self.leader:
+                            try:
+                                await self._fan_out(channel_layer, event)
+                            except Exception as e:
+                                # The LISTEN connection is fine; the rest of the batch still goes out
+                                self.send_failures += 1
+                                logger.error("PostgreSQL Listener: Fan-out of %s %s failed - %s", event["operation"], event["table"], e)
                             
             except Exception as e:
-                print(f"PostgreSQL Listener: Error - {e}")
-                if self.conn:
-                    try:
-                        self.conn.close()
-                    except:
-                        pass
-                await asyncio.sleep(5)
-    
-    def _wait_for_notify(self):
-        """Wait for notification with timeout."""
-        import select
-        if self.conn:
-            select.select([self.conn], [], [], 1.0)
+                logger.error("PostgreSQL Listener: Error - %s", e)
+                roleCache.cache.setListening(False)
+                profileCache.cache.setListening(False)
+                self._unwatch()
+                self._close()
+                if self.running:
+                    await asyncio.sleep(5)
+        
+        prune_task.cancel()
+        self._unwatch()
+        self._close()
+    
+    async def _prune_change_log(self):
+        """Drop change log entries past the retention horizon; clients older than that resync."""
+        while True:
+            await asyncio.sleep(CHANGE_LOG_PRUNE_INTERVAL)
+            if not self.leader:
+                continue
+            try:
+                async with asyncPsqlManager.Manager(__name__) as manager:
+                    await manager.pruneChangeLog(CHANGE_LOG_RETENTION)
+            except Exception as e:
+                logger.warning("PostgreSQL Listener: Change log pruning failed - %s", e)
+    
+    async def _warm_caches(self):
+        """Load the in-process caches so the first requests do not pay for it."""
+        try:
+            async with asyncPsqlManager.Manager(__name__) as manager:
+                await manager.refreshRoles()
+        except Exception as e:
+            logger.warning("PostgreSQL Listener: Cache warm-up failed - %s", e)
+    
+    def _build_events(self, notifies):
+        """Parse notifications and merge consecutive chunks of the same table and operation."""
+        events = []
+        self.notifications += len(notifies)
+        for notify in notifies:
+            try:
+                payload = json.loads(notify.payload)
+            except json.JSONDecodeError as e:
+                logger.warning("PostgreSQL Listener: Invalid JSON - %s", e)
+                continue
+            
+            data = payload.get("data")
+            rows = data if payload.get("batch") else [data]
+            table = payload.get("table")
+            operation = payload.get("operation")
+            
+            if events and events[-1]["table"] == table and events[-1]["operation"] == operation:
+                events[-1]["rows"].extend(rows)
+            else:
+                events.append({"table": table, "operation": operation, "rows": rows})
+        return events
+    
+    async def _fan_out(self, channel_layer, event):
+        """Send to the table's subscribers, then each row to the subscribers of its keys."""
+        table = event["table"]
+        operation = event["operation"]
+        rows = event["rows"]
+        # Nothing for clients to see when only excluded columns changed; the caches were invalidated above
+        rows = [row for row in rows if is_visible(row)]
+        if not rows:
+            return
+        self.events += 1
+        self.rows += len(rows)
+        row_texts = [json.dumps(row) for row in rows]
+        
+        # Key groups of every row; only those someone joined get a message, so a bulk statement
+        # costs one send per subscribed key rather than one per row and key field
+        key_fields = SUBSCRIPTION_KEYS.get(table, ())
+        row_groups = [
+            [key_group(table, field, row[field]) for field in key_fields if row.get(field) is not None] if row else []
+            for row in rows
+        ]
+        joined = await self._joined(channel_layer, {table_group(table)}.union(*row_groups))
+        
+        table_message = self._to_message(table, operation, rows, row_texts)
+        sends = [(table_group(table), table_message)] if table_group(table) in joined else []
+        
+        single = len(rows) == 1
+        for row, row_text, groups in zip(rows, row_texts, row_groups):
+            groups = [group for group in groups if group in joined]
+            if not groups:
+                continue
+            # Shared by every key group of this row
+            message = table_message if single else self._to_message(table, operation, [row], [row_text])
+            sends.extend((group, message) for group in groups)
+        
+        await self._send(channel_layer, sends)
+    
+    async def _send(self, channel_layer, sends):
+        """group_send each (group, message), FANOUT_CONCURRENCY at a time; failures are logged, not raised."""
+        group_send_many = getattr(channel_layer, "group_send_many", None)
+        if group_send_many is not None:
+            # A database round trip per batch rather than per group
+            calls = [group_send_many(sends[i:i + FANOUT_BATCH]) for i in range(0, len(sends), FANOUT_BATCH)]
+        else:
+            calls = [channel_layer.group_send(group, message) for group, message in sends]
+        
+        async def send(call):
+            async with self._send_slots:
+                await call
+        
+        results = await asyncio.gather(*(send(call) for call in calls), return_exceptions=True)
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            self.send_failures += len(failures)
+            logger.error("PostgreSQL Listener: %d of %d group sends failed - %s", len(failures), len(calls), failures[0])
+    
+    async def _joined(self, channel_layer, groups):
+        """The groups among these that have members."""
+        if not getattr(channel_layer, "cross_process", False):
+            return {group for group in groups if group in joined_groups}
+        active_groups = getattr(channel_layer, "active_groups", None)
+        if active_groups is None:
+            return groups
+        return await active_groups(groups)
+    
+    def _to_message(self, table, operation, rows, row_texts):
+        """
+        Channel layer event carrying the WebSocket frame already encoded. Only strs travel
+        through the layer, so there is nothing to copy or re-encode per subscriber.
+        """
+        message_type, text = change_frame(table, operation, row_texts)
+        message = {"type": message_type, "table": table, "operation": operation, "text": text}
+        if CARRY_ROWS:
+            # Row ids and encoded rows, for consumers merging changes per row
+            message["keys"] = ",".join("" if not row or row.get("id") is None else str(row["id"]) for row in rows)
+            message["rows"] = "\n".join(row_texts)
+        return message
+    
+    def _invalidate_caches(self, table, rows):
+        """Drop in-process cache entries made stale by a change notification."""
+        if table == "roles":
+            roleCache.cache.invalidate()
+        elif table == "profiles":
+            if len(rows) > PROFILE_INVALIDATION_LIMIT:
+                # Cheaper to start over than to evict entry by entry
+                profileCache.cache.clear()
+                return
+            for data in rows:
+                data = data or {}
+                if not data.get("unique_identifier") and not data.get("email"):
+                    # Oversized row reduced to its id by the trigger
+                    profileCache.cache.clear()
+                    return
+                profileCache.cache.invalidate(data.get("unique_identifier"), data.get("email"))
+    
+    def _try_lead(self):
+        """Take the fan-out advisory lock; it is released when this connection closes."""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", (FANOUT_LOCK_ID,))
+        leader = cursor.fetchone()[0]
+        if leader:
+            logger.info("PostgreSQL Listener: Fanning out changes for all processes")
+        return leader
+    
+    def _watch(self):
+        """Register the LISTEN socket with the event loop."""
+        self._error = None
+        self._fd = self.conn.fileno()
+        self.loop.add_reader(self._fd, self._on_readable)
+        # Notifications may already have been read along with the LISTEN reply
+        self._readable.set()
+    
+    def _unwatch(self):
+        if self._fd is not None:
+            self.loop.remove_reader(self._fd)
+            self._fd = None
+    
+    def _on_readable(self):
+        """Event loop callback: consume whatever the server sent without blocking."""
+        try:
             self.conn.poll()
+        except Exception as e:
+            # Connection lost; stop watching the dead socket and let start() reconnect
+            self._error = e
+            self._unwatch()
+        self._readable.set()
     
-    def stop(self):
-        """Stop the listener."""
-        self.running = False
+    def _close(self):
         if self.conn:
             try:
                 self.conn.close()
             except:
                 pass
+            self.conn = None
+    
+    def getStats(self):
+        return {
+            'running': self.running,
+            'connected': self.conn is not None,
+            'leader': self.leader,
+            'connects': self.connects,
+            'notifications': self.notifications,
+            'events': self.events,
+            'rows': self.rows,
+            'send_failures': self.send_failures
+        }
+    
+    def stop(self):
+        """Stop the listener; safe to call from any thread."""
+        self.running = False
+        roleCache.cache.setListening(False)
+        profileCache.cache.setListening(False)
+        if self.loop is not None and not self.loop.is_closed():
+            # start() closes the connection once it wakes up
+            self.loop.call_soon_threadsafe(self._readable.set)
 
 
 pg_listener = PostgreSQLListener()
@@ -170,4 +866,4 @@ async def start_pg_listener():
     try:
         await pg_listener.start()
     except Exception as e:
-        print(f"PostgreSQL Listener: Failed to start - {e}")
+        logger.error("PostgreSQL Listener: Failed to start - %s", e)
@@ -1,5 +1,5 @@
 from django.urls import path
-from api.views import auth_views, admin_views
+from api.views import auth_views, admin_views, metrics_views
 
 urlpatterns = [
     path('login/', auth_views.login_view, name='login'),
@@ -15,5 +15,8 @@ urlpatterns = [
     
     path('admin/registrations/', admin_views.admin_registrations_view, name='admin_registrations'),
     path('admin/users/', admin_views.admin_users_view, name='admin_users'),
+    path('admin/users/export/', admin_views.admin_users_export, name='admin_users_export'),
     path('admin/users/<str:action>/', admin_views.admin_user_action, name='admin_user_action'),
+    
+    path('metrics/', metrics_views.metrics_view, name='metrics'),
 ]
@@ -1,15 +1,29 @@
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from core.decorators import admin_group_required
+from psql import asyncPsqlManager
 import json
 
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Admin user actions map to a profile status; 'delete' is a soft delete, like delete_account
+USER_ACTION_STATUSES = {
+    'delete': 'deleted',
+    'activate': 'active',
+    'deactivate': 'inactive',
+}
+
+
 @admin_group_required
 @require_http_methods(["GET"])
-def admin_registrations_view(request):
+async def admin_registrations_view(request):
     try:
         # manager = request.db_manager
-        # registrations = manager.getInactiveRegistrations()
+        # registrations = await manager.getInactiveRegistrations()
         
         return JsonResponse([], safe=False)
     except Exception as e:
@@ -18,31 +32,53 @@ def admin_registrations_view(request):
 
 @admin_group_required
 @require_http_methods(["GET"])
-def admin_users_view(request):
+async def admin_users_view(request):
     try:
         # manager = request.db_manager
-        # users = manager.getActiveProfiles()
+        # users = await manager.getActiveProfiles()
         
         return JsonResponse([], safe=False)
     except Exception as e:
         return JsonResponse({'error': 'Failed to fetch users'}, status=500)
 
 
+async def _stream_profiles(format):
+    # The decorator's manager is closed once the view returns, so the stream holds its own connection
+    async with asyncPsqlManager.Manager(__name__) as manager:
+        async for chunk in manager.streamProfiles(format):
+            yield chunk
+
+
+@admin_group_required
+@require_http_methods(["GET"])
+async def admin_users_export(request):
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_CONTENT_TYPES:
+        return JsonResponse({'error': f'Unsupported format {export_format}'}, status=400)
+
+    # COPY TO STDOUT chunks go straight to the client, no rows are built in Python
+    response = StreamingHttpResponse(_stream_profiles(export_format), content_type=EXPORT_CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="profiles.{export_format}"'
+    return response
+
+
 @admin_group_required
 @csrf_exempt
 @require_http_methods(["POST"])
-def admin_user_action(request, action):
+async def admin_user_action(request, action):
     try:
         data = json.loads(request.body)
         user_ids = data.get('userIds', [])
         
-        # manager = request.db_manager
-        # for user_id in user_ids:
-        #     user = manager.getProfile(unique_identifier=user_id)
-        #     if action == 'delete':
-        #         user.status = 'deleted'
-        #         manager.update(user)
+        status = USER_ACTION_STATUSES.get(action)
+        if status is None:
+            return JsonResponse({'error': f'Unknown action {action}'}, status=400)
+        
+        # One UPDATE for the whole selection instead of a fetch and an update per user
+        manager = request.db_manager
+        updated = await manager.bulkUpdateStatus(user_ids, status)
+        missing = sorted(set(str(user_id) for user_id in user_ids) - set(updated))
         
-        return JsonResponse({'message': f'{action} action completed successfully'})
+        return JsonResponse({'message': f'{action} action completed successfully', 'updated': len(updated), 'missing': missing})
     except Exception as e:
         return JsonResponse({'error': f'Failed to perform {action}'}, status=500)
@@ -2,34 +2,41 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.http import JsonResponse
 from core.decorators import auth_required
-from psql import psqlManager
+from core.passwords import hasher, HasherBusy
+from psql import psqlManager, asyncPsqlManager
 import json
 
 @csrf_exempt
 @require_http_methods(["POST"])
-def login_view(request):
+async def login_view(request):
     try:
         data = json.loads(request.body)
         email = data.get('email')
         password = data.get('password')
         
-        manager = psqlManager.Manager(__name__)
-        profile_user = manager.getProfile(email=email)
+        async with asyncPsqlManager.Manager(__name__) as manager:
+            profile_user, role_name = await manager.getProfileWithRole(email=email)
         
-        if not profile_user:
-            return JsonResponse({'error': 'Invalid email or password'}, status=400)
+            if not profile_user:
+                # Same cost as a wrong password so unknown emails cannot be told apart by timing
+                await hasher.averify(password or '', None)
+                return JsonResponse({'error': 'Invalid email or password'}, status=400)
         
-        if profile_user.status.lower() != 'active':
-            return JsonResponse({'error': 'Account is not active'}, status=400)
+            if profile_user.status.lower() != 'active':
+                return JsonResponse({'error': 'Account is not active'}, status=400)
         
-        if profile_user.password != password:
-            return JsonResponse({'error': 'Invalid email or password'}, status=400)
+            valid, upgraded = await hasher.averifyAndUpgrade(password or '', profile_user.password)
+            if not valid:
+                return JsonResponse({'error': 'Invalid email or password'}, status=400)
+            if upgraded:
+                # Legacy plaintext or an outdated cost: store the current hash. Only the password, and only
+                # if it is still what was verified, so a concurrent deactivation or a stale cached row is not written back
+                await manager.updatePassword(profile_user, upgraded)
         
-        role_obj = manager.getRole(role_id=profile_user.role_id)
-        is_admin = role_obj.name.lower() == 'admin' if role_obj else False
+            is_admin = role_name.lower() == 'admin' if role_name else False
         
-        request.session['user_email'] = profile_user.email
-        request.session['is_admin'] = is_admin
+        await request.session.aset('user_email', profile_user.email)
+        await request.session.aset('is_admin', is_admin)
         
         user_data = {
             'id': profile_user.id,
@@ -40,6 +47,8 @@ def login_view(request):
             'isAdmin': is_admin
         }
         return JsonResponse({'message': 'Login successful', 'user': user_data, 'success': True}, status=200)
+    except HasherBusy:
+        return JsonResponse({'error': 'Too many login attempts, try again shortly'}, status=503, headers={'Retry-After': '1'})
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
@@ -53,42 +62,46 @@ def register_view(request):
         firstname = data.get('firstname', '').strip()
         lastname = data.get('lastname', '').strip()
         
-        manager = psqlManager.Manager(__name__)
-        
-        registration_user = manager.getRegistration(email=email)
-        if registration_user:
-            return JsonResponse({'error': 'Email already registered'}, status=400)
+        with psqlManager.Manager(__name__) as manager:
+            registration_user = manager.getRegistration(email=email)
+            if registration_user:
+                return JsonResponse({'error': 'Email already registered'}, status=400)
         
-        new_registration_user = manager.createRegistration(email, firstname, lastname, "inactive", "custom")
+            new_registration_user = manager.createRegistration(email, firstname, lastname, "inactive", "custom")
         
-        user_data = {
-            'email': email,
-            'firstname': firstname,
-            'lastname': lastname
-        }
-        return JsonResponse({'message': 'Registration successful', 'user': user_data}, status=201)
+            user_data = {
+                'email': email,
+                'firstname': firstname,
+                'lastname': lastname
+            }
+            return JsonResponse({'message': 'Registration successful', 'user': user_data}, status=201)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
 
 @csrf_exempt
 @require_http_methods(["POST"])
-def set_password(request, unique_identifier):
+async def set_password(request, unique_identifier):
     try:
         data = json.loads(request.body)
         new_password = data.get('new_password') or data.get('password')
         
-        manager = psqlManager.Manager(__name__)
-        profile_user = manager.getProfile(unique_identifier=unique_identifier)
+        async with asyncPsqlManager.Manager(__name__) as manager:
+            profile_user = await manager.getProfile(unique_identifier=unique_identifier)
         
-        if not profile_user:
-            return JsonResponse({'error': 'User not found'}, status=404)
+            if not profile_user:
+                return JsonResponse({'error': 'User not found'}, status=404)
         
-        profile_user.password = new_password
-        profile_user.status = 'active'
-        manager.update(profile_user)
+            if not new_password:
+                return JsonResponse({'error': 'Password is required'}, status=400)
+        
+            profile_user.password = await hasher.ahash(new_password)
+            profile_user.status = 'active'
+            await manager.update(profile_user)
         
-        return JsonResponse({'message': 'Password set successfully'}, status=200)
+            return JsonResponse({'message': 'Password set successfully'}, status=200)
+    except HasherBusy:
+        return JsonResponse({'error': 'Server busy, try again shortly'}, status=503, headers={'Retry-After': '1'})
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
@@ -100,12 +113,12 @@ def forgot_password(request):
         data = json.loads(request.body)
         email = data.get('email', '').lower().strip()
         
-        manager = psqlManager.Manager(__name__)
-        profile_user = manager.getProfile(email=email)
+        with psqlManager.Manager(__name__) as manager:
+            profile_user = manager.getProfile(email=email)
         
-        return JsonResponse({
-            'message': 'If an account exists with this email, you will receive password reset instructions.'
-        }, status=200)
+            return JsonResponse({
+                'message': 'If an account exists with this email, you will receive password reset instructions.'
+            }, status=200)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -126,16 +139,15 @@ def logout_view(request):
 
 @auth_required
 @require_http_methods(["GET"])
-def profile_view(request):
+async def profile_view(request):
     try:
         manager = request.db_manager
-        profile_user = manager.getProfile(email=request.user_email)
+        profile_user, role_name = await manager.getProfileWithRole(email=request.user_email)
         
         if not profile_user:
             return JsonResponse({'error': 'Profile not found'}, status=404)
         
-        role_obj = manager.getRole(role_id=profile_user.role_id)
-        is_admin = role_obj.name.lower() == 'admin' if role_obj else False
+        is_admin = role_name.lower() == 'admin' if role_name else False
         
         user_data = {
             'email': profile_user.email,
@@ -184,21 +196,20 @@ def delete_account(request):
 
 @csrf_exempt
 @require_http_methods(["GET"])
-def check_auth(request):
+async def check_auth(request):
     try:
-        email = request.session.get('user_email')
+        email = await request.session.aget('user_email')
         if not email:
             return JsonResponse({'isAuthenticated': False}, status=200)
         
-        manager = psqlManager.Manager(__name__)
-        profile_user = manager.getProfile(email=email)
+        async with asyncPsqlManager.Manager(__name__) as manager:
+            profile_user, role_name = await manager.getProfileWithRole(email=email)
         
-        if not profile_user:
-            request.session.flush()
-            return JsonResponse({'isAuthenticated': False}, status=200)
+            if not profile_user:
+                await request.session.aflush()
+                return JsonResponse({'isAuthenticated': False}, status=200)
         
-        role_obj = manager.getRole(role_id=profile_user.role_id)
-        is_admin = role_obj.name.lower() == 'admin' if role_obj else False
+            is_admin = role_name.lower() == 'admin' if role_name else False
         
         user_data = {
             'email': profile_user.email,
@@ -208,4 +219,4 @@ def check_auth(request):
         }
         return JsonResponse({'isAuthenticated': True, 'user': user_data}, status=200)
     except Exception as e:
-        return JsonResponse({'isAuthenticated': False}, status=200)
+        return JsonResponse({'isAuthenticated': False}, status=200)
\ No newline at end of file
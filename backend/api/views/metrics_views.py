@@ -0,0 +1,107 @@
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_http_methods
+from decouple import config
+from psql.config import connection, asyncConnection
+from psql.config.Logging import pipeline
+from psql.operations import statements, metrics
+from psql.cache import profileCache, roleCache, sessionCache
+from core.passwords import hasher
+from api.consumers import pg_listener, get_send_stats
+import hmac
+
+# Prometheus text format; scrape /api/metrics/ with "Authorization: Bearer <METRICS_TOKEN>".
+# Without a token only a signed-in admin can read it.
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+CACHES = {
+    'profiles': profileCache.cache,
+    'roles': roleCache.cache,
+    'sessions': sessionCache.cache,
+}
+
+
+def _denied(request):
+    # Error response, or None when the caller may read the metrics
+    if METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if hmac.compare_digest(supplied.encode(), METRICS_TOKEN.encode()):
+            return None
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    # No token configured: same rule as admin_group_required (core/decorators.py)
+    if not request.session.get('user_email'):
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    if not request.session.get('is_admin', False):
+        return JsonResponse({'error': 'You must be an admin to perform this action'}, status=403)
+    return None
+
+
+def _expose_pools(exposition):
+    for stats in connection.get_pool_stats():
+        database = stats['database']
+        exposition.gauge('psql_pool_connections', 'Open connections by state', stats['in_use'], pool=database, state='in_use')
+        exposition.gauge('psql_pool_connections', 'Open connections by state', stats['idle'], pool=database, state='idle')
+        exposition.gauge('psql_pool_max_size', 'Largest number of connections the pool opens', stats['max_size'], pool=database)
+        for key in ('waits', 'timeouts', 'leaked', 'recycled', 'broken', 'opened'):
+            exposition.counter(f'psql_pool_{key}_total', f'Pool {key} since start', stats[key], pool=database)
+
+    for stats in asyncConnection.get_pool_stats():
+        name = stats['name']
+        exposition.gauge('psql_pool_connections', 'Open connections by state', stats.get('pool_size', 0) - stats.get('pool_available', 0), pool=name, state='in_use')
+        exposition.gauge('psql_pool_connections', 'Open connections by state', stats.get('pool_available', 0), pool=name, state='idle')
+        exposition.gauge('psql_pool_max_size', 'Largest number of connections the pool opens', stats.get('pool_max', 0), pool=name)
+        exposition.gauge('psql_pool_requests_waiting', 'Callers waiting for a connection', stats.get('requests_waiting', 0), pool=name)
+
+    statement_stats = statements.get_statement_stats()
+    for key in ('hits', 'misses', 'prepares', 'evictions', 'invalidations', 'failures'):
+        exposition.counter(f'psql_prepared_statement_{key}_total', f'Prepared statement cache {key}', statement_stats[key])
+
+
+def _expose_caches(exposition):
+    for name, cache in CACHES.items():
+        stats = cache.getStats()
+        exposition.gauge('cache_entries', 'Entries held by the in-process cache', stats['size'], cache=name)
+        for key in ('hits', 'misses', 'invalidations'):
+            exposition.counter(f'cache_{key}_total', f'Cache {key}', stats[key], cache=name)
+
+
+def _expose_realtime(exposition):
+    listener = pg_listener.getStats()
+    exposition.gauge('listener_connected', 'Whether the LISTEN connection is up', listener['connected'])
+    exposition.gauge('listener_leader', 'Whether this process fans out changes', listener['leader'])
+    for key in ('connects', 'notifications', 'events', 'rows', 'send_failures'):
+        exposition.counter(f'listener_{key}_total', f'Listener {key} since start', listener[key])
+
+    sends = get_send_stats()
+    exposition.gauge('websocket_connections', 'Open WebSocket connections', sends['connections'])
+    exposition.gauge('websocket_pending_bytes', 'Bytes queued for WebSocket clients', sends['pending_bytes'])
+    exposition.gauge('websocket_pending_budget_bytes', 'Limit on bytes queued for WebSocket clients', sends['budget_bytes'])
+    for key in ('dropped', 'coalesced', 'disconnects'):
+        exposition.counter(f'websocket_{key}_total', f'WebSocket frames or clients {key} by the slow-client policy', sends[key])
+
+
+def _expose_process(exposition):
+    passwords = hasher.getStats()
+    exposition.gauge('password_hash_queue_depth', 'Password hash jobs waiting or running', passwords['depth'])
+    for key in ('hashes', 'verifies', 'rehashes', 'rejected'):
+        exposition.counter(f'password_{key}_total', f'Password hasher {key}', passwords[key])
+
+    logs = pipeline.getStats()
+    exposition.gauge('log_queue_depth', 'Log records waiting for the writer thread', logs['queued'])
+    exposition.counter('log_dropped_total', 'Log records dropped because the queue was full', logs['dropped'])
+
+
+@require_http_methods(["GET"])
+def metrics_view(request):
+    denied = _denied(request)
+    if denied is not None:
+        return denied
+
+    exposition = metrics.Exposition()
+    metrics.exposeQueries(exposition)
+    _expose_pools(exposition)
+    _expose_caches(exposition)
+    _expose_realtime(exposition)
+    _expose_process(exposition)
+    return HttpResponse(exposition.render(), content_type=CONTENT_TYPE)
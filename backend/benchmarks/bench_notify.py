@@ -0,0 +1,175 @@
+# Latency benchmark: UPDATE on profiles (the real notify trigger) -> PostgreSQLListener's group_send.
+# Runs the listener itself on a recording channel layer, once with the old loop (a worker thread
+# around select(1.0) + poll, per iteration) and once with the current one (loop.add_reader on the
+# connection socket), and counts how often each wakes up while nothing changes.
+# Needs a reachable database (same settings as the backend) with 01_init.sql / 02_triggers.sql applied.
+# Usage (from backend/): python -m benchmarks.bench_notify [updates] [idle_seconds]
+
+# Standard imports
+import asyncio
+import json
+import os
+import select
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project1.settings')
+
+import django
+
+django.setup()
+
+# Custom imports
+from channels.layers import InMemoryChannelLayer
+from api import consumers
+
+EMAIL = "bench-notify@example.com"
+
+
+class RecordingLayer(InMemoryChannelLayer):
+    # Stops the clock when the listener hands a change to the layer
+    def __init__(self):
+        super().__init__()
+        self.started = {}       # firstname written by the UPDATE -> perf_counter before it ran
+        self.latencies = []
+        self.arrived = None
+
+    async def group_send(self, group, message):
+        now = time.perf_counter()
+        if group == consumers.table_group('profiles'):
+            data = json.loads(message['text'])['data']
+            for row in data if isinstance(data, list) else [data]:
+                started = self.started.pop(row.get('firstname'), None)
+                if started is not None:
+                    self.latencies.append(now - started)
+                    self.arrived.set()
+        await super().group_send(group, message)
+
+
+class ReaderListener(consumers.PostgreSQLListener):
+    # Current listener; a wake-up is one readable callback
+    def __init__(self):
+        super().__init__()
+        self.wakeups = 0
+
+    def _on_readable(self):
+        self.wakeups += 1
+        super()._on_readable()
+
+
+class PollingListener(consumers.PostgreSQLListener):
+    # The loop before loop.add_reader: a worker-thread hop around a 1 s select() per iteration
+    def __init__(self):
+        super().__init__()
+        self.wakeups = 0
+        self._poller = None
+
+    def _watch(self):
+        self._error = None
+        self._poller = self.loop.create_task(self._poll())
+        self._readable.set()
+
+    def _unwatch(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+
+    async def _poll(self):
+        conn = self.conn
+
+        def wait():
+            select.select([conn], [], [], 1.0)
+            conn.poll()
+
+        while True:
+            try:
+                await self.loop.run_in_executor(None, wait)
+            except Exception as e:
+                self._error = e
+                self._readable.set()
+                return
+            self.wakeups += 1
+            self._readable.set()
+
+
+def setup_profile():
+    conn = consumers.pg_listener.get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO profiles (unique_identifier, email, firstname) VALUES (%s, %s, %s) "
+        "ON CONFLICT (email) DO UPDATE SET firstname = EXCLUDED.firstname RETURNING id",
+        (EMAIL, EMAIL, 'bench')
+    )
+    profile_id = cursor.fetchone()[0]
+    return conn, profile_id
+
+
+def cleanup(conn, profile_id: int):
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM profiles WHERE id = %s", (profile_id,))
+    cursor.execute("DELETE FROM change_log WHERE table_name = 'profiles' AND data->>'id' = %s", (str(profile_id),))
+    conn.close()
+
+
+async def run(listener_class, updates: int, idle_seconds: float, profile_id: int):
+    layer = RecordingLayer()
+    layer.arrived = asyncio.Event()
+    consumers.get_channel_layer = lambda: layer
+    listener = listener_class()
+    task = asyncio.create_task(listener.start())
+
+    # The listener waits 2 s before connecting
+    while listener.connects == 0:
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(0.5)
+
+    # Idle: nothing changes, count how often the listener wakes up anyway
+    before = listener.wakeups
+    await asyncio.sleep(idle_seconds)
+    idle_wakeups = listener.wakeups - before
+
+    # Latency: one autocommitted UPDATE at a time, each waits for its group_send
+    conn = consumers.pg_listener.get_connection()
+    cursor = conn.cursor()
+    loop = asyncio.get_running_loop()
+    for i in range(updates):
+        name = f"bench-{i}"
+        layer.arrived.clear()
+        layer.started[name] = time.perf_counter()
+        await loop.run_in_executor(None, cursor.execute, "UPDATE profiles SET firstname = %s WHERE id = %s", (name, profile_id))
+        await asyncio.wait_for(layer.arrived.wait(), 5)
+        # Spaced out so each change is dispatched on its own, like a real write arriving
+        await asyncio.sleep(0.005)
+    conn.close()
+
+    listener.stop()
+    await task
+    return layer.latencies, idle_wakeups
+
+
+def report(label: str, latencies: list, idle_wakeups: int, idle_seconds: float):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1e3
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e3
+    print(f"{label:<24} p50 {p50:>7.3f} ms  p99 {p99:>7.3f} ms  max {latencies[-1] * 1e3:>8.3f} ms  idle wake-ups {idle_wakeups / idle_seconds:>5.2f}/s")
+
+
+def main():
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    idle_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+
+    conn, profile_id = setup_profile()
+    print(f"{updates} updates, {idle_seconds:.0f} s idle")
+    try:
+        for label, listener_class in (("thread + select(1.0)", PollingListener), ("loop.add_reader", ReaderListener)):
+            latencies, idle_wakeups = asyncio.run(run(listener_class, updates, idle_seconds, profile_id))
+            report(label, latencies, idle_wakeups, idle_seconds)
+    finally:
+        cleanup(conn, profile_id)
+
+
+if __name__ == "__main__":
+    main()
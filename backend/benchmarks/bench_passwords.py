@@ -0,0 +1,56 @@
+# Throughput benchmark: password verifications per second (one per login) through PasswordHasher's
+# pool at each cost setting, with 1..N workers, and the resulting logins/s per core.
+# Compare the per-core figure with the backend's CPU limit (docker-compose.yml) to pick a cost.
+# Usage (from backend/): python -m benchmarks.bench_passwords [logins] [max_workers]
+
+# Standard imports
+import os
+import sys
+import time
+from concurrent.futures import wait
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+# Custom imports
+from core.passwords import PasswordHasher
+
+COSTS = (
+    ('pbkdf2_sha256', {'iterations': 100000}),
+    ('pbkdf2_sha256', {'iterations': 310000}),
+    ('pbkdf2_sha256', {'iterations': 600000}),
+    ('scrypt', {'scrypt_n': 2 ** 14}),
+    ('scrypt', {'scrypt_n': 2 ** 15}),
+)
+
+
+def build(algorithm: str, workers: int, logins: int, iterations: int = 600000, scrypt_n: int = 2 ** 14):
+    return PasswordHasher(algorithm, iterations, scrypt_n, 8, 1, workers, queue_max=logins)
+
+
+def run(hasher: PasswordHasher, encoded: str, logins: int):
+    start = time.perf_counter()
+    futures = [hasher._submit(hasher.check, 'correct horse battery staple', encoded) for _ in range(logins)]
+    wait(futures)
+    elapsed = time.perf_counter() - start
+    assert all(future.result() for future in futures)
+    return logins / elapsed
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else min(4, os.cpu_count() or 1)
+
+    print(f"{logins} logins per run, {os.cpu_count()} CPUs visible")
+    for algorithm, cost in COSTS:
+        label = f"{algorithm} {next(iter(cost.values()))}"
+        hasher = build(algorithm, 1, logins, **cost)
+        encoded = hasher.hash('correct horse battery staple')
+        for workers in range(1, max_workers + 1):
+            rate = run(build(algorithm, workers, logins, **cost), encoded, logins)
+            cores = min(workers, os.cpu_count() or 1)
+            print(f"{label:<24} workers {workers}  {rate:>7.1f} logins/s  {rate / cores:>6.1f} logins/s per core  {1000 * cores / rate:>6.1f} CPU ms each")
+
+
+if __name__ == "__main__":
+    main()
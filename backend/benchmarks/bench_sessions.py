@@ -0,0 +1,94 @@
+# Throughput benchmark: concurrent check_auth-style session reads (session.aget('user_email')) with a
+# share of logins mixed in (new session + aset + asave), on Django's database engine over db.sqlite3
+# versus core.sessions over PostgreSQL, with and without its read cache.
+# Needs a reachable database (same settings as the backend) and the sessions table (04_sessions.sql).
+# Usage (from backend/): python -m benchmarks.bench_sessions [concurrency] [seconds] [login_every]
+
+# Standard imports
+import asyncio
+import os
+import sys
+import time
+from importlib import import_module
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project1.settings')
+
+import django
+
+django.setup()
+
+# Custom imports
+from django.core.management import call_command
+from psql.cache import sessionCache
+
+ENGINES = (
+    ('sqlite (django db)', 'django.contrib.sessions.backends.db', None),
+    ('postgres, no cache', 'core.sessions', 0),
+    ('postgres + cache', 'core.sessions', sessionCache.cache.ttl or 5.0),
+)
+SESSIONS = 200
+
+
+async def login(store_class, index: int):
+    session = store_class()
+    await session.aset('user_email', f"bench{index}@example.com")
+    await session.aset('is_admin', False)
+    await session.asave()
+    return session.session_key
+
+
+async def client(store_class, keys: list, created: list, offset: int, login_every: int, deadline: float, counts: dict):
+    i = offset
+    while time.perf_counter() < deadline:
+        if login_every and i % login_every == 0:
+            created.append(await login(store_class, i))
+            counts['logins'] += 1
+        else:
+            # What check_auth and auth_required do per request
+            session = store_class(keys[i % len(keys)])
+            assert await session.aget('user_email')
+            counts['reads'] += 1
+        i += 1
+
+
+async def run(store_class, concurrency: int, seconds: float, login_every: int):
+    keys = [await login(store_class, index) for index in range(SESSIONS)]
+    created = []
+    counts = {'reads': 0, 'logins': 0}
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*(client(store_class, keys, created, offset, login_every, deadline, counts) for offset in range(concurrency)))
+    # Seeded sessions and the ones logged in during the run
+    for key in keys + created:
+        await store_class(key).adelete()
+    return counts
+
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    login_every = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    # Django's engine needs its table in db.sqlite3
+    call_command('migrate', 'sessions', verbosity=0)
+
+    print(f"{concurrency} concurrent clients, {seconds:.0f} s, one login every {login_every} requests")
+    for label, engine, ttl in ENGINES:
+        if ttl is not None:
+            sessionCache.cache.ttl = ttl
+            sessionCache.cache.clear()
+        store_class = import_module(engine).SessionStore
+        before = sessionCache.cache.getStats()
+        counts = asyncio.run(run(store_class, concurrency, seconds, login_every))
+        after = sessionCache.cache.getStats()
+        total = counts['reads'] + counts['logins']
+        line = f"{label:<20} {total / seconds:>8.0f} requests/s  ({counts['reads'] / seconds:.0f} reads/s, {counts['logins'] / seconds:.0f} logins/s)"
+        if ttl:
+            hits, misses = after['hits'] - before['hits'], after['misses'] - before['misses']
+            line += f"  cache hit rate {hits / max(hits + misses, 1):.1%}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
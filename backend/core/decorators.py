@@ -1,8 +1,23 @@
 from functools import wraps
+from asgiref.sync import iscoroutinefunction
 from django.http import JsonResponse
 
 
 def auth_required(view_func):
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _wrapped_async_view(request, *args, **kwargs):
+            email = await request.session.aget('user_email')
+            if email:
+                from psql import asyncPsqlManager
+                async with asyncPsqlManager.Manager(__name__) as manager:
+                    request.db_manager = manager
+                    request.user_email = email
+
+                    return await view_func(request, *args, **kwargs)
+            return JsonResponse({'error': 'Authentication required'}, status=401)
+        return _wrapped_async_view
+
     @wraps(view_func)
     def _wrapped_view(request, *args, **kwargs):
         email = request.session.get('user_email')
@@ -10,26 +25,51 @@ def auth_required(view_func):
             from psql import psqlManager
             request.db_manager = psqlManager.Manager(__name__)
             request.user_email = email
-            
-            return view_func(request, *args, **kwargs)
+
+            try:
+                return view_func(request, *args, **kwargs)
+            finally:
+                request.db_manager.close()
         return JsonResponse({'error': 'Authentication required'}, status=401)
     return _wrapped_view
 
 
 def admin_group_required(view_func):
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _wrapped_async_view(request, *args, **kwargs):
+            email = await request.session.aget('user_email')
+            if not email:
+                return JsonResponse({'error': 'Authentication required'}, status=401)
+
+            is_admin = await request.session.aget('is_admin', False)
+            if not is_admin:
+                return JsonResponse({'error': 'You must be an admin to perform this action'}, status=403)
+
+            from psql import asyncPsqlManager
+            async with asyncPsqlManager.Manager(__name__) as manager:
+                request.db_manager = manager
+                request.user_email = email
+
+                return await view_func(request, *args, **kwargs)
+        return _wrapped_async_view
+
     @wraps(view_func)
     def _wrapped_view(request, *args, **kwargs):
         email = request.session.get('user_email')
         if not email:
             return JsonResponse({'error': 'Authentication required'}, status=401)
-        
+
         is_admin = request.session.get('is_admin', False)
         if not is_admin:
             return JsonResponse({'error': 'You must be an admin to perform this action'}, status=403)
-        
+
         from psql import psqlManager
         request.db_manager = psqlManager.Manager(__name__)
         request.user_email = email
-        
-        return view_func(request, *args, **kwargs)
+
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            request.db_manager.close()
     return _wrapped_view
@@ -0,0 +1,405 @@
+import asyncio
+import base64
+import collections
+import json
+import random
+import string
+import threading
+import time
+import uuid
+import psycopg
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+from psql.config import asyncConnection
+import Logging
+
+logger = Logging.Logger(__name__).get()
+
+# Channel layer on the PostgreSQL instance the project already runs, so several daphne processes
+# (on one host or many) share groups and reach each other's sockets. Schema: psql/scripts/03_channel_layer.sql
+#
+# - Each process LISTENs on its own NOTIFY channel; names returned by new_channel() embed it, so a
+#   sender knows which process owns a socket. Channels owned by the sending process skip Postgres.
+# - Messages travel inside the NOTIFY payload; bodies too large for it are stored in channels_message
+#   and the notification carries their id instead.
+# - Group membership lives in channels_group, shared by every process.
+# - Names without "!" (worker channels) are queued in channels_message and claimed by one receiver.
+# - Capacity is enforced where a channel's buffer lives: send() raises ChannelFull for a full channel
+#   of this process or a full worker channel; messages arriving for a full socket of another process
+#   are dropped, which is what group_send does for every layer.
+
+NOTIFY_LIMIT = 7900             # Postgres rejects payloads of 8000 bytes or more
+SHARED_CHANNEL = "channels_shared"
+CLEANUP_INTERVAL = 60
+
+
+def _default(value):
+    if isinstance(value, bytes):
+        return {"__bytes__": base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"Cannot send {type(value).__name__} through the channel layer")
+
+
+def _object_hook(value):
+    if len(value) == 1 and "__bytes__" in value:
+        return base64.b64decode(value["__bytes__"])
+    return value
+
+
+def encode(message):
+    return json.dumps(message, default=_default, separators=(",", ":"))
+
+
+def decode(text):
+    return json.loads(text, object_hook=_object_hook)
+
+
+def _chunks(channels, budget):
+    # Split channel names into lists whose JSON encoding fits in budget bytes
+    chunk = []
+    size = 2
+    for channel in channels:
+        length = len(channel) + 3
+        if chunk and size + length > budget:
+            yield chunk
+            chunk = []
+            size = 2
+        chunk.append(channel)
+        size += length
+    if chunk:
+        yield chunk
+
+
+class PostgresChannelLayer(BaseChannelLayer):
+    extensions = ["groups", "flush"]
+    # Groups are shared between processes, so only one of them should fan out database changes
+    cross_process = True
+
+    def __init__(self, database="project1", expiry=60, group_expiry=86400, capacity=100, channel_capacity=None):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity)
+        self.database = database
+        self.group_expiry = group_expiry
+        # NOTIFY channel of this process, also embedded in the names of its channels
+        self.process_name = f"pgl{uuid.uuid4().hex[:16]}"
+
+        self._loop = None               # loop running receive() and the LISTEN task
+        self._start_lock = threading.Lock()
+        self._queues = {}               # local channel -> deque of (expires_at, message)
+        self._waiters = {}              # channel -> asyncio.Event, set when something arrives
+        self._tasks = []
+        self.listening = asyncio.Event()    # set while the LISTEN connection is up
+
+    ################################################ CHANNELS ################################################
+
+    async def new_channel(self, prefix="specific"):
+        self._bind_loop()
+        suffix = "".join(random.choices(string.ascii_letters + string.digits, k=12))
+        channel = f"{prefix.rstrip('.')}.{self.process_name}!{suffix}"
+        # Messages are only kept for channels that exist here: from now until receive() is cancelled
+        self._queues[channel] = collections.deque()
+        return channel
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), "message is not a dict"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        assert "__asgi_channel__" not in message
+
+        expires_at = time.time() + self.expiry
+        if "!" not in channel:
+            await self._send_shared(channel, message, expires_at)
+            return
+
+        owner = self._owner(channel)
+        if owner is None:
+            raise ValueError(f"Channel {channel} was not created by this layer")
+        if owner == self.process_name:
+            self._deliver_local(channel, message, expires_at, raise_full=True)
+            return
+
+        pool = await asyncConnection.get_pool(self.database)
+        async with pool.connection() as conn:
+            await self._notify(conn, await self._payloads(conn, {owner: [channel]}, message, expires_at))
+
+    async def receive(self, channel):
+        # Full names: consumers receive on the name new_channel() gave them
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        self._bind_loop()
+        self._start()
+
+        if "!" not in channel:
+            return await self._receive_shared(channel)
+
+        queue = self._queues.setdefault(channel, collections.deque())
+        event = self._waiters.setdefault(channel, asyncio.Event())
+        try:
+            while True:
+                while queue:
+                    expires_at, message = queue.popleft()
+                    if expires_at >= time.time():
+                        return message
+                event.clear()
+                await event.wait()
+        except asyncio.CancelledError:
+            # The consumer is gone (as Channels assumes on cancellation): drop its buffers, and
+            # _push drops whatever is still on its way to it
+            self._queues.pop(channel, None)
+            self._waiters.pop(channel, None)
+            raise
+
+    ################################################ GROUPS ################################################
+
+    async def group_add(self, group, channel):
+        assert self.valid_group_name(group), "Group name not valid"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        pool = await asyncConnection.get_pool(self.database)
+        async with pool.connection() as conn:
+            await conn.execute(
+                "INSERT INTO channels_group (group_name, channel, expires_at) "
+                "VALUES (%s, %s, now() + make_interval(secs => %s)) "
+                "ON CONFLICT (group_name, channel) DO UPDATE SET expires_at = EXCLUDED.expires_at",
+                (group, channel, self.group_expiry)
+            )
+
+    async def group_discard(self, group, channel):
+        assert self.valid_group_name(group), "Group name not valid"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        pool = await asyncConnection.get_pool(self.database)
+        async with pool.connection() as conn:
+            await conn.execute("DELETE FROM channels_group WHERE group_name = %s AND channel = %s", (group, channel))
+
+    async def group_send(self, group, message):
+        await self.group_send_many([(group, message)])
+
+    async def group_send_many(self, sends):
+        # group_send for a list of (group, message) on one pool connection: one query finds the members
+        # of every group and one statement sends every notification. A message handed to several groups
+        # reaches a channel that is in more than one of them once.
+        messages = {}           # id(message) -> (message, channels)
+        for group, message in sends:
+            assert isinstance(message, dict), "message is not a dict"
+            assert self.valid_group_name(group), "Group name not valid"
+            messages.setdefault(id(message), (message, set()))
+        if not messages:
+            return
+
+        expires_at = time.time() + self.expiry
+        local = []
+        pool = await asyncConnection.get_pool(self.database)
+        async with pool.connection() as conn:
+            cursor = await conn.execute(
+                "SELECT group_name, channel FROM channels_group WHERE group_name = ANY(%s) AND expires_at > now()",
+                (list({group for group, _ in sends}),)
+            )
+            members = {}
+            for group, channel in await cursor.fetchall():
+                members.setdefault(group, []).append(channel)
+            for group, message in sends:
+                messages[id(message)][1].update(members.get(group, ()))
+
+            notifications = []
+            for message, channels in messages.values():
+                targets = {}
+                for channel in channels:
+                    targets.setdefault(self._owner(channel), []).append(channel)
+                local.extend((channel, message) for channel in targets.pop(self.process_name, []))
+                targets.pop(None, None)
+                if targets:
+                    notifications.extend(await self._payloads(conn, targets, message, expires_at))
+            await self._notify(conn, notifications)
+
+        # Over-capacity channels are skipped, as the spec requires for group_send
+        for channel, message in local:
+            self._deliver_local(channel, message, expires_at, raise_full=False)
+
+    async def active_groups(self, groups):
+        # The groups among these with at least one live member, in one query
+        pool = await asyncConnection.get_pool(self.database)
+        async with pool.connection() as conn:
+            cursor = await conn.execute(
+                "SELECT DISTINCT group_name FROM channels_group WHERE group_name = ANY(%s) AND expires_at > now()",
+                (list(groups),)
+            )
+            return {group for (group,) in await cursor.fetchall()}
+
+    ################################################ FLUSH / CLOSE ################################################
+
+    async def flush(self):
+        pool = await asyncConnection.get_pool(self.database)
+        async with pool.connection() as conn:
+            await conn.execute("DELETE FROM channels_message")
+            await conn.execute("DELETE FROM channels_group")
+        for queue in list(self._queues.values()):
+            queue.clear()
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    ################################################ INTERNALS ################################################
+
+    def _bind_loop(self):
+        # Local buffers belong to the loop serving the sockets; other loops hand messages over to it
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+
+    def _owner(self, channel):
+        head = channel.split("!", 1)[0]
+        name = head.rsplit(".", 1)[-1]
+        return name if name.startswith("pgl") else None
+
+    def _deliver_local(self, channel, message, expires_at, raise_full):
+        queue = self._queues.get(channel)
+        if queue is not None and len(queue) >= self.get_capacity(channel):
+            if raise_full:
+                raise ChannelFull(channel)
+            return
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._push(channel, dict(message), expires_at)
+        else:
+            self._loop.call_soon_threadsafe(self._push, channel, dict(message), expires_at)
+
+    def _push(self, channel, message, expires_at):
+        # Runs on self._loop only
+        queue = self._queues.get(channel)
+        if queue is None or len(queue) >= self.get_capacity(channel) or expires_at < time.time():
+            return
+        queue.append((expires_at, message))
+        event = self._waiters.get(channel)
+        if event is not None:
+            event.set()
+
+    async def _payloads(self, conn, targets, message, expires_at):
+        # targets: owning process -> its channels; returns (owner, payload) notifications.
+        # The body is stored at most once for all of them.
+        body = encode(message)
+        if len(body.encode()) > NOTIFY_LIMIT // 2:
+            cursor = await conn.execute(
+                "INSERT INTO channels_message (channel, message, expires_at) VALUES ('', %s, to_timestamp(%s)) RETURNING id",
+                (body, expires_at)
+            )
+            field = f'"id":{(await cursor.fetchone())[0]}'
+        else:
+            field = f'"m":{body}'
+
+        header = f'{{"x":{expires_at!r},{field},"c":'
+        budget = NOTIFY_LIMIT - len(header.encode()) - 1
+        return [
+            (owner, header + json.dumps(chunk) + "}")
+            for owner, channels in targets.items()
+            for chunk in _chunks(channels, budget)
+        ]
+
+    async def _notify(self, conn, notifications):
+        # One statement for all of them; they are delivered in this order when the transaction commits
+        if notifications:
+            owners, payloads = zip(*notifications)
+            await conn.execute(
+                "SELECT pg_notify(owner, payload) FROM unnest(%s::text[], %s::text[]) AS notification(owner, payload)",
+                (list(owners), list(payloads))
+            )
+
+    async def _send_shared(self, channel, message, expires_at):
+        pool = await asyncConnection.get_pool(self.database)
+        async with pool.connection() as conn:
+            cursor = await conn.execute(
+                "INSERT INTO channels_message (channel, message, expires_at) "
+                "SELECT %s, %s, to_timestamp(%s) "
+                "WHERE (SELECT count(*) FROM channels_message WHERE channel = %s AND expires_at > now()) < %s "
+                "RETURNING id",
+                (channel, encode(message), expires_at, channel, self.get_capacity(channel))
+            )
+            if await cursor.fetchone() is None:
+                raise ChannelFull(channel)
+            await conn.execute("SELECT pg_notify(%s, %s)", (SHARED_CHANNEL, channel))
+
+    async def _receive_shared(self, channel):
+        event = self._waiters.setdefault(channel, asyncio.Event())
+        pool = await asyncConnection.get_pool(self.database)
+        while True:
+            # Cleared before looking so a wake-up during the query is not lost
+            event.clear()
+            async with pool.connection() as conn:
+                cursor = await conn.execute(
+                    "DELETE FROM channels_message WHERE id = ("
+                    "SELECT id FROM channels_message WHERE channel = %s AND expires_at > now() "
+                    "ORDER BY id LIMIT 1 FOR UPDATE SKIP LOCKED) RETURNING message",
+                    (channel,)
+                )
+                row = await cursor.fetchone()
+            if row is not None:
+                return decode(row[0])
+            try:
+                await asyncio.wait_for(event.wait(), self.expiry)
+            except asyncio.TimeoutError:
+                pass
+
+    def _start(self):
+        with self._start_lock:
+            if not self._tasks:
+                self._tasks = [
+                    self._loop.create_task(self._listen()),
+                    self._loop.create_task(self._cleanup())
+                ]
+
+    async def _listen(self):
+        while True:
+            try:
+                conn = await psycopg.AsyncConnection.connect(asyncConnection.get_conninfo(self.database), autocommit=True)
+                async with conn:
+                    await conn.execute(f"LISTEN {self.process_name}")
+                    await conn.execute(f"LISTEN {SHARED_CHANNEL}")
+                    self.listening.set()
+                    # Worker channels may have missed wake-ups while disconnected
+                    for channel, event in list(self._waiters.items()):
+                        if "!" not in channel:
+                            event.set()
+
+                    async for notify in conn.notifies():
+                        await self._on_notify(notify)
+            except asyncio.CancelledError:
+                self.listening.clear()
+                raise
+            except Exception as e:
+                self.listening.clear()
+                logger.error("Channel layer: LISTEN connection error - %s", e)
+                await asyncio.sleep(1)
+
+    async def _on_notify(self, notify):
+        if notify.channel == SHARED_CHANNEL:
+            event = self._waiters.get(notify.payload)
+            if event is not None:
+                event.set()
+            return
+
+        data = decode(notify.payload)
+        message = data.get("m")
+        if message is None:
+            pool = await asyncConnection.get_pool(self.database)
+            async with pool.connection() as conn:
+                cursor = await conn.execute(
+                    "SELECT message FROM channels_message WHERE id = %s AND expires_at > now()", (data["id"],)
+                )
+                row = await cursor.fetchone()
+            if row is None:
+                return
+            message = decode(row[0])
+
+        for channel in data["c"]:
+            self._push(channel, dict(message), data["x"])
+
+    async def _cleanup(self):
+        # Expired bodies and memberships of channels that never said goodbye (crashed processes)
+        while True:
+            await asyncio.sleep(CLEANUP_INTERVAL)
+            try:
+                pool = await asyncConnection.get_pool(self.database)
+                async with pool.connection() as conn:
+                    await conn.execute("DELETE FROM channels_message WHERE expires_at < now()")
+                    await conn.execute("DELETE FROM channels_group WHERE expires_at < now()")
+            except Exception as e:
+                logger.warning("Channel layer: Cleanup failed - %s", e)
@@ -0,0 +1,91 @@
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from decouple import config
+from django.http import JsonResponse
+from psql.operations import metrics
+import Logging
+
+logger = Logging.Logger(__name__).get()
+
+# Per-request query tracing for /api/: wall time, time inside database.main / asyncDatabase.main and
+# the number of queries go out in a Server-Timing header. A request over QUERY_BUDGET queries, or
+# issuing one query shape QUERY_REPEAT_LIMIT times or more (N+1), is logged, or answered with a 500
+# when QUERY_BUDGET_ACTION is "fail" (development). Session and cache lookups that reach the
+# database count too.
+
+TRACED_PREFIX = '/api/'
+QUERY_BUDGET = config('QUERY_BUDGET', default=10, cast=int)
+QUERY_REPEAT_LIMIT = config('QUERY_REPEAT_LIMIT', default=3, cast=int)
+QUERY_BUDGET_ACTION = config('QUERY_BUDGET_ACTION', default='log')     # log, fail or off
+SERVER_TIMING = config('SERVER_TIMING', default=True, cast=bool)
+
+
+class QueryTracingMiddleware:
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not request.path.startswith(TRACED_PREFIX):
+            return self.get_response(request)
+
+        trace, token = metrics.beginTrace()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.endTrace(token)
+        return self._finish(request, response, trace)
+
+    async def __acall__(self, request):
+        if not request.path.startswith(TRACED_PREFIX):
+            return await self.get_response(request)
+
+        trace, token = metrics.beginTrace()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.endTrace(token)
+        return self._finish(request, response, trace)
+
+    def _finish(self, request, response, trace):
+        elapsed = time.perf_counter() - trace.started
+
+        if QUERY_BUDGET_ACTION != 'off':
+            over_budget = QUERY_BUDGET > 0 and trace.queries > QUERY_BUDGET
+            repeated = trace.repeated(QUERY_REPEAT_LIMIT) if QUERY_REPEAT_LIMIT > 0 else {}
+            if over_budget or repeated:
+                logger.warning(
+                    "Query budget: %s %s ran %d queries (budget %d) in %.1f ms, repeated: %s",
+                    request.method, request.path, trace.queries, QUERY_BUDGET, trace.db_seconds * 1000, repeated or 'none'
+                )
+                if QUERY_BUDGET_ACTION == 'fail':
+                    response = self._failed(response, {
+                        'error': 'Query budget exceeded',
+                        'queries': trace.queries,
+                        'budget': QUERY_BUDGET,
+                        'repeated': repeated
+                    })
+
+        if SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'total;dur={elapsed * 1000:.1f}, '
+                f'db;dur={trace.db_seconds * 1000:.1f};desc="{trace.queries} queries"'
+            )
+        return response
+
+    def _failed(self, response, body):
+        # The view already ran (a login may have committed its session): keep the cookies and CORS
+        # headers the inner middleware put on its response, or the browser loses them
+        failed = JsonResponse(body, status=500)
+        failed.cookies = response.cookies
+        for header, value in response.items():
+            if header.lower().startswith('access-control-') or header.lower() == 'vary':
+                failed[header] = value
+        return failed
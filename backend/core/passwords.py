@@ -0,0 +1,162 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decouple import config
+
+# Password hashing off the serving thread. hashlib's pbkdf2_hmac and scrypt release the GIL, so a
+# small thread pool hashes in parallel while daphne keeps serving. Stored formats:
+#   pbkdf2_sha256$<iterations>$<salt>$<hash>
+#   scrypt$<n>$<r>$<p>$<salt>$<hash>
+# Anything else is a legacy plaintext password: it still verifies, and login replaces it with a hash.
+#
+# At most PASSWORD_HASH_QUEUE_MAX jobs wait or run at once; beyond that callers get HasherBusy
+# instead of piling up behind a login flood.
+
+ALGORITHMS = ('pbkdf2_sha256', 'scrypt')
+SALT_BYTES = 16
+
+
+class HasherBusy(Exception):
+    """Too many hash jobs queued; the caller should answer 503 and let the client retry."""
+
+
+def _b64(value):
+    return base64.b64encode(value).decode('ascii').rstrip('=')
+
+
+def _unb64(value):
+    return base64.b64decode(value + '=' * (-len(value) % 4))
+
+
+class PasswordHasher:
+    def __init__(self, algorithm: str, iterations: int, scrypt_n: int, scrypt_r: int, scrypt_p: int, workers: int, queue_max: int):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown password hasher {algorithm}, expected one of {ALGORITHMS}")
+        self.algorithm = algorithm
+        self.iterations = iterations
+        self.scrypt_n = scrypt_n
+        self.scrypt_r = scrypt_r
+        self.scrypt_p = scrypt_p
+        self.workers = workers
+        self.queue_max = queue_max
+
+        self._lock = threading.Lock()
+        self._executor = None
+        self._depth = 0
+
+        self.hashes = 0
+        self.verifies = 0
+        self.rehashes = 0
+        self.rejected = 0
+        self.max_depth = 0
+
+        # Verified when an account does not exist, so a miss takes as long as a wrong password
+        self._dummy = None
+
+    ################################################ FUNCTIONS ################################################
+
+    def encode(self, password: str, salt: bytes):
+        # Runs on the calling thread: only call from the pool (or a benchmark)
+        if self.algorithm == 'scrypt':
+            digest = hashlib.scrypt(password.encode(), salt=salt, n=self.scrypt_n, r=self.scrypt_r, p=self.scrypt_p,
+                                    maxmem=256 * self.scrypt_n * self.scrypt_r)
+            return f"scrypt${self.scrypt_n}${self.scrypt_r}${self.scrypt_p}${_b64(salt)}${_b64(digest)}"
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, self.iterations)
+        return f"pbkdf2_sha256${self.iterations}${_b64(salt)}${_b64(digest)}"
+
+    def check(self, password: str, encoded: str):
+        # Runs on the calling thread: only call from the pool (or a benchmark)
+        if not encoded:
+            if self._dummy is None:
+                self._dummy = self.encode('', secrets.token_bytes(SALT_BYTES))
+            self.check(password or '', self._dummy)
+            return False
+        parts = encoded.split('$')
+        if parts[0] == 'pbkdf2_sha256' and len(parts) == 4:
+            digest = hashlib.pbkdf2_hmac('sha256', password.encode(), _unb64(parts[2]), int(parts[1]))
+            return hmac.compare_digest(digest, _unb64(parts[3]))
+        if parts[0] == 'scrypt' and len(parts) == 6:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            digest = hashlib.scrypt(password.encode(), salt=_unb64(parts[4]), n=n, r=r, p=p, maxmem=256 * n * r)
+            return hmac.compare_digest(digest, _unb64(parts[5]))
+        # Legacy plaintext row
+        return hmac.compare_digest(password.encode(), encoded.encode())
+
+    def needsRehash(self, encoded: str):
+        # Plaintext, another algorithm, or cost parameters that have since changed
+        parts = (encoded or '').split('$')
+        if self.algorithm == 'scrypt':
+            return parts[:4] != ['scrypt', str(self.scrypt_n), str(self.scrypt_r), str(self.scrypt_p)]
+        return parts[:2] != ['pbkdf2_sha256', str(self.iterations)]
+
+    def _submit(self, function, *args):
+        with self._lock:
+            if self._depth >= self.queue_max:
+                self.rejected += 1
+                raise HasherBusy(f"{self._depth} password hashes already queued")
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hasher')
+            self._depth += 1
+            self.max_depth = max(self.max_depth, self._depth)
+        future = self._executor.submit(function, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self._depth -= 1
+
+    def hash(self, password: str):
+        self.hashes += 1
+        return self._submit(self.encode, password, secrets.token_bytes(SALT_BYTES)).result()
+
+    def verify(self, password: str, encoded: str):
+        self.verifies += 1
+        return self._submit(self.check, password, encoded).result()
+
+    async def ahash(self, password: str):
+        self.hashes += 1
+        return await asyncio.wrap_future(self._submit(self.encode, password, secrets.token_bytes(SALT_BYTES)))
+
+    async def averify(self, password: str, encoded: str):
+        self.verifies += 1
+        return await asyncio.wrap_future(self._submit(self.check, password, encoded))
+
+    async def averifyAndUpgrade(self, password: str, encoded: str):
+        """(valid, new encoded value or None); the new value replaces plaintext or outdated hashes."""
+        if not await self.averify(password, encoded):
+            return False, None
+        if not self.needsRehash(encoded):
+            return True, None
+        self.rehashes += 1
+        return True, await self.ahash(password)
+
+    ################################################ GETTERS ################################################
+
+    def getStats(self):
+        return {
+            'algorithm': self.algorithm,
+            'workers': self.workers,
+            'queue_max': self.queue_max,
+            'depth': self._depth,
+            'max_depth': self.max_depth,
+            'hashes': self.hashes,
+            'verifies': self.verifies,
+            'rehashes': self.rehashes,
+            'rejected': self.rejected
+        }
+
+
+hasher = PasswordHasher(
+    algorithm=config('PASSWORD_HASHER', default='pbkdf2_sha256'),
+    iterations=config('PASSWORD_PBKDF2_ITERATIONS', default=600000, cast=int),
+    scrypt_n=config('PASSWORD_SCRYPT_N', default=2 ** 14, cast=int),
+    scrypt_r=config('PASSWORD_SCRYPT_R', default=8, cast=int),
+    scrypt_p=config('PASSWORD_SCRYPT_P', default=1, cast=int),
+    workers=config('PASSWORD_HASH_WORKERS', default=2, cast=int),
+    queue_max=config('PASSWORD_HASH_QUEUE_MAX', default=8, cast=int)
+)
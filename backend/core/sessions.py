@@ -0,0 +1,138 @@
+from django.contrib.sessions.backends.base import CreateError, SessionBase, UpdateError
+from psql import psqlManager, asyncPsqlManager
+from psql.cache import sessionCache
+
+# Session engine on the project's PostgreSQL pools (SESSION_ENGINE = 'core.sessions') instead of
+# Django's database engine on db.sqlite3, whose single writer lock serializes every login and logout.
+# Sync callers go through psqlManager; async views (session.aget/aset/aflush) use asyncPsqlManager
+# directly instead of Django's sync_to_async fallbacks. Decoded sessions are kept in
+# psql.cache.sessionCache for a few seconds. Schema: psql/scripts/04_sessions.sql
+
+
+class SessionStore(SessionBase):
+
+    ################################################ LOADING ################################################
+
+    def _cached(self):
+        return sessionCache.cache.get(self.session_key)
+
+    def _loaded(self, row, generation):
+        if row is None:
+            # Missing or expired: the next save creates a new session
+            self._session_key = None
+            return {}
+        session_data, expire_date = row
+        data = self.decode(session_data)
+        sessionCache.cache.put(self.session_key, data, expire_date.timestamp(), generation)
+        return data
+
+    def load(self):
+        data = self._cached()
+        if data is not None:
+            return data
+        generation = sessionCache.cache.beginLoad()
+        with psqlManager.Manager(__name__) as manager:
+            row = manager.getSession(self.session_key)
+        return self._loaded(row, generation)
+
+    async def aload(self):
+        data = self._cached()
+        if data is not None:
+            return data
+        generation = sessionCache.cache.beginLoad()
+        async with asyncPsqlManager.Manager(__name__) as manager:
+            row = await manager.getSession(self.session_key)
+        return self._loaded(row, generation)
+
+    def exists(self, session_key):
+        if sessionCache.cache.get(session_key) is not None:
+            return True
+        with psqlManager.Manager(__name__) as manager:
+            return manager.sessionExists(session_key)
+
+    async def aexists(self, session_key):
+        if sessionCache.cache.get(session_key) is not None:
+            return True
+        async with asyncPsqlManager.Manager(__name__) as manager:
+            return await manager.sessionExists(session_key)
+
+    ################################################ SAVING ################################################
+
+    def create(self):
+        while True:
+            self._session_key = self._get_new_session_key()
+            try:
+                self.save(must_create=True)
+            except CreateError:
+                # Key collision; try another one
+                continue
+            self.modified = True
+            return
+
+    async def acreate(self):
+        while True:
+            self._session_key = await self._aget_new_session_key()
+            try:
+                await self.asave(must_create=True)
+            except CreateError:
+                continue
+            self.modified = True
+            return
+
+    def _saved(self, written, data, expire_date, must_create):
+        if not written:
+            raise CreateError if must_create else UpdateError
+        sessionCache.cache.invalidate(self.session_key)
+        sessionCache.cache.put(self.session_key, data, expire_date.timestamp())
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        expire_date = self.get_expiry_date()
+        with psqlManager.Manager(__name__) as manager:
+            if must_create:
+                written = manager.createSession(self.session_key, self.encode(data), expire_date)
+            else:
+                written = manager.updateSession(self.session_key, self.encode(data), expire_date)
+        self._saved(written, data, expire_date, must_create)
+
+    async def asave(self, must_create=False):
+        if self.session_key is None:
+            return await self.acreate()
+        data = await self._aget_session(no_load=must_create)
+        expire_date = await self.aget_expiry_date()
+        async with asyncPsqlManager.Manager(__name__) as manager:
+            if must_create:
+                written = await manager.createSession(self.session_key, self.encode(data), expire_date)
+            else:
+                written = await manager.updateSession(self.session_key, self.encode(data), expire_date)
+        self._saved(written, data, expire_date, must_create)
+
+    ################################################ DELETING ################################################
+
+    def delete(self, session_key=None):
+        session_key = session_key or self.session_key
+        if session_key is None:
+            return
+        sessionCache.cache.invalidate(session_key)
+        with psqlManager.Manager(__name__) as manager:
+            manager.deleteSession(session_key)
+
+    async def adelete(self, session_key=None):
+        session_key = session_key or self.session_key
+        if session_key is None:
+            return
+        sessionCache.cache.invalidate(session_key)
+        async with asyncPsqlManager.Manager(__name__) as manager:
+            await manager.deleteSession(session_key)
+
+    @classmethod
+    def clear_expired(cls):
+        with psqlManager.Manager(__name__) as manager:
+            manager.deleteExpiredSessions()
+
+    @classmethod
+    async def aclear_expired(cls):
+        async with asyncPsqlManager.Manager(__name__) as manager:
+            await manager.deleteExpiredSessions()
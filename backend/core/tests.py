@@ -0,0 +1,327 @@
+import asyncio
+import json
+import time
+import unittest
+import uuid
+from unittest import mock
+import psycopg
+from psql.config import asyncConnection
+from core.layers import NOTIFY_LIMIT, PostgresChannelLayer
+from api import consumers
+from api.consumers import OPERATIONS, SLOW_CLIENT_CLOSE_CODE, DatabaseChangesConsumer, PostgreSQLListener, change_frame
+
+# The layer and leadership tests run against the project's PostgreSQL (same settings as the backend,
+# psql/scripts/03_channel_layer.sql applied) and are skipped when it cannot be reached; two layer
+# instances stand in for two daphne processes. The consumer tests need no database.
+# Usage (from backend/): python manage.py test core.tests
+
+DATABASE = "project1"
+TIMEOUT = 5
+
+
+class PostgresChannelLayerTests(unittest.IsolatedAsyncioTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        try:
+            with psycopg.connect(asyncConnection.get_conninfo(DATABASE), connect_timeout=3) as conn:
+                conn.execute("SELECT 1 FROM channels_group LIMIT 1")
+        except Exception as e:
+            raise unittest.SkipTest(f"PostgreSQL channel layer tables not reachable - {e}")
+
+    async def asyncSetUp(self):
+        self.sender = PostgresChannelLayer(database=DATABASE)
+        self.receiver = PostgresChannelLayer(database=DATABASE)
+        self.memberships = []
+
+    async def asyncTearDown(self):
+        for layer, group, channel in self.memberships:
+            await layer.group_discard(group, channel)
+        await self.sender.close()
+        await self.receiver.close()
+        pool = await asyncConnection.get_pool(DATABASE)
+        await pool.close()
+
+    async def join(self, layer, group=None):
+        group = group or f"test.{uuid.uuid4().hex}"
+        channel = await layer.new_channel()
+        await layer.group_add(group, channel)
+        self.memberships.append((layer, group, channel))
+        return group, channel
+
+    async def receiving(self, layer, channel):
+        # receive() starts the layer's LISTEN task; wait for it so nothing is published before
+        task = asyncio.ensure_future(layer.receive(channel))
+        await asyncio.wait_for(layer.listening.wait(), TIMEOUT)
+        return task
+
+    ################################################ GROUPS ################################################
+
+    async def test_group_send_reaches_another_process(self):
+        group, channel = await self.join(self.receiver)
+        received = await self.receiving(self.receiver, channel)
+        await self.sender.group_send(group, {"type": "db.change", "text": "hello"})
+        self.assertEqual(await asyncio.wait_for(received, TIMEOUT), {"type": "db.change", "text": "hello"})
+
+    async def test_group_send_stores_bodies_too_large_for_notify(self):
+        group, channel = await self.join(self.receiver)
+        received = await self.receiving(self.receiver, channel)
+        message = {"type": "db.change", "text": "x" * NOTIFY_LIMIT}
+        await self.sender.group_send(group, message)
+        self.assertEqual(await asyncio.wait_for(received, TIMEOUT), message)
+
+    async def test_group_send_many_delivers_to_every_group(self):
+        remote_group, remote_channel = await self.join(self.receiver)
+        local_group, local_channel = await self.join(self.sender)
+        remote = await self.receiving(self.receiver, remote_channel)
+        local = asyncio.ensure_future(self.sender.receive(local_channel))
+
+        shared = {"type": "db.change", "text": "both"}
+        await self.sender.group_send_many([
+            (remote_group, shared),
+            (local_group, shared),
+            (f"test.{uuid.uuid4().hex}", {"type": "db.change", "text": "nobody"}),
+        ])
+        self.assertEqual(await asyncio.wait_for(remote, TIMEOUT), shared)
+        self.assertEqual(await asyncio.wait_for(local, TIMEOUT), shared)
+
+    async def test_messages_for_departed_channels_are_dropped(self):
+        group, channel = await self.join(self.receiver)
+        received = await self.receiving(self.receiver, channel)
+        received.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await received
+        # Still a member (a consumer leaves its groups after its receive is cancelled)
+        arrived = asyncio.Event()
+        on_notify = self.receiver._on_notify
+
+        async def observed(notify):
+            await on_notify(notify)
+            arrived.set()
+
+        self.receiver._on_notify = observed
+        await self.sender.group_send(group, {"type": "db.change", "text": "late"})
+        await asyncio.wait_for(arrived.wait(), TIMEOUT)
+        self.assertNotIn(channel, self.receiver._queues)
+        self.assertNotIn(channel, self.receiver._waiters)
+
+    async def test_active_groups_only_returns_groups_with_members(self):
+        group, _ = await self.join(self.receiver)
+        empty = f"test.{uuid.uuid4().hex}"
+        self.assertEqual(await self.sender.active_groups({group, empty}), {group})
+
+
+class FanOutLeadershipTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        try:
+            PostgreSQLListener().get_connection().close()
+        except Exception as e:
+            raise unittest.SkipTest(f"PostgreSQL not reachable - {e}")
+
+    def test_one_listener_leads_until_its_connection_closes(self):
+        first, second = PostgreSQLListener(), PostgreSQLListener()
+        first.conn = first.get_connection()
+        second.conn = second.get_connection()
+        try:
+            self.assertTrue(first._try_lead())
+            self.assertFalse(second._try_lead())
+            # The advisory lock goes with the connection, as when a process dies; the server
+            # releases it once it notices the session ended
+            first._close()
+            deadline = time.monotonic() + TIMEOUT
+            leader = second._try_lead()
+            while not leader and time.monotonic() < deadline:
+                time.sleep(0.05)
+                leader = second._try_lead()
+            self.assertTrue(leader)
+        finally:
+            first._close()
+            second._close()
+
+
+def change(row_id, operation="UPDATE", **values):
+    # Channel layer event as the listener builds it with CARRY_ROWS on
+    row = json.dumps({"id": row_id, **values})
+    message_type, text = change_frame("profiles", operation, [row])
+    return {"type": message_type, "table": "profiles", "operation": operation, "text": text, "keys": str(row_id), "rows": row}
+
+
+class ConsumerTestCase(unittest.IsolatedAsyncioTestCase):
+    # A consumer whose socket records frames like daphne does (send() never waits on the client),
+    # subscribed to every change of profiles; acks only happen when a test sends them
+
+    async def asyncSetUp(self):
+        self.frames = []
+        self.closed = None
+        consumer = DatabaseChangesConsumer()
+        consumer.scope = {}
+        consumer.channel_layer = None
+
+        async def accept():
+            pass
+
+        async def send(text_data):
+            self.frames.append(json.loads(text_data))
+
+        async def close(code=None):
+            self.closed = code
+
+        consumer.accept, consumer.send, consumer.close = accept, send, close
+        await consumer.connect()
+        consumer.subscriptions = {"profiles": {"operations": set(OPERATIONS), "keys": None}}
+        self.consumer = consumer
+        await self.settle()
+
+    async def asyncTearDown(self):
+        await self.consumer.disconnect(1000)
+
+    async def settle(self):
+        await asyncio.sleep(0.01)
+
+    async def ack(self):
+        # Acknowledge everything received so far, as useWebSocket does
+        self.consumer._ack(len(self.frames))
+        await self.settle()
+
+    def changes(self):
+        # Rows received, in order, from db_change and db_change_batch frames
+        rows = []
+        for frame in self.frames:
+            if frame["type"] == "db_change":
+                rows.append(frame["data"])
+            elif frame["type"] == "db_change_batch":
+                rows.extend(frame["data"])
+        return rows
+
+
+@mock.patch.object(consumers, "ACK_WINDOW", 4)
+@mock.patch.object(consumers, "QUEUE_MAX_MESSAGES", 10)
+class ConsumerFlowControlTests(ConsumerTestCase):
+
+    ################################################ ACKS ################################################
+
+    async def test_client_that_never_acks_only_gets_the_window(self):
+        with mock.patch.object(consumers, "QUEUE_POLICY", "drop_oldest"):
+            for row_id in range(50):
+                await self.consumer._forward(change(row_id, firstname="x"))
+            await self.settle()
+
+        self.assertEqual(len(self.frames), 4)
+        self.assertLessEqual(self.consumer._depth(), 10)
+        self.assertGreater(self.consumer.stats["dropped"], 0)
+        self.assertEqual(consumers.send_budget.used,
+                         sum(entry[1] for entry in self.consumer.outbox) + sum(entry[0] for entry in self.consumer.unacked))
+
+    async def test_acks_let_the_rest_through_and_report_the_drops(self):
+        with mock.patch.object(consumers, "QUEUE_POLICY", "drop_oldest"):
+            for row_id in range(50):
+                await self.consumer._forward(change(row_id, firstname="x"))
+            await self.settle()
+            while self.consumer._depth():
+                await self.ack()
+
+        self.assertEqual(self.frames[-1], {"type": "resync_required", "table": "profiles"})
+        self.assertEqual(self.consumer.stats["acked"], len(self.frames))
+        self.assertEqual(consumers.send_budget.used, 0)
+
+    async def test_disconnect_policy_closes_a_client_that_never_acks(self):
+        with mock.patch.object(consumers, "QUEUE_POLICY", "disconnect"):
+            for row_id in range(20):
+                await self.consumer._forward(change(row_id, firstname="x"))
+            await self.settle()
+
+        self.assertEqual(self.closed, SLOW_CLIENT_CLOSE_CODE)
+        self.assertEqual(self.frames[-1], {"type": "slow_client", "resume": True})
+
+    async def test_client_that_stops_acking_is_closed_after_the_ack_timeout(self):
+        with mock.patch.object(consumers, "ACK_TIMEOUT", 0.05):
+            await self.consumer._forward(change(1, firstname="x"))
+            await self.settle()
+            await self.ack()
+            await self.consumer._forward(change(2, firstname="y"))
+            await asyncio.sleep(0.03)
+            self.assertIsNone(self.closed)
+            await asyncio.sleep(0.1)
+
+        self.assertEqual(self.closed, SLOW_CLIENT_CLOSE_CODE)
+        self.assertEqual(self.frames[-1], {"type": "slow_client", "resume": True})
+
+    async def test_coalesce_policy_merges_while_the_client_does_not_ack(self):
+        with mock.patch.object(consumers, "QUEUE_POLICY", "coalesce"):
+            for version in range(50):
+                await self.consumer._forward(change(version % 20, firstname=f"v{version}"))
+            await self.settle()
+            self.assertEqual(len(self.frames), 4)
+            while self.consumer._depth() or self.consumer.pending:
+                await self.ack()
+
+        # Every row ends on its latest value
+        latest = {}
+        for row in self.changes():
+            latest[row["id"]] = row["firstname"]
+        self.assertEqual(latest, {row_id: f"v{row_id + 40 if row_id < 10 else row_id + 20}" for row_id in range(20)})
+
+
+class ConsumerCoalescingTests(ConsumerTestCase):
+
+    async def flushed(self, *events):
+        # Changes stay pending for the whole window, then go out as one flush
+        with mock.patch.object(consumers, "COALESCE_WINDOW", 60):
+            for event in events:
+                await self.consumer._forward(event)
+            self.consumer._flush()
+            await self.settle()
+        return [(frame["operation"], frame["data"]) for frame in self.frames if "operation" in frame]
+
+    ################################################ MERGE RULES ################################################
+
+    async def test_delete_is_never_overwritten(self):
+        frames = await self.flushed(
+            change(1, "UPDATE", firstname="a"),
+            change(1, "DELETE"),
+            change(1, "UPDATE", firstname="b"),
+            change(2, "INSERT", firstname="c"),
+            change(2, "DELETE"),
+        )
+        self.assertEqual(frames, [("DELETE", [{"id": 1}, {"id": 2}])])
+
+    async def test_insert_then_update_stays_an_insert_with_the_latest_values(self):
+        frames = await self.flushed(
+            change(1, "INSERT", firstname="a", email="a@example.com"),
+            change(1, "UPDATE", firstname="b"),
+        )
+        self.assertEqual(frames, [("INSERT", {"id": 1, "firstname": "b", "email": "a@example.com"})])
+
+    async def test_updates_merge_their_changed_columns(self):
+        frames = await self.flushed(
+            change(1, "UPDATE", firstname="a"),
+            change(2, "UPDATE", firstname="x"),
+            change(1, "UPDATE", lastname="l"),
+            change(1, "UPDATE", firstname="b"),
+        )
+        self.assertEqual(frames, [("UPDATE", [{"id": 1, "firstname": "b", "lastname": "l"}, {"id": 2, "firstname": "x"}])])
+
+    ################################################ ORDERING ################################################
+
+    @mock.patch.object(consumers, "QUEUE_POLICY", "coalesce")
+    @mock.patch.object(consumers, "QUEUE_MAX_MESSAGES", 2)
+    @mock.patch.object(consumers, "ACK_WINDOW", 1)
+    async def test_change_after_room_opens_does_not_overtake_pending_rows(self):
+        await self.ack()
+        # "a" is sent, "b" queued, "old" merged while the client is behind
+        for value in ("a", "b", "old"):
+            await self.consumer._forward(change(1, firstname=value))
+        await self.settle()
+        self.assertEqual(self.consumer.pending, {("profiles", "1"): ("UPDATE", json.dumps({"id": 1, "firstname": "old"}))})
+        # The ack makes room before _writer gets to flush "old": "new" must still go out after it
+        self.consumer._ack(len(self.frames))
+        await self.consumer._forward(change(1, firstname="new"))
+        await self.settle()
+        while self.consumer._depth() or self.consumer.pending:
+            await self.ack()
+
+        self.assertEqual([row["firstname"] for row in self.changes()], ["a", "b", "new"])
@@ -29,6 +29,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryTracingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -60,12 +61,29 @@ TEMPLATES = [
 WSGI_APPLICATION = 'project1.wsgi.application'
 ASGI_APPLICATION = 'project1.asgi.application'
 
-# Channels configuration (using in-memory for single-server, no Redis needed)
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer"
+# Channels configuration: in-memory for a single process, postgres to run several daphne processes
+# (no Redis needed, see core/layers.py)
+if config('CHANNEL_LAYER', default='memory') == 'postgres':
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "core.layers.PostgresChannelLayer",
+            "CONFIG": {
+                "database": "project1",
+                "capacity": config('CHANNEL_LAYER_CAPACITY', default=100, cast=int),
+                "expiry": config('CHANNEL_LAYER_EXPIRY', default=60, cast=int),
+            },
+        }
     }
-}
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer"
+        }
+    }
+
+# core.sessions keeps sessions in PostgreSQL (psql/scripts/04_sessions.sql) with a short in-process
+# read cache; django.contrib.sessions.backends.db is Django's default on db.sqlite3
+SESSION_ENGINE = config('SESSION_ENGINE', default='core.sessions')
 
 DATABASES = {
     'default': {
@@ -1,4 +1,5 @@
 import React, { useState, useCallback } from 'react';
+import axios from 'axios';
 import '../../styles/index/HomePage.css';
 import Footer from '../layout/Footer';
 import { useAuth } from '../../contexts/AuthContext';
@@ -36,14 +37,31 @@ const HomePage = () => {
     const [saveMessage, setSaveMessage] = useState('');
     const [realtimeFirstname, setRealtimeFirstname] = useState(null);
 
+    const refetchFirstname = useCallback(() => {
+        axios.get('/api/profile/', { withCredentials: true })
+            .then((response) => setRealtimeFirstname(response.data.profile.firstname))
+            .catch(() => {});
+    }, []);
+
     // Listen for real-time profile changes
     const handleProfileChange = useCallback((change) => {
-        if (change.operation === 'UPDATE' && change.data?.email === user?.email) {
+        if (change.operation !== 'UPDATE' || change.data?.email !== user?.email) return;
+
+        // UPDATE events only carry the columns that changed
+        if (change.data._refetch) {
+            refetchFirstname();
+        } else if ('firstname' in change.data) {
             setRealtimeFirstname(change.data.firstname);
         }
-    }, [user?.email]);
+    }, [user?.email, refetchFirstname]);
 
-    const { isConnected } = useTableChanges('profiles', handleProfileChange, isLoggedIn);
+    // Only this user's own profile updates are sent by the server
+    const { isConnected } = useTableChanges('profiles', handleProfileChange, isLoggedIn && !!user?.email, {
+        operations: ['UPDATE'],
+        keyField: 'email',
+        key: user?.email,
+        onResync: refetchFirstname
+    });
 
     React.useEffect(() => {
         if (user?.firstname) {
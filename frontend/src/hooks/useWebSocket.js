@@ -26,6 +26,11 @@ export const useWebSocket = (options = {}) => {
     const reconnectAttempts = useRef(0);
     const maxReconnectAttempts = 10;
     const baseReconnectDelay = 1000;
+    // Frames handled on this socket, acknowledged to the server so it only sends a bounded window
+    // ahead of what was actually processed (acks go out once per burst, or every ackEvery frames)
+    const framesRef = useRef(0);
+    const ackTimerRef = useRef(null);
+    const ackEvery = 16;
     const enabledRef = useRef(enabled);
     
     useEffect(() => {
@@ -47,7 +52,23 @@ export const useWebSocket = (options = {}) => {
         
         try {
             const url = getWebSocketUrl();
-            wsRef.current = new WebSocket(url);
+            const ws = new WebSocket(url);
+            wsRef.current = ws;
+            framesRef.current = 0;
+            clearTimeout(ackTimerRef.current);
+            ackTimerRef.current = null;
+            let ackedFrames = 0;
+
+            const ack = () => {
+                if (ackTimerRef.current) {
+                    clearTimeout(ackTimerRef.current);
+                    ackTimerRef.current = null;
+                }
+                if (ws.readyState === WebSocket.OPEN && framesRef.current > ackedFrames) {
+                    ackedFrames = framesRef.current;
+                    ws.send(JSON.stringify({ type: 'ack', frames: ackedFrames }));
+                }
+            };
 
             wsRef.current.onopen = () => {
                 setIsConnected(true);
@@ -80,6 +101,13 @@ export const useWebSocket = (options = {}) => {
                 } catch (e) {
                     // Silent fail on parse error
                 }
+                // Counted once handled, so the ack reflects what this client has really processed
+                framesRef.current++;
+                if (framesRef.current - ackedFrames >= ackEvery) {
+                    ack();
+                } else if (!ackTimerRef.current) {
+                    ackTimerRef.current = setTimeout(ack, 0);
+                }
             };
         } catch (error) {
             // Silent fail on connection error
@@ -87,6 +115,10 @@ export const useWebSocket = (options = {}) => {
     }, [getWebSocketUrl]);
 
     const disconnect = useCallback(() => {
+        if (ackTimerRef.current) {
+            clearTimeout(ackTimerRef.current);
+            ackTimerRef.current = null;
+        }
         if (reconnectTimeoutRef.current) {
             clearTimeout(reconnectTimeoutRef.current);
             reconnectTimeoutRef.current = null;
@@ -122,31 +154,92 @@ export const useWebSocket = (options = {}) => {
 
 /**
  * Hook to subscribe to changes on specific tables.
+ * data is the whole row for INSERT and DELETE; for UPDATE it holds the row's keys plus only the
+ * columns that changed. Rows too large to send arrive as keys with _refetch: true.
+ * The server only sends what was subscribed to; filter narrows it further:
+ * { operations: ['UPDATE'], keyField: 'email', key: 'someone@example.com' }
+ * After a reconnect, changes missed in between are replayed (they may repeat ones already seen).
+ * filter.onResync is called when too much was missed and the data should be reloaded instead.
  */
-export const useTableChanges = (tables, onTableChange, enabled = true) => {
+export const useTableChanges = (tables, onTableChange, enabled = true, filter = {}) => {
     const tableList = Array.isArray(tables) ? tables : [tables];
     const tableListRef = useRef(tableList);
     const onTableChangeRef = useRef(onTableChange);
+    const onResyncRef = useRef(filter.onResync);
+    // Highest change log sequence received, sent back as resume_from when resubscribing
+    const lastSeqRef = useRef(null);
     
     useEffect(() => {
         tableListRef.current = tableList;
         onTableChangeRef.current = onTableChange;
-    }, [tableList, onTableChange]);
+        onResyncRef.current = filter.onResync;
+    }, [tableList, onTableChange, filter.onResync]);
 
     const handleMessage = useCallback((message) => {
-        if (message.type === 'db_change' && tableListRef.current.includes(message.table)) {
+        if (!tableListRef.current.includes(message.table)) return;
+
+        const deliver = (data) => {
+            if (data?._seq > (lastSeqRef.current ?? 0)) {
+                lastSeqRef.current = data._seq;
+            }
             onTableChangeRef.current?.({
                 table: message.table,
                 operation: message.operation,
-                data: message.data
+                data
             });
+        };
+
+        if (message.type === 'db_change') {
+            deliver(message.data);
+        } else if (message.type === 'db_change_batch') {
+            // One message per SQL statement; state updates made here are batched into one render
+            (message.data || []).forEach(deliver);
+        } else if (message.type === 'subscribed' && message.last_seq != null && lastSeqRef.current === null) {
+            lastSeqRef.current = message.last_seq;
+        } else if (message.type === 'replay_complete') {
+            lastSeqRef.current = Math.max(lastSeqRef.current ?? 0, message.last_seq);
+        } else if (message.type === 'resync_required') {
+            lastSeqRef.current = null;
+            onResyncRef.current?.(message.table);
         }
     }, []);
 
-    return useWebSocket({
+    const socket = useWebSocket({
         onMessage: handleMessage,
         enabled
     });
+    const { isConnected, sendMessage } = socket;
+
+    // Stable across renders so the effect below only runs when the subscription really changes
+    const subscriptionKey = JSON.stringify({
+        tables: tableList,
+        operations: filter.operations || null,
+        keyField: filter.keyField || null,
+        key: filter.key ?? null
+    });
+
+    // (Re)subscribe on every connect and whenever the subscription changes
+    useEffect(() => {
+        if (!isConnected) return;
+        const { tables: subscribedTables, operations, keyField, key } = JSON.parse(subscriptionKey);
+        const messages = subscribedTables.map((table) => ({
+            table,
+            ...(operations && { operations }),
+            ...(key !== null && { key, key_field: keyField })
+        }));
+
+        const resumeFrom = lastSeqRef.current;
+        messages.forEach((message) => sendMessage({
+            type: 'subscribe',
+            ...message,
+            ...(resumeFrom !== null && { resume_from: resumeFrom })
+        }));
+        return () => {
+            messages.forEach((message) => sendMessage({ type: 'unsubscribe', table: message.table, ...(message.key !== undefined && { key: message.key, key_field: message.key_field }) }));
+        };
+    }, [isConnected, subscriptionKey, sendMessage]);
+
+    return socket;
 };
 
 export default useWebSocket;
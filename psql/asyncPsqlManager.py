@@ -0,0 +1,256 @@
+# Standard imports
+from datetime import datetime
+
+# Custom imports
+from psql.config import asyncConnection, Logging
+from psql.requests import asyncPsqlAuthReq, asyncPsqlChangesReq, asyncPsqlSessionsReq
+from psql.models.auth import profiles, registrations, roles
+from psql.cache import profileCache, roleCache
+
+# Asyncio twin of psqlManager.Manager for async views and consumers.
+# Usage: async with asyncPsqlManager.Manager(__name__) as manager: ...
+
+class Manager:
+    def __init__(self, file_name: str):
+
+        # Logger
+        self.logger = Logging.Logger(__name__).get()
+
+        self.file_name = file_name
+        self.auth_connection = asyncConnection.main()
+        self.auth_manager = None
+        self.changes_manager = None
+        self.sessions_manager = None
+
+
+    async def open(self):
+        # The pooled connection is borrowed on the first query (see asyncConnection.main.bind)
+        self.auth_connection.bind("project1")
+
+        # Requests manager
+        self.auth_manager = asyncPsqlAuthReq.Requests(self.auth_connection)
+        self.changes_manager = asyncPsqlChangesReq.Requests(self.auth_connection)
+        self.sessions_manager = asyncPsqlSessionsReq.Requests(self.auth_connection)
+
+        self.logger.debug("AsyncPsqlManager initialized for: %s", self.file_name)
+        return self
+
+    async def close(self):
+        # Hands the connection back to the pool
+        await self.auth_connection.close()
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+###################################################################### AUTHENTICATION ######################################################################
+
+
+    ################################################ PROFILES ################################################
+
+    async def getProfile(self, unique_identifier: str = None, email: str = None):
+        if not unique_identifier and not email:
+            raise ValueError("No unique identifier or email provided")
+
+        return await self.auth_manager.getProfile(unique_identifier, email)
+
+    async def getProfileWithRole(self, unique_identifier: str = None, email: str = None):
+        # Returns (profile, role_name); (None, None) when the profile does not exist
+        if not unique_identifier and not email:
+            raise ValueError("No unique identifier or email provided")
+
+        return await self.auth_manager.getProfileWithRole(unique_identifier, email)
+
+    # Batched lookups return {identifier: model or None} in request order, one query per chunk_size ids
+
+    async def getProfilesByIds(self, unique_identifiers: list, chunk_size: int = 1000):
+        return await self.auth_manager.getProfilesByIds(unique_identifiers, chunk_size)
+
+    async def getProfilesByEmails(self, emails: list, chunk_size: int = 1000):
+        return await self.auth_manager.getProfilesByEmails(emails, chunk_size)
+
+    async def getProfiles(self):
+        return await self.auth_manager.getProfiles()
+
+    async def getActiveProfiles(self):
+        return await self.auth_manager.getActiveProfiles()
+
+    async def getDeleteProfiles(self):
+        return await self.auth_manager.getDeleteProfiles()
+
+    async def createProfile(self, unique_identifier: str, email: str, password: str, firstname: str, lastname: str, role_id: int, status: str, signup_type: str):
+        return await self.auth_manager.createProfile(unique_identifier, email, password, firstname, lastname, role_id, status, signup_type)
+
+    ################################################ REGISTRATIONS ################################################
+
+    async def getRegistration(self, unique_identifier: str = None, email: str = None):
+        if not unique_identifier and not email:
+            raise ValueError("No unique identifier or email provided")
+
+        return await self.auth_manager.getRegistration(unique_identifier, email)
+
+    async def getRegistrationsByIds(self, unique_identifiers: list, chunk_size: int = 1000):
+        return await self.auth_manager.getRegistrationsByIds(unique_identifiers, chunk_size)
+
+    async def getRegistrations(self):
+        return await self.auth_manager.getRegistrations()
+
+    async def getInactiveRegistrations(self):
+        return await self.auth_manager.getInactiveRegistrations()
+
+    async def createRegistration(self, email: str, firstname: str, lastname: str, status: str, signup_type: str):
+        return await self.auth_manager.createRegistration(email, firstname, lastname, status, signup_type)
+
+    ################################################ ROLES ################################################
+
+    async def getRole(self, role_id: int = None, role_name: str = None):
+        if not role_id and not role_name:
+            raise ValueError("No role id or role name provided")
+
+        return await self.auth_manager.getRole(role_id, role_name)
+
+    async def getRoles(self):
+        return await self.auth_manager.getRoles()
+
+    async def createRole(self, role_name: str):
+        role = await self.auth_manager.createRole(role_name)
+        roleCache.cache.invalidate()
+        return role
+
+    async def refreshRoles(self):
+        # Drops and reloads the role cache (listener startup / reconnect)
+        roleCache.cache.invalidate()
+        return await self.auth_manager.loadRoles()
+
+    ###################################################################### UPDATES ######################################################################
+
+    async def update(self, model_object: object):
+        if isinstance(model_object, profiles.User):
+            result = await self.auth_manager.updateProfile(model_object)
+            profileCache.cache.invalidate(model_object.unique_identifier, model_object.email)
+            return result
+        elif isinstance(model_object, registrations.User):
+            return await self.auth_manager.updateRegistration(model_object)
+        elif isinstance(model_object, roles.Role):
+            role = await self.auth_manager.updateRole(model_object)
+            roleCache.cache.invalidate()
+            return role
+
+    async def updatePassword(self, profileUser: profiles.User, new_password: str):
+        # Replaces profileUser.password and nothing else; False when the stored value has changed since it was read
+        updated = await self.auth_manager.updateProfilePassword(profileUser.unique_identifier, profileUser.password, new_password)
+        profileCache.cache.invalidate(profileUser.unique_identifier, profileUser.email)
+        return updated
+
+
+
+###################################################################### BULK ######################################################################
+
+    # One statement per call instead of one statement, commit and NOTIFY per row.
+    # Each returns the unique_identifiers that were actually affected.
+
+    async def bulkUpdateStatus(self, unique_identifiers: list, status: str, model_class: type = profiles.User):
+        unique_identifiers = [str(unique_identifier) for unique_identifier in unique_identifiers]
+        if model_class is profiles.User:
+            updated = await self.auth_manager.bulkUpdateProfileStatus(unique_identifiers, status)
+            for unique_identifier in updated:
+                profileCache.cache.invalidate(unique_identifier)
+            return updated
+        elif model_class is registrations.User:
+            return await self.auth_manager.bulkUpdateRegistrationStatus(unique_identifiers, status)
+        raise ValueError(f"Bulk status updates are not supported for {model_class.__name__}")
+
+    async def bulkDelete(self, unique_identifiers: list, model_class: type = profiles.User):
+        unique_identifiers = [str(unique_identifier) for unique_identifier in unique_identifiers]
+        if model_class is profiles.User:
+            deleted = await self.auth_manager.bulkDeleteProfiles(unique_identifiers)
+            for unique_identifier in deleted:
+                profileCache.cache.invalidate(unique_identifier)
+            return deleted
+        elif model_class is registrations.User:
+            return await self.auth_manager.bulkDeleteRegistrations(unique_identifiers)
+        raise ValueError(f"Bulk deletes are not supported for {model_class.__name__}")
+
+    async def bulkUpdate(self, model_objects: list):
+        profileUsers = [model_object for model_object in model_objects if isinstance(model_object, profiles.User)]
+        registrationUsers = [model_object for model_object in model_objects if isinstance(model_object, registrations.User)]
+
+        updated = []
+        if profileUsers:
+            updated += await self.auth_manager.bulkUpdateProfiles(profileUsers)
+            for profileUser in profileUsers:
+                profileCache.cache.invalidate(profileUser.unique_identifier, profileUser.email)
+        if registrationUsers:
+            updated += await self.auth_manager.bulkUpdateRegistrations(registrationUsers)
+        return updated
+
+
+
+###################################################################### EXPORT ######################################################################
+
+    def streamProfiles(self, format: str = "csv"):
+        # Async iterator of raw COPY TO STDOUT chunks, for StreamingHttpResponse
+        if format not in asyncPsqlAuthReq.EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {format}")
+        return self.auth_manager.streamProfiles(format)
+
+
+
+###################################################################### DELETES ######################################################################
+
+    async def delete(self, model_object: object):
+        if isinstance(model_object, profiles.User):
+            result = await self.auth_manager.deleteProfile(model_object)
+            profileCache.cache.invalidate(model_object.unique_identifier, model_object.email)
+            return result
+        elif isinstance(model_object, registrations.User):
+            return await self.auth_manager.deleteRegistration(model_object)
+        elif isinstance(model_object, roles.Role):
+            deleted = await self.auth_manager.deleteRole(model_object)
+            roleCache.cache.invalidate()
+            return deleted
+
+
+
+###################################################################### CHANGE LOG ######################################################################
+
+    async def getChangesSince(self, table: str, operations: list, after_seq: int, limit: int = 1000):
+        return await self.changes_manager.getChangesSince(table, operations, after_seq, limit)
+
+    async def getOldestChangeSeq(self):
+        return await self.changes_manager.getOldestChangeSeq()
+
+    async def getLatestChangeSeq(self):
+        return await self.changes_manager.getLatestChangeSeq()
+
+    async def pruneChangeLog(self, retention_seconds: float):
+        count = await self.changes_manager.pruneChangeLog(retention_seconds)
+        self.logger.info(f"Pruned {count} change log entries")
+        return count
+
+
+
+###################################################################### SESSIONS ######################################################################
+
+    async def getSession(self, session_key: str):
+        return await self.sessions_manager.getSession(session_key)
+
+    async def sessionExists(self, session_key: str):
+        return await self.sessions_manager.sessionExists(session_key)
+
+    async def createSession(self, session_key: str, session_data: str, expire_date):
+        return await self.sessions_manager.createSession(session_key, session_data, expire_date)
+
+    async def updateSession(self, session_key: str, session_data: str, expire_date):
+        return await self.sessions_manager.updateSession(session_key, session_data, expire_date)
+
+    async def deleteSession(self, session_key: str):
+        return await self.sessions_manager.deleteSession(session_key)
+
+    async def deleteExpiredSessions(self):
+        count = await self.sessions_manager.deleteExpiredSessions()
+        self.logger.info(f"Deleted {count} expired sessions")
+        return count
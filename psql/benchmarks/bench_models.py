@@ -0,0 +1,85 @@
+# Micro-benchmark: dict rows + __dict__ models (legacy) vs tuple rows + __slots__ models.
+# Usage (from the repository root): python -m psql.benchmarks.bench_models [rows]
+
+# Standard imports
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+# Custom imports
+from psql.models.auth import profiles
+
+COLUMNS = ('id', 'unique_identifier', 'role_id', 'email', 'password', 'firstname', 'lastname',
+           'status', 'reference_id', 'signup_type', 'created_at')
+
+
+class LegacyUser:
+    # The pre-__slots__ profiles.User: defaults first, then setattr from a dict row
+    def __init__(self, profile_data: dict = None):
+        self.id = ""
+        self.unique_identifier = ""
+        self.role_id = ""
+        self.email = ""
+        self.password = ""
+        self.firstname = ""
+        self.lastname = ""
+        self.status = ""
+        self.reference_id = ""
+        self.signup_type = ""
+        self.created_at = ""
+
+        if profile_data:
+            for key, value in profile_data.items():
+                setattr(self, key, value)
+
+
+def make_rows(count: int):
+    created_at = datetime(2024, 1, 1, 12, 0, 0)
+    return [
+        (i, f"uid-{i}", 2, f"user{i}@example.com", "secret", "First", "Last", "active", None, "custom", created_at)
+        for i in range(count)
+    ]
+
+
+def legacy(rows):
+    # What database.main.execute + Requests did: dict per row, then a model per dict
+    results = [dict(zip(COLUMNS, row)) for row in rows]
+    return [LegacyUser(result) for result in results]
+
+
+def compact(rows):
+    build = profiles.User.rowFactory(COLUMNS)
+    return [build(row) for row in rows]
+
+
+def measure(label: str, func, rows, count: int):
+    func(rows[:100])  # warm up
+
+    start = time.perf_counter()
+    func(rows)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    result = func(rows)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    print(f"{label:<28} {elapsed / count * 1e9:>10.0f} ns/row {current / count:>10.0f} B/row retained {peak / count:>10.0f} B/row peak")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rows = make_rows(count)
+
+    print(f"{count} rows")
+    measure("dict rows + __dict__ model", legacy, rows, count)
+    measure("tuple rows + __slots__ model", compact, rows, count)
+
+
+if __name__ == "__main__":
+    main()
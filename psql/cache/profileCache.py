@@ -0,0 +1,134 @@
+# Standard imports
+from collections import OrderedDict
+from decouple import config
+import threading
+import time
+
+# Custom imports
+from psql.models.auth import profiles
+
+# Bounded LRU/TTL read-through cache of profile rows, addressable by unique_identifier or email.
+# Each entry is stored once under its unique_identifier with an email -> unique_identifier index,
+# so evicting or invalidating through either key always drops both.
+# Invalidated by profiles_notify_trigger events and by Manager.update/delete; while the listener
+# is down entries only live for the shorter fallback TTL.
+
+class ProfileCache:
+    def __init__(self, max_size: int, ttl: float, fallback_ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.fallback_ttl = fallback_ttl
+        self.listening = False
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # unique_identifier -> (email, values, stored_at), LRU order
+        self._by_email = {}             # email -> unique_identifier
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    ################################################ FUNCTIONS ################################################
+
+    def beginLoad(self):
+        # Generation token: a row read before an invalidation is never stored after it
+        return self._generation
+
+    def put(self, profileUser: profiles.User, generation: int):
+        if self.max_size <= 0:
+            return False
+        values = tuple(getattr(profileUser, field) for field in profiles.User.__slots__)
+        unique_identifier = profileUser.unique_identifier
+        email = profileUser.email
+
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self._remove(unique_identifier)
+            previous = self._by_email.get(email)
+            if previous is not None:
+                self._remove(previous)
+
+            self._entries[unique_identifier] = (email, values, time.monotonic())
+            self._by_email[email] = unique_identifier
+            self.stores += 1
+
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, unique_identifier: str = None, email: str = None):
+        with self._lock:
+            self._generation += 1
+            if unique_identifier:
+                self._remove(str(unique_identifier))
+            if email:
+                by_email = self._by_email.get(email)
+                if by_email is not None:
+                    self._remove(by_email)
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._by_email.clear()
+            self.invalidations += 1
+
+    def setListening(self, listening: bool):
+        self.listening = listening
+        if not listening:
+            # Events may have been missed while disconnected
+            self.clear()
+
+    def _remove(self, unique_identifier: str):
+        # Caller holds the lock
+        entry = self._entries.pop(unique_identifier, None)
+        if entry is not None and self._by_email.get(entry[0]) == unique_identifier:
+            del self._by_email[entry[0]]
+
+    ################################################ GETTERS ################################################
+
+    def get(self, unique_identifier: str = None, email: str = None):
+        ttl = self.ttl if self.listening else self.fallback_ttl
+        with self._lock:
+            key = str(unique_identifier) if unique_identifier else self._by_email.get(email)
+            entry = self._entries.get(key) if key is not None else None
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.monotonic() - entry[2] >= ttl:
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        # Hand out a fresh model each time so callers can mutate it safely
+        return profiles.User.rowFactory(profiles.User.__slots__)(entry[1])
+
+    def getStats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'listening': self.listening,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
+
+
+cache = ProfileCache(
+    max_size=config('PSQL_PROFILE_CACHE_SIZE', default=10000, cast=int),
+    ttl=config('PSQL_PROFILE_CACHE_TTL', default=300.0, cast=float),
+    fallback_ttl=config('PSQL_PROFILE_CACHE_FALLBACK_TTL', default=5.0, cast=float)
+)
@@ -0,0 +1,111 @@
+# Standard imports
+from decouple import config
+import threading
+import time
+
+# Custom imports
+from psql.models.auth import roles
+
+# In-process copy of the roles table (a handful of rows that almost never change).
+# Invalidated by the roles_notify_trigger events PostgreSQLListener receives; while the listener is
+# not connected, entries only live for the shorter fallback TTL so missed events cannot stick.
+
+class RoleCache:
+    def __init__(self, ttl: float, fallback_ttl: float):
+        self.ttl = ttl
+        self.fallback_ttl = fallback_ttl
+        self.listening = False
+
+        self._lock = threading.Lock()
+        self._by_id = {}
+        self._by_name = {}
+        self._loaded_at = None
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.invalidations = 0
+
+    ################################################ FUNCTIONS ################################################
+
+    def isFresh(self):
+        loaded_at = self._loaded_at
+        if loaded_at is None:
+            return False
+        ttl = self.ttl if self.listening else self.fallback_ttl
+        return time.monotonic() - loaded_at < ttl
+
+    def beginLoad(self):
+        # Generation token: a load that raced with an invalidation is discarded
+        return self._generation
+
+    def load(self, all_roles: list, generation: int):
+        by_id = {role.id: (role.id, role.name) for role in all_roles}
+        by_name = {role.name: (role.id, role.name) for role in all_roles}
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self._by_id = by_id
+            self._by_name = by_name
+            self._loaded_at = time.monotonic()
+            self.loads += 1
+            return True
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._loaded_at = None
+            self._by_id = {}
+            self._by_name = {}
+            self.invalidations += 1
+
+    def setListening(self, listening: bool):
+        self.listening = listening
+        if not listening:
+            # Events may have been missed while disconnected
+            self.invalidate()
+
+    ################################################ GETTERS ################################################
+
+    def get(self, role_id: int = None, role_name: str = None):
+        # Only meaningful while isFresh(): the whole table is cached, so a miss means "no such role"
+        entry = self._by_id.get(int(role_id)) if role_id else self._by_name.get(role_name)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Hand out a fresh model each time so callers can mutate it safely
+        return roles.Role.rowFactory(('id', 'name'))(entry)
+
+    def find(self, all_roles: list, role_id: int = None, role_name: str = None):
+        # Lookup in a list just read from the table; it may be newer than what load() kept
+        self.misses += 1
+        for role in all_roles:
+            if (role.id == int(role_id)) if role_id else (role.name == role_name):
+                return role
+        return None
+
+    def getAll(self):
+        self.hits += 1
+        build = roles.Role.rowFactory(('id', 'name'))
+        return [build(entry) for entry in sorted(self._by_id.values())]
+
+    def getStats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._by_id),
+            'fresh': self.isFresh(),
+            'listening': self.listening,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'loads': self.loads,
+            'invalidations': self.invalidations
+        }
+
+
+cache = RoleCache(
+    ttl=config('PSQL_ROLE_CACHE_TTL', default=3600.0, cast=float),
+    fallback_ttl=config('PSQL_ROLE_CACHE_FALLBACK_TTL', default=30.0, cast=float)
+)
@@ -0,0 +1,106 @@
+# Standard imports
+from collections import OrderedDict
+from decouple import config
+import threading
+import time
+
+# Bounded LRU/TTL cache of decoded sessions for backend/core/sessions.py, so check_auth,
+# auth_required and WebSocket connects do not query the sessions table on every request.
+# Saves and deletes made by this process update it immediately; a logout handled by another
+# process is only seen here once the entry's TTL runs out, so keep the TTL short.
+
+class SessionCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # session_key -> (data, expires_at, stored_at), LRU order
+        # Per-key invalidation: a save or delete stamps its key, so only loads of that key begun
+        # earlier are refused. Stamps beyond max_size are forgotten by raising _floor instead.
+        self._clock = 0
+        self._tombstones = OrderedDict()    # session_key -> clock at its last save or delete
+        self._floor = 0                 # loads begun before this are refused for every key
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    ################################################ FUNCTIONS ################################################
+
+    def beginLoad(self):
+        # Generation token: a session read before a save or delete of it is never stored after it
+        return self._clock
+
+    def put(self, session_key: str, data: dict, expires_at: float, generation: int = None):
+        # expires_at is a Unix timestamp; generation None means data is what was just written
+        if self.max_size <= 0 or self.ttl <= 0:
+            return False
+        with self._lock:
+            if generation is not None and (generation < self._floor or self._tombstones.get(session_key, 0) > generation):
+                return False
+            self._entries.pop(session_key, None)
+            self._entries[session_key] = (dict(data), expires_at, time.monotonic())
+            self.stores += 1
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, session_key: str):
+        with self._lock:
+            self._clock += 1
+            self._tombstones.pop(session_key, None)
+            self._tombstones[session_key] = self._clock
+            while len(self._tombstones) > max(self.max_size, 1):
+                _, self._floor = self._tombstones.popitem(last=False)
+            self._entries.pop(session_key, None)
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._clock += 1
+            self._floor = self._clock
+            self._tombstones.clear()
+            self._entries.clear()
+            self.invalidations += 1
+
+    ################################################ GETTERS ################################################
+
+    def get(self, session_key: str):
+        with self._lock:
+            entry = self._entries.get(session_key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.monotonic() - entry[2] >= self.ttl or time.time() >= entry[1]:
+                del self._entries[session_key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_key)
+            self.hits += 1
+
+        # Sessions are mutated by their callers: hand out a copy
+        return dict(entry[0])
+
+    def getStats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
+
+
+cache = SessionCache(
+    max_size=config('SESSION_CACHE_SIZE', default=10000, cast=int),
+    ttl=config('SESSION_CACHE_TTL', default=5.0, cast=float)
+)
@@ -1,55 +1,221 @@
 #!/usr/bin/python
 
 # Standard imports
+import atexit
+import gzip
 import logging
 import logging.handlers
 import os
 import pytz
+import queue
+import shutil
+import sys
+import threading
+import time
 from datetime import datetime
+from decouple import config
 from pathlib import Path
 
+# Every logger hands its records to one queue (no file I/O or fsync on the caller's thread) and a
+# single writer thread appends them to one file per logger. Files rotate by size or age; rotated
+# files are gzipped on another thread so the writer never waits on compression.
+# backend/Logging.py attaches the backend's loggers to the same pipeline.
+
+LOG_LEVEL = config('LOG_LEVEL', default='INFO').upper()
+LOG_QUEUE_SIZE = config('LOG_QUEUE_SIZE', default=10000, cast=int)
+LOG_ROTATE_BYTES = int(config('LOG_ROTATE_MB', default=10.0, cast=float) * 1024 * 1024)
+LOG_ROTATE_SECONDS = config('LOG_ROTATE_HOURS', default=24.0, cast=float) * 3600
+LOG_BACKUP_COUNT = config('LOG_BACKUP_COUNT', default=5, cast=int)
+
+FORMAT = "[ %(asctime)s ] - %(levelname)s - %(message)s"
+EASTERN = pytz.timezone('America/New_York')
+
+
+class EasternFormatter(logging.Formatter):
+    # Eastern Time timestamps; the timezone conversion runs once per second, not once per record
+    def __init__(self, fmt: str = FORMAT):
+        super().__init__(fmt)
+        self._second = None
+        self._formatted = None
+
+    def formatTime(self, record, datefmt=None):
+        if datefmt:
+            return datetime.fromtimestamp(record.created, EASTERN).strftime(datefmt)
+        second = int(record.created)
+        if second != self._second:
+            self._formatted = datetime.fromtimestamp(second, EASTERN).strftime('%Y-%m-%d %H:%M:%S')
+            self._second = second
+        return self._formatted
+
+
+class Compressor:
+    # Shifts name.1.gz .. name.N.gz and gzips the newest rotated file, one job at a time, off the writer
+    def __init__(self):
+        self._jobs = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, base_filename: str, rotated: str, backup_count: int):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='log-compressor', daemon=True)
+                self._thread.start()
+        self._jobs.put((base_filename, rotated, backup_count))
+
+    def stop(self):
+        if self._thread is not None:
+            self._jobs.put(None)
+            self._thread.join(timeout=10)
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            base_filename, rotated, backup_count = job
+            try:
+                if backup_count > 0:
+                    for i in range(backup_count - 1, 0, -1):
+                        source = f"{base_filename}.{i}.gz"
+                        if os.path.exists(source):
+                            os.replace(source, f"{base_filename}.{i + 1}.gz")
+                    with open(rotated, 'rb') as source, gzip.open(f"{base_filename}.1.gz.tmp", 'wb') as target:
+                        shutil.copyfileobj(source, target)
+                    os.replace(f"{base_filename}.1.gz.tmp", f"{base_filename}.1.gz")
+                os.remove(rotated)
+            except OSError as e:
+                sys.stderr.write(f"Logging: Could not compress {rotated} - {e}\n")
+
+
+class RotatingFileHandler(logging.handlers.RotatingFileHandler):
+    # Rotates once the file reaches LOG_ROTATE_BYTES or is LOG_ROTATE_SECONDS old
+    def __init__(self, filename: str):
+        super().__init__(filename, maxBytes=LOG_ROTATE_BYTES, backupCount=LOG_BACKUP_COUNT, delay=True)
+        self.rollover_at = time.time() + LOG_ROTATE_SECONDS if LOG_ROTATE_SECONDS > 0 else None
+
+    def shouldRollover(self, record):
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            self.rollover_at = time.time() + LOG_ROTATE_SECONDS
+            if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+                return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        # Only a rename here; shifting the backups and compressing happen on the compressor thread
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if os.path.exists(self.baseFilename):
+            rotated = f"{self.baseFilename}.{time.time_ns()}"
+            os.rename(self.baseFilename, rotated)
+            compressor.submit(self.baseFilename, rotated, self.backupCount)
+
+
+class FileRouter(logging.Handler):
+    # The writer thread's only handler: sends each record to its logger's file (and stdout if asked)
+    def __init__(self):
+        super().__init__()
+        self.formatter = EasternFormatter()
+        self.files = {}
+        self.console = None
+
+    def emit(self, record):
+        handler = self.files.get(record.log_file)
+        if handler is None:
+            handler = self.files[record.log_file] = RotatingFileHandler(record.log_file)
+            handler.setFormatter(self.formatter)
+        handler.handle(record)
+        if record.log_console:
+            if self.console is None:
+                self.console = logging.StreamHandler(sys.stdout)
+                self.console.setFormatter(self.formatter)
+            self.console.handle(record)
+
+    def close(self):
+        for handler in self.files.values():
+            handler.close()
+        super().close()
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    # Formats the message on the caller's thread and never blocks it: a full queue drops the record
+    def __init__(self, log_file: str, console: bool):
+        super().__init__(pipeline.queue)
+        self.log_file = log_file
+        self.console = console
+
+    def prepare(self, record):
+        record = super().prepare(record)
+        record.log_file = self.log_file
+        record.log_console = self.console
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pipeline.dropped += 1
+
+
+class Pipeline:
+    def __init__(self, queue_size: int):
+        self.queue = queue.Queue(queue_size)
+        self.dropped = 0
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def attach(self, logger: logging.Logger, log_file: str, console: bool = False):
+        with self._lock:
+            if logger.handlers:
+                # Another thread configured it first
+                return
+            logger.setLevel(LOG_LEVEL)
+            logger.addHandler(QueueHandler(log_file, console))
+            if self._listener is None:
+                self._listener = logging.handlers.QueueListener(self.queue, FileRouter())
+                self._listener.start()
+                atexit.register(self.stop)
+
+    def stop(self):
+        # Writes out what is still queued, then finishes pending compressions
+        with self._lock:
+            listener, self._listener = self._listener, None
+        if listener is not None:
+            try:
+                listener.stop()
+            except queue.Full:
+                return
+            for handler in listener.handlers:
+                handler.close()
+        compressor.stop()
+
+    def getStats(self):
+        return {'queued': self.queue.qsize(), 'dropped': self.dropped}
+
+
+compressor = Compressor()
+pipeline = Pipeline(LOG_QUEUE_SIZE)
+
+
 class Logger:
     def __init__(self, file_name: str):
         self.ignored_substrings = ['psql.', 'config.', 'operations.', 'requests.', 'models.']
 
         self.logger = logging.getLogger(file_name)
-        self.logger.setLevel(logging.DEBUG)
-        
+
         if self.logger.handlers:
             return
-            
+
         # Setup log file
         save_name = file_name
         for substring in self.ignored_substrings:
             save_name = save_name.replace(substring, '')
-        
+
         # log_dir = Path(os.path.dirname(os.path.abspath(__file__))) / "logs"
         log_dir = Path("/app/psql/logs")
         log_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Configure handlers
-        file_handler = logging.FileHandler(log_dir / f"{save_name}.txt")
-        # console_handler = logging.StreamHandler()
-
-        # Set format and add handlers
-        eastern = pytz.timezone('America/New_York')
-        
-        # Custom formatter that uses Eastern Time
-        class EasternFormatter(logging.Formatter):
-            def formatTime(self, record, datefmt=None):
-                dt = datetime.fromtimestamp(record.created, eastern)
-                if datefmt:
-                    return dt.strftime(datefmt)
-                else:
-                    return dt.strftime('%Y-%m-%d %H:%M:%S')
-        
-        formatter = EasternFormatter("[ %(asctime)s ] - %(levelname)s - %(message)s")
-        
-        file_handler.setFormatter(formatter)
-        self.logger.addHandler(file_handler)
-        # console_handler.setFormatter(formatter)
-        # self.logger.addHandler(console_handler)
-    
+
+        pipeline.attach(self.logger, str(log_dir / f"{save_name}.txt"))
+
     def get(self):
         return self.logger
-
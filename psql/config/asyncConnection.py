@@ -0,0 +1,142 @@
+# Standard imports
+from decouple import config
+import asyncio
+import time
+import weakref
+import psycopg
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool
+
+# Custom imports
+from psql.config import Logging
+
+# AsyncConnectionPool is bound to the event loop that opened it, so pools are kept per loop
+_pools = weakref.WeakKeyDictionary()    # loop -> {database_name: AsyncConnectionPool}
+_locks = weakref.WeakKeyDictionary()    # loop -> asyncio.Lock
+_returned = weakref.WeakKeyDictionary() # connection -> time it went back to the pool
+
+CHECK_AFTER = config('PSQL_POOL_CHECK_AFTER', default=5.0, cast=float)
+
+
+def get_conninfo(database_name: str):
+    return make_conninfo(
+        host="postgres",
+        user=config('PSQL_DB_USER'),
+        password=config('PSQL_DB_PASSWORD'),
+        dbname=database_name,
+        keepalives=1,
+        keepalives_idle=config('PSQL_KEEPALIVES_IDLE', default=30, cast=int),
+        keepalives_interval=config('PSQL_KEEPALIVES_INTERVAL', default=10, cast=int),
+        keepalives_count=config('PSQL_KEEPALIVES_COUNT', default=5, cast=int)
+    )
+
+
+async def _configure(conn):
+    conn.prepared_max = config('PSQL_STATEMENT_CACHE_SIZE', default=100, cast=int)
+
+
+async def _reset(conn):
+    _returned[conn] = time.monotonic()
+
+
+async def _check(conn):
+    # Same rule as the sync pool: only a connection idle longer than check_after is pinged,
+    # so one killed while idle (server restart, idle timeout) fails here instead of in a request
+    returned_at = _returned.get(conn)
+    if returned_at is None or time.monotonic() - returned_at > CHECK_AFTER:
+        await AsyncConnectionPool.check_connection(conn)
+
+
+async def get_pool(database_name: str):
+    loop = asyncio.get_running_loop()
+    pools = _pools.setdefault(loop, {})
+    pool = pools.get(database_name)
+    if pool is not None:
+        return pool
+
+    lock = _locks.setdefault(loop, asyncio.Lock())
+    async with lock:
+        pool = pools.get(database_name)
+        if pool is None:
+            pool = AsyncConnectionPool(
+                get_conninfo(database_name),
+                min_size=config('PSQL_POOL_MIN_SIZE', default=1, cast=int),
+                max_size=config('PSQL_ASYNC_POOL_MAX_SIZE', default=20, cast=int),
+                timeout=config('PSQL_POOL_TIMEOUT', default=10.0, cast=float),
+                max_idle=config('PSQL_POOL_MAX_IDLE', default=300.0, cast=float),
+                max_lifetime=config('PSQL_POOL_MAX_LIFETIME', default=3600.0, cast=float),
+                # psycopg 3 prepares statements server-side on its own after prepare_threshold runs
+                kwargs={'prepare_threshold': config('PSQL_PREPARE_THRESHOLD', default=2, cast=int)},
+                configure=_configure,
+                check=_check,
+                reset=_reset,
+                name=f"{database_name}-async",
+                open=False
+            )
+            await pool.open()
+            pools[database_name] = pool
+    return pool
+
+
+def get_pool_stats():
+    stats = []
+    for pools in list(_pools.values()):
+        for pool in list(pools.values()):
+            stats.append({'name': pool.name, **pool.get_stats()})
+    return stats
+
+
+class main:
+
+    def __init__(self):
+        # Logger
+        self.logger = Logging.Logger(__name__).get()
+
+        self.conn = None
+        self.pool = None
+        self.database_name = None
+
+    ################################################ FUNCTIONS ################################################
+
+    async def connect(self, database_name):
+        # Return existing connection if any
+        if self.conn is not None:
+            await self.close()
+
+        self.database_name = database_name
+        await self.acquire()
+
+    def bind(self, database_name):
+        # Lazy variant of connect(): the pool is only touched by the first query, so requests
+        # answered entirely from the in-process caches never check out a connection
+        self.database_name = database_name
+
+    async def acquire(self):
+        if self.conn is None:
+            try:
+                self.pool = await get_pool(self.database_name)
+                self.conn = await self.pool.getconn()
+            except psycopg.Error as e:
+                self.logger.error(f"Error connecting to PostgreSQL database: {e}")
+                raise
+        return self.conn
+
+
+
+    ################################################ CLOSING ################################################
+
+    async def commit(self):
+        await self.conn.commit()
+
+    async def close(self):
+        if self.conn is None:
+            return
+
+        try:
+            if not self.conn.closed:
+                await self.conn.commit()
+        except psycopg.Error as e:
+            self.logger.error(f"Error committing before returning connection to pool: {e}")
+        finally:
+            await self.pool.putconn(self.conn)
+            self.conn = None
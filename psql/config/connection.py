@@ -1,11 +1,261 @@
 # Standard imports
 from decouple import config
 import psycopg2
+import psycopg2.extensions
+from collections import deque
 from datetime import datetime
+import threading
+import time
+import weakref
 import pytz
 
 # Custom imports
 from psql.config import Logging
+from psql.operations import statements
+
+# Process-wide pools, one per database name
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    pass
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    # psycopg2 connection carrying its own prepared statement cache; the cache lives and dies
+    # with the server session, so a recycled or reconnected connection always starts empty
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statement_cache = statements.StatementCache(
+            max_size=config('PSQL_STATEMENT_CACHE_SIZE', default=100, cast=int),
+            threshold=config('PSQL_PREPARE_THRESHOLD', default=2, cast=int)
+        )
+
+
+class Pool:
+    """
+    Bounded, thread-safe pool of psycopg2 connections.
+
+    Connections are checked out with acquire() and handed back with release().
+    Idle connections older than max_idle are recycled, and a connection that sat
+    idle longer than check_after is pinged before being handed out.
+    """
+
+    def __init__(self, database_name: str, min_size: int = 1, max_size: int = 10, timeout: float = 10.0,
+                 max_idle: float = 300.0, max_lifetime: float = 3600.0, check_after: float = 5.0):
+        self.logger = Logging.Logger(__name__).get()
+
+        self.database_name = database_name
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+
+        self._cond = threading.Condition(threading.RLock())
+        self._idle = deque()        # (conn, created_at, returned_at)
+        self._created = {}          # id(conn) -> created_at
+        self._size = 0              # open connections plus connects in progress
+        self._in_use = 0
+
+        self.waits = 0
+        self.timeouts = 0
+        self.leaked = 0
+        self.recycled = 0
+        self.broken = 0
+        self.opened = 0
+
+    ################################################ FUNCTIONS ################################################
+
+    def _open(self):
+        conn = psycopg2.connect(
+            host="postgres",
+            user=config('PSQL_DB_USER'),
+            password=config('PSQL_DB_PASSWORD'),
+            database=self.database_name,
+            connection_factory=PooledConnection,
+            keepalives=1,
+            keepalives_idle=config('PSQL_KEEPALIVES_IDLE', default=30, cast=int),
+            keepalives_interval=config('PSQL_KEEPALIVES_INTERVAL', default=10, cast=int),
+            keepalives_count=config('PSQL_KEEPALIVES_COUNT', default=5, cast=int)
+        )
+        self.opened += 1
+        return conn
+
+    def _discard(self, conn):
+        self._created.pop(id(conn), None)
+        self._size -= 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _is_alive(self, conn):
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _expired(self, created_at, returned_at, now):
+        if self.max_idle and now - returned_at > self.max_idle:
+            return True
+        if self.max_lifetime and now - created_at > self.max_lifetime:
+            return True
+        return False
+
+    def _checkout(self, deadline):
+        # (conn, needs a ping) for an idle connection, or (None, False) once a slot for a new one is reserved
+        waited = False
+
+        with self._cond:
+            while True:
+                now = time.monotonic()
+
+                # Reuse the most recently returned idle connection
+                while self._idle:
+                    conn, created_at, returned_at = self._idle.pop()
+                    if conn.closed or self._expired(created_at, returned_at, now):
+                        self.recycled += 1
+                        self._discard(conn)
+                        continue
+                    self._in_use += 1
+                    return conn, now - returned_at > self.check_after
+
+                if self._size < self.max_size:
+                    # Reserve the slot before connecting so concurrent callers respect max_size
+                    self._size += 1
+                    return None, False
+
+                if not waited:
+                    self.waits += 1
+                    waited = True
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(f"Timed out after {self.timeout}s waiting for a connection to {self.database_name}")
+                self._cond.wait(remaining)
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            conn, check = self._checkout(deadline)
+            if conn is None:
+                break
+            # Ping outside the lock so a half-dead socket only holds up this caller
+            if not check or self._is_alive(conn):
+                return conn
+            with self._cond:
+                self._in_use -= 1
+                self.broken += 1
+                self._discard(conn)
+                self._cond.notify()
+
+        # Connect outside the lock so a slow handshake does not block releases
+        try:
+            conn = self._open()
+        except psycopg2.Error as e:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            self.logger.error(f"Error connecting to PostgreSQL database: {e}")
+            raise
+
+        with self._cond:
+            self._created[id(conn)] = time.monotonic()
+            self._in_use += 1
+        return conn
+
+    def release(self, conn, leaked: bool = False):
+        with self._cond:
+            self._in_use -= 1
+            if leaked:
+                self.leaked += 1
+
+            if conn.closed:
+                self.broken += 1
+                self._discard(conn)
+            else:
+                try:
+                    if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                    self._idle.append((conn, self._created.get(id(conn), time.monotonic()), time.monotonic()))
+                except psycopg2.Error:
+                    self.broken += 1
+                    self._discard(conn)
+
+            # Shrink back towards min_size when the idle set is over-provisioned
+            now = time.monotonic()
+            while len(self._idle) > self.min_size:
+                conn, created_at, returned_at = self._idle[0]
+                if not self._expired(created_at, returned_at, now):
+                    break
+                self._idle.popleft()
+                self.recycled += 1
+                self._discard(conn)
+
+            self._cond.notify()
+
+    def closeAll(self):
+        with self._cond:
+            while self._idle:
+                conn, _, _ = self._idle.pop()
+                self._discard(conn)
+
+    ################################################ GETTERS ################################################
+
+    def getStats(self):
+        with self._cond:
+            return {
+                'database': self.database_name,
+                'size': self._size,
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'leaked': self.leaked,
+                'recycled': self.recycled,
+                'broken': self.broken,
+                'opened': self.opened
+            }
+
+
+def get_pool(database_name: str):
+    pool = _pools.get(database_name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(database_name)
+            if pool is None:
+                pool = Pool(
+                    database_name,
+                    min_size=config('PSQL_POOL_MIN_SIZE', default=1, cast=int),
+                    max_size=config('PSQL_POOL_MAX_SIZE', default=10, cast=int),
+                    timeout=config('PSQL_POOL_TIMEOUT', default=10.0, cast=float),
+                    max_idle=config('PSQL_POOL_MAX_IDLE', default=300.0, cast=float),
+                    max_lifetime=config('PSQL_POOL_MAX_LIFETIME', default=3600.0, cast=float),
+                    check_after=config('PSQL_POOL_CHECK_AFTER', default=5.0, cast=float)
+                )
+                _pools[database_name] = pool
+    return pool
+
+
+def get_pool_stats():
+    return [pool.getStats() for pool in list(_pools.values())]
+
+
+def _reclaim(pool, conn):
+    # Runs when a main() is garbage collected without close(): hand the connection back
+    pool.release(conn, leaked=True)
+
 
 class main:
 
@@ -14,36 +264,39 @@ class main:
         self.logger = Logging.Logger(__name__).get()
 
         self.conn = None
-    
+        self.pool = None
+        self._finalizer = None
+
     ################################################ FUNCTIONS ################################################
-    
+
     def connect(self, database_name):
-        # Close existing connection if any
+        # Return existing connection if any
         if self.conn is not None:
             self.close()
-        
-        try:
-            connection = psycopg2.connect(
-                host="postgres",
-                user=config('PSQL_DB_USER'),
-                password=config('PSQL_DB_PASSWORD'),
-                database=database_name
-            )
-            # self.logger.info(f"Successfully connected to PostgreSQL {database_name}")
-            self.conn = connection
-        except psycopg2.Error as e:
-            self.logger.error(f"Error connecting to PostgreSQL database: {e}")
-            raise
-        
+
+        self.pool = get_pool(database_name)
+        self.conn = self.pool.acquire()
+        self._finalizer = weakref.finalize(self, _reclaim, self.pool, self.conn)
+
 
 
     ################################################ CLOSING ################################################
-    
+
     def commit(self):
         self.conn.commit()
-    
+
     def close(self):
-        self.conn.commit()
-        self.conn.close()
-    
-    
\ No newline at end of file
+        if self.conn is None:
+            return
+
+        self._finalizer.detach()
+        try:
+            if not self.conn.closed:
+                self.conn.commit()
+        except psycopg2.Error as e:
+            self.logger.error(f"Error committing before returning connection to pool: {e}")
+        finally:
+            self.pool.release(self.conn)
+            self.conn = None
+            self._finalizer = None
+
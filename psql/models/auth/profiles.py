@@ -1,7 +1,24 @@
 import json
 from datetime import datetime
 
+from psql.models import rows
+
 class User:
+    __slots__ = (
+        'id',
+        'unique_identifier',
+        'role_id',
+        'email',
+        'password',
+        'firstname',
+        'lastname',
+        'status',
+        'reference_id',
+        'signup_type',
+        'created_at',
+    )
+    _defaults = {}
+
     def __init__(self, profile_data: dict = None):
         self.id = ""
         self.unique_identifier = ""
@@ -22,7 +39,13 @@ class User:
 
     def init_properties(self, profile_data: dict):
         for key, value in profile_data.items():
-            setattr(self, key, value)
+            if key in self.__slots__:
+                setattr(self, key, value)
+
+    @classmethod
+    def rowFactory(cls, columns):
+        # Returns a callable building instances directly from cursor tuples
+        return rows.row_factory(cls, tuple(columns))
 
     ################################################ SETTERS ################################################
 
@@ -1,7 +1,23 @@
 import json
 from datetime import datetime
 
+from psql.models import rows
+
 class User:
+    __slots__ = (
+        'id',
+        'email',
+        'firstname',
+        'lastname',
+        'status',
+        'reference_id',
+        'unique_identifier',
+        'created_at',
+        'signup_type',
+        'has_profile',
+    )
+    _defaults = {'has_profile': False}
+
     def __init__(self, registration_data: dict = None):
         self.id = ""
         self.email = ""
@@ -21,7 +37,13 @@ class User:
 
     def init_properties(self, registration_data: dict):
         for key, value in registration_data.items():
-            setattr(self, key, value)
+            if key in self.__slots__:
+                setattr(self, key, value)
+
+    @classmethod
+    def rowFactory(cls, columns):
+        # Returns a callable building instances directly from cursor tuples
+        return rows.row_factory(cls, tuple(columns))
 
     ################################################ SETTERS ################################################
 
@@ -1,7 +1,15 @@
 import json
 from datetime import datetime
 
+from psql.models import rows
+
 class Role:
+    __slots__ = (
+        'id',
+        'name',
+    )
+    _defaults = {}
+
     def __init__(self, role_data: dict = None):
         self.id = ""
         self.name = ""
@@ -13,7 +21,13 @@ class Role:
 
     def init_properties(self, role_data: dict):
         for key, value in role_data.items():
-            setattr(self, key, value)
+            if key in self.__slots__:
+                setattr(self, key, value)
+
+    @classmethod
+    def rowFactory(cls, columns):
+        # Returns a callable building instances directly from cursor tuples
+        return rows.row_factory(cls, tuple(columns))
 
     ################################################ SETTERS ################################################
 
@@ -0,0 +1,25 @@
+# Standard imports
+from functools import lru_cache
+
+# Builds model instances straight from cursor tuples.
+# Column positions are resolved once per (model, column list) and cached, so a query
+# returning N rows costs one tuple per row instead of a dict plus an instance __dict__.
+
+@lru_cache(maxsize=256)
+def row_factory(model_class, columns: tuple):
+    positions = {name: index for index, name in enumerate(columns)}
+
+    # Generate a straight-line builder (as collections.namedtuple does): plain attribute
+    # stores into the slots are several times faster than looping over descriptors.
+    # Field names come from the model's __slots__, never from the database.
+    lines = ["def build(row):", "    instance = new(model_class)"]
+    for name in model_class.__slots__:
+        if name in positions:
+            lines.append(f"    instance.{name} = row[{positions[name]}]")
+        else:
+            lines.append(f"    instance.{name} = defaults.get({name!r}, '')")
+    lines.append("    return instance")
+
+    namespace = {'new': model_class.__new__, 'model_class': model_class, 'defaults': model_class._defaults}
+    exec("\n".join(lines), namespace)
+    return namespace['build']
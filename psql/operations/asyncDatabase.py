@@ -0,0 +1,136 @@
+# Standard imports
+from typing import List, Dict, Any, Optional
+import time
+import psycopg
+
+# Custom imports
+from psql.config import Logging
+from psql.operations import metrics
+
+class main:
+    def __init__(self, psql_connection):
+        # psql_connection is an asyncConnection.main; its pooled connection is acquired on first use
+        self.logger = Logging.Logger(__name__).get()
+        self.connection = psql_connection
+
+
+    ################################################ GENERAL ################################################
+
+    async def execute(self, query: str, queryData: List[Any] = None, suppress_logging: bool = False):
+        psql_connection = await self.connection.acquire()
+        start = time.perf_counter()
+        try:
+            async with psql_connection.cursor() as cursor:
+                await cursor.execute(query, queryData or None)
+                if cursor.description:  # Check if description exists
+                    columns = [desc.name for desc in cursor.description]  # Get column names
+                    results = [dict(zip(columns, row)) for row in await cursor.fetchall()]  # Convert to dict
+                else:
+                    results = []  # No results returned
+                row_count = len(results) or max(cursor.rowcount, 0)
+        except psycopg.Error as e:
+            metrics.record(query, time.perf_counter() - start, error=True)
+            if not suppress_logging:
+                self.logger.error(f"Failed to execute query: {query}")
+                self.logger.error(f"Error: {e}")
+            await psql_connection.rollback()
+            raise
+
+        executed = time.perf_counter()
+        await psql_connection.commit()
+        metrics.recordCommit(time.perf_counter() - executed)
+        metrics.record(query, executed - start, row_count)
+        return results
+
+    async def executeRows(self, query: str, queryData: List[Any] = None, suppress_logging: bool = False):
+        # Tuple-row variant of execute(): returns (columns, rows) without building a dict per row
+        psql_connection = await self.connection.acquire()
+        start = time.perf_counter()
+        try:
+            async with psql_connection.cursor() as cursor:
+                await cursor.execute(query, queryData or None)
+                if cursor.description:
+                    columns = tuple(desc.name for desc in cursor.description)
+                    rows = await cursor.fetchall()
+                else:
+                    columns, rows = (), []
+                row_count = len(rows) or max(cursor.rowcount, 0)
+        except psycopg.Error as e:
+            metrics.record(query, time.perf_counter() - start, error=True)
+            if not suppress_logging:
+                self.logger.error(f"Failed to execute query: {query}")
+                self.logger.error(f"Error: {e}")
+            await psql_connection.rollback()
+            raise
+
+        executed = time.perf_counter()
+        await psql_connection.commit()
+        metrics.recordCommit(time.perf_counter() - executed)
+        metrics.record(query, executed - start, row_count)
+        return columns, rows
+
+    async def copyTo(self, query: str, suppress_logging: bool = False):
+        # Async generator over COPY ... TO STDOUT chunks; nothing is parsed into Python rows
+        psql_connection = await self.connection.acquire()
+        try:
+            async with psql_connection.cursor() as cursor:
+                async with cursor.copy(query) as copy:
+                    async for data in copy:
+                        yield bytes(data)
+        except psycopg.Error as e:
+            if not suppress_logging:
+                self.logger.error(f"Failed to execute query: {query}")
+                self.logger.error(f"Error: {e}")
+            await psql_connection.rollback()
+            raise
+
+        await psql_connection.commit()
+
+    ################################################ BASIC FUNCTIONS ################################################
+
+    async def select(self, query: str, suppress_logging: bool = False):
+        return await self.execute(query, suppress_logging=suppress_logging)
+
+    async def selectOne(self, query: str, queryData: List[Any] = None, suppress_logging: bool = False):
+        results = await self.execute(query, queryData, suppress_logging)
+        if results:
+            return results[0]
+
+        return results
+
+    async def insert(self, sql: str, sqlData: List[Any] = None, suppress_logging: bool = False):
+        return await self.execute(sql, sqlData, suppress_logging)
+
+
+    async def delete(self, sql: str, sqlData: List[Any] = None, suppress_logging: bool = False):
+        psql_connection = await self.connection.acquire()
+        start = time.perf_counter()
+        try:
+            async with psql_connection.cursor() as cursor:
+                await cursor.execute(sql, sqlData or None)
+                row_count = max(cursor.rowcount, 0)
+        except psycopg.Error as e:
+            metrics.record(sql, time.perf_counter() - start, error=True)
+            if not suppress_logging:
+                self.logger.error(f"Failed to execute query: {sql}")
+                self.logger.error(f"Error: {e}")
+            await psql_connection.rollback()
+            raise
+
+        executed = time.perf_counter()
+        await psql_connection.commit()
+        metrics.recordCommit(time.perf_counter() - executed)
+        metrics.record(sql, executed - start, row_count)
+        return True
+
+
+    ################################################ CUSTOM FUNCTIONS ################################################
+
+    async def show_tables(self, suppress_logging: bool = False):
+        query = """
+            SELECT table_name
+            FROM information_schema.tables
+            WHERE table_schema = 'public'
+            ORDER BY table_name;
+        """
+        return await self.execute(query, suppress_logging=suppress_logging)
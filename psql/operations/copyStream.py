@@ -0,0 +1,37 @@
+# Standard imports
+import csv
+import io
+
+# Read-only file-like adapter that lets COPY ... FROM STDIN consume any iterable of rows.
+# Rows (dicts or sequences) are CSV-encoded lazily, one read() at a time, so the whole
+# input is never materialized in memory.
+
+class RowStream:
+    def __init__(self, rows, columns: list):
+        self.columns = list(columns)
+        self._rows = iter(rows)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+        self._pending = ""
+        self.rows_read = 0
+
+    def _encode(self, row):
+        if isinstance(row, dict):
+            return [row.get(column) for column in self.columns]
+        return list(row)[:len(self.columns)]
+
+    def read(self, size: int = 8192):
+        if size is None or size < 0:
+            size = 1 << 16
+        while len(self._pending) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._writer.writerow(self._encode(row))
+            self.rows_read += 1
+            self._pending += self._buffer.getvalue()
+            self._buffer.seek(0)
+            self._buffer.truncate()
+
+        chunk, self._pending = self._pending[:size], self._pending[size:]
+        return chunk
@@ -1,9 +1,12 @@
 # Standard imports
 from typing import List, Dict, Any, Optional
+from contextlib import contextmanager
+import time
 import psycopg2
 
 # Custom imports
 from psql.config import Logging
+from psql.operations import statements, metrics
 
 class main:
     def __init__(self, psql_connection):
@@ -14,13 +17,14 @@ class main:
     ################################################ GENERAL ################################################
 
     def execute(self, query: str, queryData: List[Any] = None, suppress_logging: bool = False):
+        start = time.perf_counter()
+        failed = False
         try:
             cursor = self.psql_connection.cursor()
-            if queryData:
-                cursor.execute(query, queryData)
-            else:
-                cursor.execute(query)
+            statements.execute(self.psql_connection, cursor, query, queryData)
         except psycopg2.Error as e:
+            failed = True
+            metrics.record(query, time.perf_counter() - start, error=True)
             if not suppress_logging:
                 self.logger.error(f"Failed to execute query: {query}")
                 self.logger.error(f"Error: {e}")
@@ -36,10 +40,83 @@ class main:
             except psycopg2.ProgrammingError:
                 results = []
             
+            executed = time.perf_counter()
             self.psql_connection.commit()
+            metrics.recordCommit(time.perf_counter() - executed)
             cursor.close()
+            if not failed:
+                metrics.record(query, executed - start, len(results) or max(cursor.rowcount, 0))
             return results
             
+    def executeRows(self, query: str, queryData: List[Any] = None, suppress_logging: bool = False):
+        # Tuple-row variant of execute(): returns (columns, rows) without building a dict per row
+        start = time.perf_counter()
+        cursor = self.psql_connection.cursor()
+        try:
+            statements.execute(self.psql_connection, cursor, query, queryData)
+
+            if cursor.description:
+                columns = tuple(desc[0] for desc in cursor.description)
+                rows = cursor.fetchall()
+            else:
+                columns, rows = (), []
+            row_count = len(rows) or max(cursor.rowcount, 0)
+        except psycopg2.Error as e:
+            metrics.record(query, time.perf_counter() - start, error=True)
+            if not suppress_logging:
+                self.logger.error(f"Failed to execute query: {query}")
+                self.logger.error(f"Error: {e}")
+            self.psql_connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        executed = time.perf_counter()
+        self.psql_connection.commit()
+        metrics.recordCommit(time.perf_counter() - executed)
+        metrics.record(query, executed - start, row_count)
+        return columns, rows
+
+    def iteratePages(self, query: str, queryData: List[Any] = None, batch_size: int = 1000, key: str = "id", suppress_logging: bool = False):
+        # Keyset pagination: the query must end with "<key> > %s ORDER BY <key> LIMIT %s".
+        # Each page is its own short statement, so only batch_size rows are ever held in memory
+        # and no cursor stays open across the commits other callers make on this connection.
+        if batch_size <= 0:
+            raise ValueError("batch_size must be positive")
+
+        last_key = 0
+        while True:
+            columns, rows = self.executeRows(query, list(queryData or []) + [last_key, batch_size], suppress_logging)
+            if rows:
+                yield columns, rows
+            if len(rows) < batch_size:
+                return
+            last_key = rows[-1][columns.index(key)]
+
+    @contextmanager
+    def transaction(self, suppress_logging: bool = False):
+        # Several statements on one cursor, committed together (or rolled back together)
+        cursor = self.psql_connection.cursor()
+        try:
+            yield cursor
+        except psycopg2.Error as e:
+            if not suppress_logging:
+                self.logger.error(f"Transaction failed: {e}")
+            self.psql_connection.rollback()
+            raise
+        except BaseException:
+            self.psql_connection.rollback()
+            raise
+        else:
+            self.psql_connection.commit()
+        finally:
+            cursor.close()
+
+    def copyTo(self, query: str, stream, suppress_logging: bool = False):
+        # COPY ... TO STDOUT straight into stream.write(), without building Python rows
+        with self.transaction(suppress_logging) as cursor:
+            cursor.copy_expert(query, stream)
+
     ################################################ BASIC FUNCTIONS ################################################
     
     def select(self, query: str, suppress_logging: bool = False):
@@ -57,27 +134,39 @@ class main:
     
 
     def delete(self, sql: str, sqlData: List[Any] = None, suppress_logging: bool = False):
+        start = time.perf_counter()
+        failed = False
         try:
             cursor = self.psql_connection.cursor()
-            if sqlData:
-                cursor.execute(sql, sqlData)
-            else:
-                cursor.execute(sql)
+            statements.execute(self.psql_connection, cursor, sql, sqlData)
 
         except psycopg2.Error as e:
+            failed = True
+            metrics.record(sql, time.perf_counter() - start, error=True)
             if not suppress_logging:
                 self.logger.error(f"Failed to execute query: {sql}")
                 self.logger.error(f"Error: {e}")
             self.psql_connection.rollback()
             raise
         finally:
+            executed = time.perf_counter()
             self.psql_connection.commit()
+            metrics.recordCommit(time.perf_counter() - executed)
+            if not failed:
+                metrics.record(sql, executed - start, max(cursor.rowcount, 0))
             cursor.close()
             return True
         
 
     ################################################ CUSTOM FUNCTIONS ################################################
 
+    def statementStats(self):
+        cache = getattr(self.psql_connection, 'statement_cache', None)
+        return {
+            'connection': cache.getStats() if cache else None,
+            'process': statements.get_statement_stats()
+        }
+
     def show_tables(self, suppress_logging: bool = False):
         query = """
             SELECT table_name 
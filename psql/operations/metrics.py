@@ -0,0 +1,199 @@
+# Standard imports
+from bisect import bisect_left
+import contextvars
+import re
+import threading
+import time
+
+# Query metrics for database.main and asyncDatabase.main, rendered in the Prometheus text format
+# by backend/api/views/metrics_views.py.
+# Each thread (a sync worker or an event loop) writes only to its own shard, so recording takes
+# no lock: one dict lookup and a few list increments into buckets allocated with the statement.
+# Shards are merged when the endpoint is scraped, which may be a few increments behind.
+
+# Latency histogram upper bounds in seconds; the last slot of each histogram counts +Inf
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Histogram slots, then sum, count, rows, errors
+SUM = len(BUCKETS) + 1
+COUNT = SUM + 1
+ROWS = COUNT + 1
+ERRORS = ROWS + 1
+SLOTS = ERRORS + 1
+
+# Statements beyond this many distinct fingerprints share one "other" series
+MAX_STATEMENTS = 500
+COMMIT = None
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+_fingerprints = {}      # query text -> fingerprint; queries are constants in the code, so this stays small
+_statements = set()     # fingerprints with their own series
+_shards = []            # every thread's shard, for collect()
+_shards_lock = threading.Lock()
+_local = threading.local()
+
+# Trace of the request the current code runs for (backend/core/middleware.py), None outside one
+current_trace = contextvars.ContextVar('psql_trace', default=None)
+
+
+def fingerprint(query: str):
+    # Query shape: literals become ?, whitespace is collapsed ("%s" placeholders already are shapes)
+    shape = _fingerprints.get(query)
+    if shape is None:
+        shape = _SPACE.sub(' ', _LITERALS.sub('?', query)).strip()[:300]
+        if len(_fingerprints) < MAX_STATEMENTS * 4:
+            _fingerprints[query] = shape
+    return shape
+
+
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = _local.shard = {}
+        with _shards_lock:
+            _shards.append(shard)
+    return shard
+
+
+def _observe(key, seconds: float, rows: int = 0, error: bool = False):
+    shard = _shard()
+    entry = shard.get(key)
+    if entry is None:
+        entry = shard[key] = [0] * SLOTS
+        entry[SUM] = 0.0
+    entry[bisect_left(BUCKETS, seconds)] += 1
+    entry[SUM] += seconds
+    entry[COUNT] += 1
+    entry[ROWS] += rows
+    if error:
+        entry[ERRORS] += 1
+
+
+def record(query: str, seconds: float, rows: int = 0, error: bool = False):
+    shape = fingerprint(query)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(shape, seconds)
+    if shape not in _statements:
+        if len(_statements) >= MAX_STATEMENTS:
+            shape = 'other'
+        else:
+            _statements.add(shape)
+    _observe(shape, seconds, rows, error)
+
+
+def recordCommit(seconds: float):
+    trace = current_trace.get()
+    if trace is not None:
+        trace.db_seconds += seconds
+    _observe(COMMIT, seconds)
+
+
+def collect():
+    # {fingerprint (None for commits): merged slots}
+    with _shards_lock:
+        shards = list(_shards)
+    merged = {}
+    for shard in shards:
+        for key, entry in list(shard.items()):
+            total = merged.get(key)
+            if total is None:
+                merged[key] = list(entry)
+            else:
+                for i, value in enumerate(entry):
+                    total[i] += value
+    return merged
+
+
+################################################ TRACING ################################################
+
+class Trace:
+    # Queries issued on behalf of one request; async views and the sync_to_async threads they call
+    # share the object through the context variable
+    __slots__ = ('started', 'db_seconds', 'queries', 'shapes')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.shapes = {}        # fingerprint -> times issued
+
+    def add(self, shape: str, seconds: float):
+        self.queries += 1
+        self.db_seconds += seconds
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def repeated(self, limit: int):
+        # Shapes issued at least limit times: usually a query inside a loop (N+1)
+        return {shape: count for shape, count in self.shapes.items() if count >= limit}
+
+
+def beginTrace():
+    # Returns (trace, token); pass the token to endTrace
+    trace = Trace()
+    return trace, current_trace.set(trace)
+
+
+def endTrace(token):
+    current_trace.reset(token)
+
+
+################################################ EXPOSITION ################################################
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def labels(values: dict):
+    if not values:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in values.items()) + '}'
+
+
+class Exposition:
+    # Builds one Prometheus text exposition; samples are grouped under their family's HELP/TYPE
+    def __init__(self):
+        self.families = {}      # name -> (kind, help, sample lines), in first-seen order
+
+    def _samples(self, name: str, kind: str, help: str):
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = (kind, help, [])
+        return family[2]
+
+    def gauge(self, name: str, help: str, value, **label_values):
+        self._samples(name, 'gauge', help).append(f"{name}{labels(label_values)} {float(value)}")
+
+    def counter(self, name: str, help: str, value, **label_values):
+        self._samples(name, 'counter', help).append(f"{name}{labels(label_values)} {float(value)}")
+
+    def histogram(self, name: str, help: str, entry: list, **label_values):
+        samples = self._samples(name, 'histogram', help)
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float('inf'),), entry):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            samples.append(f"{name}_bucket{labels({**label_values, 'le': le})} {cumulative}")
+        samples.append(f"{name}_sum{labels(label_values)} {entry[SUM]}")
+        samples.append(f"{name}_count{labels(label_values)} {entry[COUNT]}")
+
+    def render(self):
+        lines = []
+        for name, (kind, help, samples) in self.families.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+def exposeQueries(exposition: Exposition):
+    merged = collect()
+    commits = merged.pop(COMMIT, None)
+    for shape, entry in sorted(merged.items()):
+        exposition.histogram('psql_query_duration_seconds', 'Query latency by statement fingerprint', entry, statement=shape)
+        exposition.counter('psql_query_rows_total', 'Rows returned or affected by statement fingerprint', entry[ROWS], statement=shape)
+        exposition.counter('psql_query_errors_total', 'Failed queries by statement fingerprint', entry[ERRORS], statement=shape)
+    if commits is not None:
+        exposition.histogram('psql_commit_duration_seconds', 'Time spent in COMMIT after a query', commits)
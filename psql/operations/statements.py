@@ -0,0 +1,207 @@
+# Standard imports
+from collections import OrderedDict
+import itertools
+import threading
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+
+# Server-side prepared statement cache, one per pooled connection.
+# A statement is PREPAREd once it has been executed `threshold` times on a connection and is
+# EXECUTEd by name afterwards, so Postgres skips parse/plan for the hot single-row lookups.
+
+PREPARABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+SCHEMA_CHANGES = ('CREATE', 'ALTER', 'DROP', 'TRUNCATE', 'COMMENT')
+
+# Errors meaning a prepared statement no longer exists or no longer matches the schema
+STALE_ERRORS = (psycopg2.errors.InvalidSqlStatementName, psycopg2.errors.FeatureNotSupported)
+
+_names = itertools.count(1)
+
+# Process-wide totals across every connection's cache
+_totals_lock = threading.Lock()
+_totals = {'hits': 0, 'misses': 0, 'prepares': 0, 'evictions': 0, 'invalidations': 0, 'failures': 0}
+
+
+def _count(key: str, amount: int = 1):
+    with _totals_lock:
+        _totals[key] += amount
+
+
+def get_statement_stats():
+    with _totals_lock:
+        stats = dict(_totals)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+
+def to_positional(query: str):
+    # Rewrites psycopg2 "%s" placeholders to "$n". Returns (sql, param_count), or None when the
+    # query uses anything else (named placeholders, stray %) and must not be prepared.
+    parts = []
+    count = 0
+    i = 0
+    length = len(query)
+    while i < length:
+        char = query[i]
+        if char == '%':
+            following = query[i + 1] if i + 1 < length else ''
+            if following == 's':
+                count += 1
+                parts.append(f"${count}")
+            elif following == '%':
+                parts.append('%')
+            else:
+                return None
+            i += 2
+            continue
+        parts.append(char)
+        i += 1
+    return ''.join(parts), count
+
+
+def leading_keyword(query: str):
+    stripped = query.lstrip(' \t\r\n(')
+    return stripped[:8].split(None, 1)[0].upper() if stripped else ''
+
+
+class StatementCache:
+    def __init__(self, max_size: int = 100, threshold: int = 2):
+        self.max_size = max_size
+        self.threshold = threshold
+
+        self._prepared = OrderedDict()  # sql -> (name, param_count), LRU order
+        self._seen = OrderedDict()      # sql -> executions while not prepared, bounded
+        self._skip = set()              # sql Postgres refused to prepare
+        self._deallocate = []           # evicted names to DEALLOCATE before the next PREPARE
+
+        self.hits = 0
+        self.misses = 0
+        self.prepares = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    ################################################ FUNCTIONS ################################################
+
+    def lookup(self, query: str):
+        entry = self._prepared.get(query)
+        if entry is not None:
+            self._prepared.move_to_end(query)
+            self.hits += 1
+            _count('hits')
+            return entry
+
+        self.misses += 1
+        _count('misses')
+        return None
+
+    def shouldPrepare(self, query: str):
+        if self.max_size <= 0 or query in self._skip:
+            return False
+        if leading_keyword(query) not in PREPARABLE:
+            return False
+
+        seen = self._seen.pop(query, 0) + 1
+        self._seen[query] = seen
+        while len(self._seen) > self.max_size * 4:
+            self._seen.popitem(last=False)
+        return seen >= self.threshold
+
+    def prepare(self, cursor, query: str):
+        positional = to_positional(query)
+        if positional is None:
+            self._skip.add(query)
+            return None
+        sql, param_count = positional
+
+        for name in self._deallocate:
+            cursor.execute(f"DEALLOCATE {name}")
+        self._deallocate = []
+
+        name = f"psql_stmt_{next(_names)}"
+        cursor.execute(f"PREPARE {name} AS {sql}")
+
+        self._seen.pop(query, None)
+        self._prepared[query] = (name, param_count)
+        self.prepares += 1
+        _count('prepares')
+
+        while len(self._prepared) > self.max_size:
+            _, (evicted, _) = self._prepared.popitem(last=False)
+            self._deallocate.append(evicted)
+            self.evictions += 1
+            _count('evictions')
+
+        return name, param_count
+
+    def refuse(self, query: str):
+        # Postgres could not prepare it (e.g. untyped parameter); always run it unprepared
+        self._seen.pop(query, None)
+        self._skip.add(query)
+        _count('failures')
+
+    def invalidate(self, cursor=None):
+        # Connection reset or schema change: forget everything and drop server-side statements
+        self._prepared.clear()
+        self._seen.clear()
+        self._deallocate = []
+        self.invalidations += 1
+        _count('invalidations')
+        if cursor is not None:
+            cursor.execute("DEALLOCATE ALL")
+
+    ################################################ GETTERS ################################################
+
+    def getStats(self):
+        return {
+            'size': len(self._prepared),
+            'hits': self.hits,
+            'misses': self.misses,
+            'prepares': self.prepares,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
+
+
+def execute(connection, cursor, query: str, queryData=None):
+    # Runs query on cursor, through a prepared statement when the connection carries a cache
+    cache = getattr(connection, 'statement_cache', None)
+    if cache is None:
+        cursor.execute(query, queryData) if queryData else cursor.execute(query)
+        return
+
+    # psycopg2 only interprets % when parameters are passed, so only parameterized queries are prepared
+    if not queryData:
+        cursor.execute(query)
+        if leading_keyword(query) in SCHEMA_CHANGES:
+            cache.invalidate(cursor)
+        return
+
+    idle = connection.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    entry = cache.lookup(query)
+    if entry is None and idle and cache.shouldPrepare(query):
+        # Only prepare outside a transaction so a refused PREPARE can be rolled back harmlessly
+        try:
+            entry = cache.prepare(cursor, query)
+        except psycopg2.Error:
+            connection.rollback()
+            cache.refuse(query)
+            entry = None
+
+    params = list(queryData)
+    if entry is None or entry[1] != len(params):
+        cursor.execute(query, queryData)
+        return
+
+    name, param_count = entry
+    try:
+        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * param_count)})", params)
+    except STALE_ERRORS:
+        # Statement vanished (server-side reset) or the schema changed under it
+        connection.rollback()
+        cache.invalidate(cursor)
+        if not idle:
+            # Earlier statements of this transaction were rolled back too; let the caller see it
+            raise
+        cursor.execute(query, queryData)
@@ -3,8 +3,9 @@ from datetime import datetime
 
 # Custom imports
 from psql.config import connection, Logging
-from psql.requests import psqlAuthReq
+from psql.requests import psqlAuthReq, psqlSessionsReq
 from psql.models.auth import profiles, registrations, roles
+from psql.cache import profileCache, roleCache
 
 # Takes all database requests (CRUD) and sorts them into the correct database (psqlAuthReq, psqlSecureMailReq, psqlFeaturesReq)
 
@@ -20,13 +21,21 @@ class Manager:
 
         # Requests manager
         self.auth_manager = psqlAuthReq.Requests(self.auth_connection)
+        self.sessions_manager = psqlSessionsReq.Requests(self.auth_connection)
 
-        self.logger.info(f"PsqlManager initialized for: {file_name}")
+        self.logger.debug("PsqlManager initialized for: %s", file_name)
 
 
     def close(self):
+        # Hands the connection back to the process-wide pool
         self.auth_connection.close()
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
 
 ###################################################################### AUTHENTICATION ######################################################################
 
@@ -39,6 +48,21 @@ class Manager:
             
         return self.auth_manager.getProfile(unique_identifier, email)
 
+    def getProfileWithRole(self, unique_identifier: str = None, email: str = None):
+        # Returns (profile, role_name); (None, None) when the profile does not exist
+        if not unique_identifier and not email:
+            raise ValueError("No unique identifier or email provided")
+
+        return self.auth_manager.getProfileWithRole(unique_identifier, email)
+
+    # Batched lookups return {identifier: model or None} in request order, one query per chunk_size ids
+
+    def getProfilesByIds(self, unique_identifiers: list, chunk_size: int = 1000):
+        return self.auth_manager.getProfilesByIds(unique_identifiers, chunk_size)
+
+    def getProfilesByEmails(self, emails: list, chunk_size: int = 1000):
+        return self.auth_manager.getProfilesByEmails(emails, chunk_size)
+
     def getProfiles(self):
         return self.auth_manager.getProfiles()
 
@@ -48,6 +72,17 @@ class Manager:
     def getDeleteProfiles(self):
         return self.auth_manager.getDeleteProfiles()
 
+    # Generator variants hold at most batch_size rows in memory at a time
+
+    def iterProfiles(self, batch_size: int = 1000):
+        return self.auth_manager.iterProfiles(batch_size)
+
+    def iterActiveProfiles(self, batch_size: int = 1000):
+        return self.auth_manager.iterActiveProfiles(batch_size)
+
+    def iterDeleteProfiles(self, batch_size: int = 1000):
+        return self.auth_manager.iterDeleteProfiles(batch_size)
+
     def createProfile(self, unique_identifier: str, email: str, password: str, firstname: str, lastname: str, role_id: int, status: str, signup_type: str):
         # Create the profile
         profile = self.auth_manager.createProfile(unique_identifier, email, password, firstname, lastname, role_id, status, signup_type)
@@ -71,12 +106,21 @@ class Manager:
             
         return self.auth_manager.getRegistration(unique_identifier, email)
 
+    def getRegistrationsByIds(self, unique_identifiers: list, chunk_size: int = 1000):
+        return self.auth_manager.getRegistrationsByIds(unique_identifiers, chunk_size)
+
     def getRegistrations(self):
         return self.auth_manager.getRegistrations()
 
     def getInactiveRegistrations(self):
         return self.auth_manager.getInactiveRegistrations()
 
+    def iterRegistrations(self, batch_size: int = 1000):
+        return self.auth_manager.iterRegistrations(batch_size)
+
+    def iterInactiveRegistrations(self, batch_size: int = 1000):
+        return self.auth_manager.iterInactiveRegistrations(batch_size)
+
     def createRegistration(self, email: str, firstname: str, lastname: str, status: str, signup_type: str):
         return self.auth_manager.createRegistration(email, firstname, lastname, status, signup_type)
 
@@ -92,26 +136,122 @@ class Manager:
         return self.auth_manager.getRoles()
 
     def createRole(self, role_name: str):
-        return self.auth_manager.createRole(role_name)
+        role = self.auth_manager.createRole(role_name)
+        roleCache.cache.invalidate()
+        return role
+
+    def refreshRoles(self):
+        # Drops and reloads the role cache (listener startup / reconnect)
+        roleCache.cache.invalidate()
+        return self.auth_manager.loadRoles()
 
     ###################################################################### UPDATES ######################################################################
 
     def update(self, model_object: object, document_requests : list = None):
         if isinstance(model_object, profiles.User):
-            return self.auth_manager.updateProfile(model_object)
+            result = self.auth_manager.updateProfile(model_object)
+            profileCache.cache.invalidate(model_object.unique_identifier, model_object.email)
+            return result
         elif isinstance(model_object, registrations.User):
             return self.auth_manager.updateRegistration(model_object)
         elif isinstance(model_object, roles.Role):
-            return self.auth_manager.updateRole(model_object)
+            role = self.auth_manager.updateRole(model_object)
+            roleCache.cache.invalidate()
+            return role
         
         
     
+###################################################################### BULK ######################################################################
+
+    # One statement per call instead of one statement, commit and NOTIFY per row.
+    # Each returns the unique_identifiers that were actually affected.
+
+    def bulkUpdateStatus(self, unique_identifiers: list, status: str, model_class: type = profiles.User):
+        unique_identifiers = [str(unique_identifier) for unique_identifier in unique_identifiers]
+        if model_class is profiles.User:
+            updated = self.auth_manager.bulkUpdateProfileStatus(unique_identifiers, status)
+            for unique_identifier in updated:
+                profileCache.cache.invalidate(unique_identifier)
+            return updated
+        elif model_class is registrations.User:
+            return self.auth_manager.bulkUpdateRegistrationStatus(unique_identifiers, status)
+        raise ValueError(f"Bulk status updates are not supported for {model_class.__name__}")
+
+    def bulkDelete(self, unique_identifiers: list, model_class: type = profiles.User):
+        unique_identifiers = [str(unique_identifier) for unique_identifier in unique_identifiers]
+        if model_class is profiles.User:
+            deleted = self.auth_manager.bulkDeleteProfiles(unique_identifiers)
+            for unique_identifier in deleted:
+                profileCache.cache.invalidate(unique_identifier)
+            return deleted
+        elif model_class is registrations.User:
+            return self.auth_manager.bulkDeleteRegistrations(unique_identifiers)
+        raise ValueError(f"Bulk deletes are not supported for {model_class.__name__}")
+
+    def bulkUpdate(self, model_objects: list):
+        profileUsers = [model_object for model_object in model_objects if isinstance(model_object, profiles.User)]
+        registrationUsers = [model_object for model_object in model_objects if isinstance(model_object, registrations.User)]
+
+        updated = []
+        if profileUsers:
+            updated += self.auth_manager.bulkUpdateProfiles(profileUsers)
+            for profileUser in profileUsers:
+                profileCache.cache.invalidate(profileUser.unique_identifier, profileUser.email)
+        if registrationUsers:
+            updated += self.auth_manager.bulkUpdateRegistrations(registrationUsers)
+        return updated
+
+
+
+###################################################################### IMPORT / EXPORT ######################################################################
+
+    def importRegistrations(self, source, status: str = "inactive", signup_type: str = "custom"):
+        # COPY FROM STDIN into a staging table, validated and de-duplicated against existing emails.
+        # Returns {'received', 'invalid', 'duplicates', 'inserted'}
+        return self.auth_manager.importRegistrations(source, status, signup_type)
+
+    def exportProfiles(self, stream, format: str = "csv"):
+        # COPY TO STDOUT into anything with a write() method (file, HttpResponse); format is csv or ndjson
+        if format not in psqlAuthReq.EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {format}")
+        return self.auth_manager.exportProfiles(stream, format)
+
+
+
 ###################################################################### DELETES ######################################################################
 
     def delete(self, model_object: object):
         if isinstance(model_object, profiles.User):
-            return self.auth_manager.deleteProfile(model_object)
+            result = self.auth_manager.deleteProfile(model_object)
+            profileCache.cache.invalidate(model_object.unique_identifier, model_object.email)
+            return result
         elif isinstance(model_object, registrations.User):
             return self.auth_manager.deleteRegistration(model_object)
         elif isinstance(model_object, roles.Role):
-            return self.auth_manager.deleteRole(model_object)
+            deleted = self.auth_manager.deleteRole(model_object)
+            roleCache.cache.invalidate()
+            return deleted
+
+
+
+###################################################################### SESSIONS ######################################################################
+
+    def getSession(self, session_key: str):
+        return self.sessions_manager.getSession(session_key)
+
+    def sessionExists(self, session_key: str):
+        return self.sessions_manager.sessionExists(session_key)
+
+    def createSession(self, session_key: str, session_data: str, expire_date):
+        return self.sessions_manager.createSession(session_key, session_data, expire_date)
+
+    def updateSession(self, session_key: str, session_data: str, expire_date):
+        return self.sessions_manager.updateSession(session_key, session_data, expire_date)
+
+    def deleteSession(self, session_key: str):
+        return self.sessions_manager.deleteSession(session_key)
+
+    def deleteExpiredSessions(self):
+        count = self.sessions_manager.deleteExpiredSessions()
+        self.logger.info(f"Deleted {count} expired sessions")
+        return count
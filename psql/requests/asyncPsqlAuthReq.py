@@ -0,0 +1,357 @@
+# Standard imports
+from datetime import datetime
+import pytz
+import uuid
+
+# Custom imports
+from psql.config import Logging
+from psql.operations import asyncDatabase
+from psql.models.auth import profiles, registrations, roles
+from psql.cache import profileCache, roleCache
+from psql.requests.psqlAuthReq import EXPORT_FORMATS, profileExportQuery
+
+###################################################################### AUTHENTICATION ######################################################################
+
+class Requests:
+    def __init__(self, psql_connection):
+
+        # Logger
+        self.logger = Logging.Logger(__name__).get()
+
+        # Initialize database connection
+        self.psql_database = asyncDatabase.main(psql_connection)
+
+    ################################################ HELPERS ################################################
+
+    async def _fetchModels(self, model_class, query: str, queryData: list = None):
+        columns, rows = await self.psql_database.executeRows(query, queryData)
+        if not rows:
+            return []
+        build = model_class.rowFactory(columns)
+        return [build(row) for row in rows]
+
+    async def _fetchModel(self, model_class, query: str, queryData: list = None):
+        models = await self._fetchModels(model_class, query, queryData)
+        if models:
+            return models[0]
+
+    async def _fetchModelsByKeys(self, model_class, query: str, key_field: str, keys: list, chunk_size: int = 1000):
+        # One "= ANY(%s)" query per chunk; every requested key is present in the result, None when missing
+        found = dict.fromkeys(keys)
+        pending = list(found)
+        for start in range(0, len(pending), chunk_size):
+            for model in await self._fetchModels(model_class, query, [pending[start:start + chunk_size]]):
+                found[getattr(model, key_field)] = model
+        return found
+
+    async def _fetchProfilesByKeys(self, key_field: str, keys: list, chunk_size: int = 1000):
+        found = {}
+        pending = []
+        for key in keys:
+            cached = profileCache.cache.get(**{key_field: key})
+            found[key] = cached
+            if cached is None:
+                pending.append(key)
+
+        if pending:
+            generation = profileCache.cache.beginLoad()
+            query = f"SELECT * FROM profiles WHERE {key_field} = ANY(%s)"
+            fetched = await self._fetchModelsByKeys(profiles.User, query, key_field, pending, chunk_size)
+            for key, profileUser in fetched.items():
+                found[key] = profileUser
+                if profileUser is not None:
+                    profileCache.cache.put(profileUser, generation)
+        return found
+
+
+
+    ################################################ PROFILES ################################################
+
+    async def getProfile(self, unique_identifier: str = None, email: str = None):
+        # Read-through: the in-process profile cache answers first
+        profileUser = profileCache.cache.get(unique_identifier, email)
+        if profileUser is not None:
+            return profileUser
+
+        generation = profileCache.cache.beginLoad()
+        condition_field = "unique_identifier" if unique_identifier else "email"
+        query = f"SELECT * FROM profiles WHERE {condition_field} = %s"
+        profileUser = await self._fetchModel(profiles.User, query, [str(unique_identifier) if unique_identifier else email])
+        if profileUser:
+            profileCache.cache.put(profileUser, generation)
+        return profileUser
+
+    async def getProfileWithRole(self, unique_identifier: str = None, email: str = None):
+        # Profile plus its role name in one round trip (or none, when both caches can answer)
+        profileUser = profileCache.cache.get(unique_identifier, email)
+        if profileUser is not None and roleCache.cache.isFresh():
+            role = roleCache.cache.get(role_id=profileUser.role_id) if profileUser.role_id else None
+            return profileUser, role.name if role else None
+
+        generation = profileCache.cache.beginLoad()
+        condition_field = "unique_identifier" if unique_identifier else "email"
+        query = f"""
+            SELECT p.*, r.name AS role_name
+            FROM profiles p
+            LEFT JOIN roles r
+                ON r.id = p.role_id
+            WHERE p.{condition_field} = %s
+        """
+        columns, rows = await self.psql_database.executeRows(query, [str(unique_identifier) if unique_identifier else email])
+        if not rows:
+            return None, None
+
+        profileUser = profiles.User.rowFactory(columns)(rows[0])
+        profileCache.cache.put(profileUser, generation)
+        return profileUser, rows[0][columns.index("role_name")]
+
+    async def getProfilesByIds(self, unique_identifiers: list, chunk_size: int = 1000):
+        return await self._fetchProfilesByKeys("unique_identifier", [str(unique_identifier) for unique_identifier in unique_identifiers], chunk_size)
+
+    async def getProfilesByEmails(self, emails: list, chunk_size: int = 1000):
+        return await self._fetchProfilesByKeys("email", list(emails), chunk_size)
+
+    async def getProfiles(self):
+        query = "SELECT * FROM profiles"
+        return await self._fetchModels(profiles.User, query)
+    
+    async def getActiveProfiles(self):
+        query = "SELECT * FROM profiles WHERE status NOT IN ('pending', 'deleted')"
+        return await self._fetchModels(profiles.User, query)
+    
+    async def getDeleteProfiles(self):
+        query = "SELECT * FROM profiles WHERE status = 'deleted'"
+        return await self._fetchModels(profiles.User, query)
+
+    async def createProfile(self, unique_identifier: str, email: str, password: str, firstname: str, lastname: str, role_id: int, status: str, signup_type: str):
+        query = "INSERT INTO profiles (unique_identifier, email, password, firstname, lastname, role_id, status, signup_type, created_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING *"
+        created_at = datetime.now(pytz.timezone("America/New_York")).strftime("%Y-%m-%d %H:%M:%S")
+        return await self._fetchModel(profiles.User, query, [unique_identifier, email, password, firstname, lastname, role_id, status, signup_type, created_at])
+
+    async def updateProfile(self, profileUser: profiles.User):
+        query = """
+            UPDATE profiles 
+            SET role_id = %s,
+                email = %s,
+                password = %s,
+                firstname = %s,
+                lastname = %s,
+                status = %s,
+                reference_id = %s,
+                signup_type = %s
+            WHERE unique_identifier = %s
+            RETURNING *
+        """
+        values = [
+            profileUser.role_id,
+            profileUser.email,
+            profileUser.password,
+            profileUser.firstname,
+            profileUser.lastname,
+            profileUser.status,
+            profileUser.reference_id,
+            profileUser.signup_type,
+            profileUser.unique_identifier
+        ]
+        
+        return await self._fetchModel(profiles.User, query, values)
+
+    async def updateProfilePassword(self, unique_identifier: str, current_password: str, new_password: str):
+        # Compare-and-set: only the password column, and only while it still holds current_password
+        query = "UPDATE profiles SET password = %s WHERE unique_identifier = %s AND password = %s RETURNING unique_identifier"
+        columns, rows = await self.psql_database.executeRows(query, [new_password, unique_identifier, current_password])
+        return bool(rows)
+
+    async def deleteProfile(self, profileUser: profiles.User):
+        query = "DELETE FROM profiles WHERE unique_identifier = %s"
+        result = await self.psql_database.delete(query, [profileUser.unique_identifier])
+        if result:
+            return True
+
+    # Set-based variants: one statement (one transaction) however many rows, returning the affected ids
+
+    async def bulkUpdateProfileStatus(self, unique_identifiers: list, status: str):
+        query = "UPDATE profiles SET status = %s WHERE unique_identifier = ANY(%s) RETURNING unique_identifier"
+        columns, rows = await self.psql_database.executeRows(query, [status, unique_identifiers])
+        return [row[0] for row in rows]
+
+    async def bulkDeleteProfiles(self, unique_identifiers: list):
+        query = "DELETE FROM profiles WHERE unique_identifier = ANY(%s) RETURNING unique_identifier"
+        columns, rows = await self.psql_database.executeRows(query, [unique_identifiers])
+        return [row[0] for row in rows]
+
+    async def bulkUpdateProfiles(self, profileUsers: list):
+        query = """
+            UPDATE profiles AS p
+            SET role_id = v.role_id,
+                email = v.email,
+                password = v.password,
+                firstname = v.firstname,
+                lastname = v.lastname,
+                status = v.status,
+                reference_id = v.reference_id,
+                signup_type = v.signup_type
+            FROM unnest(%s::varchar[], %s::integer[], %s::varchar[], %s::varchar[], %s::varchar[], %s::varchar[], %s::varchar[], %s::varchar[], %s::varchar[])
+                AS v(unique_identifier, role_id, email, password, firstname, lastname, status, reference_id, signup_type)
+            WHERE p.unique_identifier = v.unique_identifier
+            RETURNING p.unique_identifier
+        """
+        values = [
+            [profileUser.unique_identifier for profileUser in profileUsers],
+            [profileUser.role_id if profileUser.role_id != "" else None for profileUser in profileUsers],
+            [profileUser.email for profileUser in profileUsers],
+            [profileUser.password for profileUser in profileUsers],
+            [profileUser.firstname for profileUser in profileUsers],
+            [profileUser.lastname for profileUser in profileUsers],
+            [profileUser.status for profileUser in profileUsers],
+            [profileUser.reference_id for profileUser in profileUsers],
+            [profileUser.signup_type for profileUser in profileUsers]
+        ]
+        columns, rows = await self.psql_database.executeRows(query, values)
+        return [row[0] for row in rows]
+
+    def streamProfiles(self, format: str = "csv"):
+        return self.psql_database.copyTo(profileExportQuery(format))
+
+    ################################################ REGISTRATIONS ################################################
+
+    async def getRegistration(self, unique_identifier: str = None, email: str = None):
+        condition_field = "unique_identifier" if unique_identifier else "email"
+        query = f"SELECT * FROM registrations WHERE {condition_field} = %s"
+        return await self._fetchModel(registrations.User, query, [unique_identifier if unique_identifier else email])
+
+    async def getRegistrationsByIds(self, unique_identifiers: list, chunk_size: int = 1000):
+        query = "SELECT * FROM registrations WHERE unique_identifier = ANY(%s)"
+        return await self._fetchModelsByKeys(registrations.User, query, "unique_identifier", [str(unique_identifier) for unique_identifier in unique_identifiers], chunk_size)
+
+    async def getRegistrations(self):
+        query = "SELECT * FROM registrations"
+        return await self._fetchModels(registrations.User, query)
+
+    async def getInactiveRegistrations(self):
+        # This query includes a has_profile that checks if the registration has an associated profile
+        query = """
+            SELECT r.*,
+                p.unique_identifier IS NOT NULL AS has_profile
+            FROM registrations r
+            LEFT JOIN profiles p
+                ON p.unique_identifier = r.unique_identifier
+            WHERE r.status IN ('inactive', 'pending', 'revoked');
+        """
+        return await self._fetchModels(registrations.User, query)
+    
+    async def createRegistration(self, email: str, firstname: str, lastname: str, status: str, signup_type: str):
+        query = "INSERT INTO registrations (unique_identifier, email, firstname, lastname, status, signup_type, created_at) VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING *"
+        unique_identifier = str(uuid.uuid4())
+        created_at = datetime.now(pytz.timezone("America/New_York")).strftime("%Y-%m-%d %H:%M:%S")
+        return await self._fetchModel(registrations.User, query, [unique_identifier, email, firstname, lastname, status, signup_type, created_at])
+
+    async def updateRegistration(self, registrationUser: registrations.User):
+        query = """
+            UPDATE registrations 
+            SET email = %s,
+                firstname = %s,
+                lastname = %s,
+                status = %s,
+                reference_id = %s,
+                signup_type = %s
+            WHERE unique_identifier = %s
+            RETURNING *
+        """
+        values = [
+            registrationUser.email,
+            registrationUser.firstname,
+            registrationUser.lastname,
+            registrationUser.status,
+            registrationUser.reference_id,
+            registrationUser.signup_type,
+            registrationUser.unique_identifier
+        ]
+        
+        return await self._fetchModel(registrations.User, query, values)
+
+    async def deleteRegistration(self, registrationUser: registrations.User):
+        query = "DELETE FROM registrations WHERE unique_identifier = %s"
+        result = await self.psql_database.delete(query, [registrationUser.unique_identifier])
+        if result:
+            return True
+
+    async def bulkUpdateRegistrationStatus(self, unique_identifiers: list, status: str):
+        query = "UPDATE registrations SET status = %s WHERE unique_identifier = ANY(%s) RETURNING unique_identifier"
+        columns, rows = await self.psql_database.executeRows(query, [status, unique_identifiers])
+        return [row[0] for row in rows]
+
+    async def bulkDeleteRegistrations(self, unique_identifiers: list):
+        query = "DELETE FROM registrations WHERE unique_identifier = ANY(%s) RETURNING unique_identifier"
+        columns, rows = await self.psql_database.executeRows(query, [unique_identifiers])
+        return [row[0] for row in rows]
+
+    async def bulkUpdateRegistrations(self, registrationUsers: list):
+        query = """
+            UPDATE registrations AS r
+            SET email = v.email,
+                firstname = v.firstname,
+                lastname = v.lastname,
+                status = v.status,
+                reference_id = v.reference_id,
+                signup_type = v.signup_type
+            FROM unnest(%s::varchar[], %s::varchar[], %s::varchar[], %s::varchar[], %s::varchar[], %s::varchar[], %s::varchar[])
+                AS v(unique_identifier, email, firstname, lastname, status, reference_id, signup_type)
+            WHERE r.unique_identifier = v.unique_identifier
+            RETURNING r.unique_identifier
+        """
+        values = [
+            [registrationUser.unique_identifier for registrationUser in registrationUsers],
+            [registrationUser.email for registrationUser in registrationUsers],
+            [registrationUser.firstname for registrationUser in registrationUsers],
+            [registrationUser.lastname for registrationUser in registrationUsers],
+            [registrationUser.status for registrationUser in registrationUsers],
+            [registrationUser.reference_id for registrationUser in registrationUsers],
+            [registrationUser.signup_type for registrationUser in registrationUsers]
+        ]
+        columns, rows = await self.psql_database.executeRows(query, values)
+        return [row[0] for row in rows]
+
+    ################################################ ROLES ################################################
+
+    async def getRole(self, role_id: int = None, role_name: str = None):
+        # Served from the in-process role cache; the whole table is reloaded on a stale cache.
+        # Answers come from the reloaded rows, which the cache drops if an invalidation raced the load.
+        if not roleCache.cache.isFresh():
+            return roleCache.cache.find(await self.loadRoles(), role_id, role_name)
+        return roleCache.cache.get(role_id, role_name)
+
+    async def getRoles(self):
+        if not roleCache.cache.isFresh():
+            return sorted(await self.loadRoles(), key=lambda role: role.id)
+        return roleCache.cache.getAll()
+
+    async def loadRoles(self):
+        generation = roleCache.cache.beginLoad()
+        query = "SELECT * FROM roles"
+        allRoles = await self._fetchModels(roles.Role, query)
+        roleCache.cache.load(allRoles, generation)
+        return allRoles
+    
+    async def updateRole(self, role: roles.Role):
+        query = """
+            UPDATE roles 
+            SET name = %s
+            WHERE id = %s
+            RETURNING *
+        """
+        values = [
+            role.name,
+            role.id
+        ]
+        return await self._fetchModel(roles.Role, query, values)
+        
+    async def createRole(self, role_name: str):
+        query = "INSERT INTO roles (name) VALUES (%s) RETURNING *"
+        return await self._fetchModel(roles.Role, query, [role_name])
+        
+    async def deleteRole(self, role: roles.Role):
+        query = "DELETE FROM roles WHERE id = %s"
+        result = await self.psql_database.delete(query, [role.id])
+        if result:
+            return True
\ No newline at end of file
@@ -0,0 +1,74 @@
+# Custom imports
+from psql.config import Logging
+from psql.operations import asyncDatabase
+
+###################################################################### CHANGE LOG ######################################################################
+
+# change_log is written by notify_table_change_batch(): one row per change, numbered by seq,
+# with the same row shape that went out in the notification (see psql/scripts/01_init.sql)
+
+class Requests:
+    def __init__(self, psql_connection):
+
+        # Logger
+        self.logger = Logging.Logger(__name__).get()
+
+        # Initialize database connection
+        self.psql_database = asyncDatabase.main(psql_connection)
+
+    ################################################ GETTERS ################################################
+
+    async def getChangesSince(self, table: str, operations: list, after_seq: int, limit: int):
+        # [(seq, operation, row_text)] in seq order; row_text is the row JSON with its "_seq"
+        # Seqs are taken before commit, so a change below after_seq can commit after the client saw
+        # after_seq. Its transaction was still running when the last row at or below after_seq was
+        # written (txid >= that row's horizon), so those rows are sent again too; clients accept repeats.
+        query = """
+            WITH safe AS (
+                SELECT horizon FROM change_log WHERE seq <= %s ORDER BY seq DESC LIMIT 1
+            )
+            SELECT seq, operation, data::text FROM (
+                SELECT seq, operation, data
+                FROM change_log
+                WHERE table_name = %s AND operation = ANY(%s) AND seq > %s
+                UNION ALL
+                SELECT seq, operation, data
+                FROM change_log, safe
+                WHERE table_name = %s AND operation = ANY(%s) AND seq <= %s
+                    AND txid >= safe.horizon
+            ) changes
+            ORDER BY seq
+            LIMIT %s
+        """
+        selected = [table, list(operations), after_seq]
+        _, rows = await self.psql_database.executeRows(query, [after_seq, *selected, *selected, limit])
+        return rows
+
+    async def getOldestChangeSeq(self):
+        # First seq still in the log; once it is empty, the next seq that will be written
+        query = """
+            SELECT COALESCE(
+                (SELECT min(seq) FROM change_log),
+                (SELECT CASE WHEN is_called THEN last_value + 1 ELSE last_value END FROM change_log_seq_seq)
+            )
+        """
+        _, rows = await self.psql_database.executeRows(query)
+        return rows[0][0]
+
+    async def getLatestChangeSeq(self):
+        # Last seq handed out (0 before the first change)
+        query = "SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM change_log_seq_seq"
+        _, rows = await self.psql_database.executeRows(query)
+        return rows[0][0]
+
+    ################################################ PRUNING ################################################
+
+    async def pruneChangeLog(self, retention_seconds: float):
+        query = """
+            WITH pruned AS (
+                DELETE FROM change_log WHERE created_at < now() - make_interval(secs => %s) RETURNING 1
+            )
+            SELECT count(*) FROM pruned
+        """
+        _, rows = await self.psql_database.executeRows(query, [retention_seconds])
+        return rows[0][0]
@@ -5,8 +5,30 @@ import uuid
 
 # Custom imports
 from psql.config import Logging
-from psql.operations import database
+from psql.operations import database, copyStream
 from psql.models.auth import profiles, registrations, roles
+from psql.cache import profileCache, roleCache
+
+###################################################################### BULK IMPORT / EXPORT ######################################################################
+
+REGISTRATION_IMPORT_COLUMNS = ['email', 'firstname', 'lastname', 'status', 'signup_type']
+REGISTRATION_STATUSES = ('inactive', 'pending', 'active', 'revoked')
+PROFILE_EXPORT_COLUMNS = "id, unique_identifier, role_id, email, firstname, lastname, status, reference_id, signup_type, created_at"
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+
+def profileExportQuery(format: str = "csv"):
+    # The password column is never exported
+    if format == "csv":
+        return f"COPY (SELECT {PROFILE_EXPORT_COLUMNS} FROM profiles ORDER BY id) TO STDOUT WITH (FORMAT csv, HEADER true)"
+    if format == "ndjson":
+        # One JSON document per line; row_to_json escapes control characters, so using two of them
+        # as CSV quote/delimiter makes COPY emit the JSON text verbatim
+        return (
+            f"COPY (SELECT row_to_json(p) FROM (SELECT {PROFILE_EXPORT_COLUMNS} FROM profiles ORDER BY id) p) "
+            "TO STDOUT WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')"
+        )
+    raise ValueError(f"Unsupported export format: {format}")
 
 ###################################################################### AUTHENTICATION ######################################################################
 
@@ -19,51 +41,130 @@ class Requests:
         # Initialize database connection
         self.psql_database = database.main(psql_connection.conn)
 
+    ################################################ HELPERS ################################################
+
+    def _fetchModels(self, model_class, query: str, queryData: list = None):
+        columns, rows = self.psql_database.executeRows(query, queryData)
+        if not rows:
+            return []
+        build = model_class.rowFactory(columns)
+        return [build(row) for row in rows]
+
+    def _fetchModel(self, model_class, query: str, queryData: list = None):
+        models = self._fetchModels(model_class, query, queryData)
+        if models:
+            return models[0]
+
+    def _iterModels(self, model_class, query: str, queryData: list = None, batch_size: int = 1000):
+        for columns, rows in self.psql_database.iteratePages(query, queryData, batch_size=batch_size):
+            build = model_class.rowFactory(columns)
+            for row in rows:
+                yield build(row)
+
+    def _fetchModelsByKeys(self, model_class, query: str, key_field: str, keys: list, chunk_size: int = 1000):
+        # One "= ANY(%s)" query per chunk; every requested key is present in the result, None when missing
+        found = dict.fromkeys(keys)
+        pending = list(found)
+        for start in range(0, len(pending), chunk_size):
+            for model in self._fetchModels(model_class, query, [pending[start:start + chunk_size]]):
+                found[getattr(model, key_field)] = model
+        return found
+
+    def _fetchProfilesByKeys(self, key_field: str, keys: list, chunk_size: int = 1000):
+        found = {}
+        pending = []
+        for key in keys:
+            cached = profileCache.cache.get(**{key_field: key})
+            found[key] = cached
+            if cached is None:
+                pending.append(key)
+
+        if pending:
+            generation = profileCache.cache.beginLoad()
+            query = f"SELECT * FROM profiles WHERE {key_field} = ANY(%s)"
+            fetched = self._fetchModelsByKeys(profiles.User, query, key_field, pending, chunk_size)
+            for key, profileUser in fetched.items():
+                found[key] = profileUser
+                if profileUser is not None:
+                    profileCache.cache.put(profileUser, generation)
+        return found
+
 
 
     ################################################ PROFILES ################################################
 
     def getProfile(self, unique_identifier: str = None, email: str = None):
+        # Read-through: the in-process profile cache answers first
+        profileUser = profileCache.cache.get(unique_identifier, email)
+        if profileUser is not None:
+            return profileUser
+
+        generation = profileCache.cache.beginLoad()
         condition_field = "unique_identifier" if unique_identifier else "email"
         query = f"SELECT * FROM profiles WHERE {condition_field} = %s"
-        result = self.psql_database.selectOne(query, [str(unique_identifier) if unique_identifier else email])
-        if result:
-            profileUser = profiles.User(result)
-            return profileUser
+        profileUser = self._fetchModel(profiles.User, query, [str(unique_identifier) if unique_identifier else email])
+        if profileUser:
+            profileCache.cache.put(profileUser, generation)
+        return profileUser
+
+    def getProfileWithRole(self, unique_identifier: str = None, email: str = None):
+        # Profile plus its role name in one round trip (or none, when both caches can answer)
+        profileUser = profileCache.cache.get(unique_identifier, email)
+        if profileUser is not None and roleCache.cache.isFresh():
+            role = roleCache.cache.get(role_id=profileUser.role_id) if profileUser.role_id else None
+            return profileUser, role.name if role else None
+
+        generation = profileCache.cache.beginLoad()
+        condition_field = "unique_identifier" if unique_identifier else "email"
+        query = f"""
+            SELECT p.*, r.name AS role_name
+            FROM profiles p
+            LEFT JOIN roles r
+                ON r.id = p.role_id
+            WHERE p.{condition_field} = %s
+        """
+        columns, rows = self.psql_database.executeRows(query, [str(unique_identifier) if unique_identifier else email])
+        if not rows:
+            return None, None
+
+        profileUser = profiles.User.rowFactory(columns)(rows[0])
+        profileCache.cache.put(profileUser, generation)
+        return profileUser, rows[0][columns.index("role_name")]
+
+    def getProfilesByIds(self, unique_identifiers: list, chunk_size: int = 1000):
+        return self._fetchProfilesByKeys("unique_identifier", [str(unique_identifier) for unique_identifier in unique_identifiers], chunk_size)
+
+    def getProfilesByEmails(self, emails: list, chunk_size: int = 1000):
+        return self._fetchProfilesByKeys("email", list(emails), chunk_size)
 
     def getProfiles(self):
         query = "SELECT * FROM profiles"
-        results = self.psql_database.execute(query)
-        profileUsers = []
-        for result in results:
-            profileUser = profiles.User(result)
-            profileUsers.append(profileUser)
-        return profileUsers
+        return self._fetchModels(profiles.User, query)
     
     def getActiveProfiles(self):
         query = "SELECT * FROM profiles WHERE status NOT IN ('pending', 'deleted')"
-        results = self.psql_database.execute(query)
-        profileUsers = []
-        for result in results:
-            profileUser = profiles.User(result)
-            profileUsers.append(profileUser)
-        return profileUsers
+        return self._fetchModels(profiles.User, query)
     
     def getDeleteProfiles(self):
         query = "SELECT * FROM profiles WHERE status = 'deleted'"
-        results = self.psql_database.execute(query)
-        profileUsers = []
-        for result in results:
-            profileUser = profiles.User(result)
-            profileUsers.append(profileUser)
-        return profileUsers
+        return self._fetchModels(profiles.User, query)
+
+    def iterProfiles(self, batch_size: int = 1000):
+        query = "SELECT * FROM profiles WHERE id > %s ORDER BY id LIMIT %s"
+        yield from self._iterModels(profiles.User, query, batch_size=batch_size)
+
+    def iterActiveProfiles(self, batch_size: int = 1000):
+        query = "SELECT * FROM profiles WHERE status NOT IN ('pending', 'deleted') AND id > %s ORDER BY id LIMIT %s"
+        yield from self._iterModels(profiles.User, query, batch_size=batch_size)
+
+    def iterDeleteProfiles(self, batch_size: int = 1000):
+        query = "SELECT * FROM profiles WHERE status = 'deleted' AND id > %s ORDER BY id LIMIT %s"
+        yield from self._iterModels(profiles.User, query, batch_size=batch_size)
 
     def createProfile(self, unique_identifier: str, email: str, password: str, firstname: str, lastname: str, role_id: int, status: str, signup_type: str):
         query = "INSERT INTO profiles (unique_identifier, email, password, firstname, lastname, role_id, status, signup_type, created_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING *"
         created_at = datetime.now(pytz.timezone("America/New_York")).strftime("%Y-%m-%d %H:%M:%S")
-        result = self.psql_database.execute(query, [unique_identifier, email, password, firstname, lastname, role_id, status, signup_type, created_at])
-        if result:
-            return profiles.User(result[0])
+        return self._fetchModel(profiles.User, query, [unique_identifier, email, password, firstname, lastname, role_id, status, signup_type, created_at])
 
     def updateProfile(self, profileUser: profiles.User):
         query = """
@@ -91,9 +192,7 @@ class Requests:
             profileUser.unique_identifier
         ]
         
-        result = self.psql_database.execute(query, values)
-        if result:
-            return profiles.User(result[0])
+        return self._fetchModel(profiles.User, query, values)
 
     def deleteProfile(self, profileUser: profiles.User):
         query = "DELETE FROM profiles WHERE unique_identifier = %s"
@@ -101,25 +200,65 @@ class Requests:
         if result:
             return True
 
+    # Set-based variants: one statement (one transaction) however many rows, returning the affected ids
+
+    def bulkUpdateProfileStatus(self, unique_identifiers: list, status: str):
+        query = "UPDATE profiles SET status = %s WHERE unique_identifier = ANY(%s) RETURNING unique_identifier"
+        columns, rows = self.psql_database.executeRows(query, [status, unique_identifiers])
+        return [row[0] for row in rows]
+
+    def bulkDeleteProfiles(self, unique_identifiers: list):
+        query = "DELETE FROM profiles WHERE unique_identifier = ANY(%s) RETURNING unique_identifier"
+        columns, rows = self.psql_database.executeRows(query, [unique_identifiers])
+        return [row[0] for row in rows]
+
+    def bulkUpdateProfiles(self, profileUsers: list):
+        query = """
+            UPDATE profiles AS p
+            SET role_id = v.role_id,
+                email = v.email,
+                password = v.password,
+                firstname = v.firstname,
+                lastname = v.lastname,
+                status = v.status,
+                reference_id = v.reference_id,
+                signup_type = v.signup_type
+            FROM unnest(%s::varchar[], %s::integer[], %s::varchar[], %s::varchar[], %s::varchar[], %s::varchar[], %s::varchar[], %s::varchar[], %s::varchar[])
+                AS v(unique_identifier, role_id, email, password, firstname, lastname, status, reference_id, signup_type)
+            WHERE p.unique_identifier = v.unique_identifier
+            RETURNING p.unique_identifier
+        """
+        values = [
+            [profileUser.unique_identifier for profileUser in profileUsers],
+            [profileUser.role_id if profileUser.role_id != "" else None for profileUser in profileUsers],
+            [profileUser.email for profileUser in profileUsers],
+            [profileUser.password for profileUser in profileUsers],
+            [profileUser.firstname for profileUser in profileUsers],
+            [profileUser.lastname for profileUser in profileUsers],
+            [profileUser.status for profileUser in profileUsers],
+            [profileUser.reference_id for profileUser in profileUsers],
+            [profileUser.signup_type for profileUser in profileUsers]
+        ]
+        columns, rows = self.psql_database.executeRows(query, values)
+        return [row[0] for row in rows]
+
+    def exportProfiles(self, stream, format: str = "csv"):
+        self.psql_database.copyTo(profileExportQuery(format), stream)
+
     ################################################ REGISTRATIONS ################################################
 
     def getRegistration(self, unique_identifier: str = None, email: str = None):
         condition_field = "unique_identifier" if unique_identifier else "email"
         query = f"SELECT * FROM registrations WHERE {condition_field} = %s"
-        result = self.psql_database.selectOne(query, [unique_identifier if unique_identifier else email])
+        return self._fetchModel(registrations.User, query, [unique_identifier if unique_identifier else email])
 
-        if result:
-            registrationUser = registrations.User(result)
-            return registrationUser
+    def getRegistrationsByIds(self, unique_identifiers: list, chunk_size: int = 1000):
+        query = "SELECT * FROM registrations WHERE unique_identifier = ANY(%s)"
+        return self._fetchModelsByKeys(registrations.User, query, "unique_identifier", [str(unique_identifier) for unique_identifier in unique_identifiers], chunk_size)
 
     def getRegistrations(self):
         query = "SELECT * FROM registrations"
-        results = self.psql_database.execute(query)
-        registrationUsers = []
-        for result in results:
-            registrationUser = registrations.User(result)
-            registrationUsers.append(registrationUser)
-        return registrationUsers
+        return self._fetchModels(registrations.User, query)
 
     def getInactiveRegistrations(self):
         # This query includes a has_profile that checks if the registration has an associated profile
@@ -131,20 +270,103 @@ class Requests:
                 ON p.unique_identifier = r.unique_identifier
             WHERE r.status IN ('inactive', 'pending', 'revoked');
         """
-        results = self.psql_database.execute(query)
-        registrationUsers = []
-        for result in results:
-            registrationUser = registrations.User(result)
-            registrationUsers.append(registrationUser)
-        return registrationUsers
+        return self._fetchModels(registrations.User, query)
     
+    def iterRegistrations(self, batch_size: int = 1000):
+        query = "SELECT * FROM registrations WHERE id > %s ORDER BY id LIMIT %s"
+        yield from self._iterModels(registrations.User, query, batch_size=batch_size)
+
+    def iterInactiveRegistrations(self, batch_size: int = 1000):
+        query = """
+            SELECT r.*,
+                p.unique_identifier IS NOT NULL AS has_profile
+            FROM registrations r
+            LEFT JOIN profiles p
+                ON p.unique_identifier = r.unique_identifier
+            WHERE r.status IN ('inactive', 'pending', 'revoked')
+                AND r.id > %s
+            ORDER BY r.id
+            LIMIT %s
+        """
+        yield from self._iterModels(registrations.User, query, batch_size=batch_size)
+
     def createRegistration(self, email: str, firstname: str, lastname: str, status: str, signup_type: str):
         query = "INSERT INTO registrations (unique_identifier, email, firstname, lastname, status, signup_type, created_at) VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING *"
         unique_identifier = str(uuid.uuid4())
         created_at = datetime.now(pytz.timezone("America/New_York")).strftime("%Y-%m-%d %H:%M:%S")
-        result = self.psql_database.execute(query, [unique_identifier, email, firstname, lastname, status, signup_type, created_at])
-        if result:
-            return registrations.User(result[0])
+        return self._fetchModel(registrations.User, query, [unique_identifier, email, firstname, lastname, status, signup_type, created_at])
+
+    def importRegistrations(self, source, status: str = "inactive", signup_type: str = "custom"):
+        # source: a CSV file (text or binary) whose header names the columns, or an iterable of dicts/sequences
+        # in REGISTRATION_IMPORT_COLUMNS order. Rows are COPYed into a temporary staging table, validated,
+        # de-duplicated (within the batch and against existing emails) and inserted with one statement.
+        if hasattr(source, "read"):
+            header = source.readline()
+            if isinstance(header, bytes):
+                header = header.decode("utf-8")
+            columns = [column.strip().lower() for column in header.strip().split(",")]
+            unknown = [column for column in columns if column not in REGISTRATION_IMPORT_COLUMNS]
+            if unknown or "email" not in columns:
+                raise ValueError(f"Invalid import header: {header.strip()}")
+            stream = source
+        else:
+            columns = REGISTRATION_IMPORT_COLUMNS
+            stream = copyStream.RowStream(source, columns)
+
+        with self.psql_database.transaction() as cursor:
+            cursor.execute("""
+                CREATE TEMP TABLE registrations_import (
+                    email TEXT,
+                    firstname TEXT,
+                    lastname TEXT,
+                    status TEXT,
+                    signup_type TEXT
+                ) ON COMMIT DROP
+            """)
+            cursor.copy_expert(f"COPY registrations_import ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", stream)
+
+            cursor.execute("SELECT count(*) FROM registrations_import")
+            received = cursor.fetchone()[0]
+
+            cursor.execute("""
+                WITH cleaned AS (
+                    SELECT lower(btrim(email)) AS email,
+                        NULLIF(btrim(firstname), '') AS firstname,
+                        NULLIF(btrim(lastname), '') AS lastname,
+                        COALESCE(NULLIF(lower(btrim(status)), ''), %s) AS status,
+                        COALESCE(NULLIF(lower(btrim(signup_type)), ''), %s) AS signup_type
+                    FROM registrations_import
+                ),
+                checked AS (
+                    SELECT *,
+                        email ~ '^[^@[:space:]]+@[^@[:space:]]+[.][^@[:space:]]+$'
+                            AND length(email) <= 255
+                            AND coalesce(length(firstname), 0) <= 100
+                            AND coalesce(length(lastname), 0) <= 100
+                            AND status = ANY(%s)
+                            AND length(signup_type) <= 50 AS is_valid
+                    FROM cleaned
+                ),
+                inserted AS (
+                    INSERT INTO registrations (unique_identifier, email, firstname, lastname, status, signup_type, created_at)
+                    SELECT DISTINCT ON (email) gen_random_uuid()::text, email, firstname, lastname, status, signup_type, now() AT TIME ZONE 'America/New_York'
+                    FROM checked
+                    WHERE is_valid
+                    ORDER BY email
+                    ON CONFLICT (email) DO NOTHING
+                    RETURNING 1
+                )
+                SELECT (SELECT count(*) FROM checked WHERE is_valid IS TRUE),
+                    (SELECT count(*) FROM inserted)
+            """, [status, signup_type, list(REGISTRATION_STATUSES)])
+            valid, inserted = cursor.fetchone()
+
+        return {
+            'received': received,
+            'invalid': received - valid,
+            'duplicates': valid - inserted,
+            'inserted': inserted
+        }
 
     def updateRegistration(self, registrationUser: registrations.User):
         query = """
@@ -168,9 +390,7 @@ class Requests:
             registrationUser.unique_identifier
         ]
         
-        result = self.psql_database.execute(query, values)
-        if result:
-            return registrations.User(result[0])
+        return self._fetchModel(registrations.User, query, values)
 
     def deleteRegistration(self, registrationUser: registrations.User):
         query = "DELETE FROM registrations WHERE unique_identifier = %s"
@@ -178,24 +398,61 @@ class Requests:
         if result:
             return True
 
+    def bulkUpdateRegistrationStatus(self, unique_identifiers: list, status: str):
+        query = "UPDATE registrations SET status = %s WHERE unique_identifier = ANY(%s) RETURNING unique_identifier"
+        columns, rows = self.psql_database.executeRows(query, [status, unique_identifiers])
+        return [row[0] for row in rows]
+
+    def bulkDeleteRegistrations(self, unique_identifiers: list):
+        query = "DELETE FROM registrations WHERE unique_identifier = ANY(%s) RETURNING unique_identifier"
+        columns, rows = self.psql_database.executeRows(query, [unique_identifiers])
+        return [row[0] for row in rows]
+
+    def bulkUpdateRegistrations(self, registrationUsers: list):
+        query = """
+            UPDATE registrations AS r
+            SET email = v.email,
+                firstname = v.firstname,
+                lastname = v.lastname,
+                status = v.status,
+                reference_id = v.reference_id,
+                signup_type = v.signup_type
+            FROM unnest(%s::varchar[], %s::varchar[], %s::varchar[], %s::varchar[], %s::varchar[], %s::varchar[], %s::varchar[])
+                AS v(unique_identifier, email, firstname, lastname, status, reference_id, signup_type)
+            WHERE r.unique_identifier = v.unique_identifier
+            RETURNING r.unique_identifier
+        """
+        values = [
+            [registrationUser.unique_identifier for registrationUser in registrationUsers],
+            [registrationUser.email for registrationUser in registrationUsers],
+            [registrationUser.firstname for registrationUser in registrationUsers],
+            [registrationUser.lastname for registrationUser in registrationUsers],
+            [registrationUser.status for registrationUser in registrationUsers],
+            [registrationUser.reference_id for registrationUser in registrationUsers],
+            [registrationUser.signup_type for registrationUser in registrationUsers]
+        ]
+        columns, rows = self.psql_database.executeRows(query, values)
+        return [row[0] for row in rows]
+
     ################################################ ROLES ################################################
 
     def getRole(self, role_id: int = None, role_name: str = None):
-        condition_field = "id" if role_id else "name"
-        query = f"SELECT * FROM roles WHERE {condition_field} = %s"
-        result = self.psql_database.selectOne(query, [role_id if role_id else role_name])
-
-        if result:
-            role = roles.Role(result)
-            return role
+        # Served from the in-process role cache; the whole table is reloaded on a stale cache.
+        # Answers come from the reloaded rows, which the cache drops if an invalidation raced the load.
+        if not roleCache.cache.isFresh():
+            return roleCache.cache.find(self.loadRoles(), role_id, role_name)
+        return roleCache.cache.get(role_id, role_name)
 
     def getRoles(self):
+        if not roleCache.cache.isFresh():
+            return sorted(self.loadRoles(), key=lambda role: role.id)
+        return roleCache.cache.getAll()
+
+    def loadRoles(self):
+        generation = roleCache.cache.beginLoad()
         query = "SELECT * FROM roles"
-        results = self.psql_database.execute(query)
-        allRoles = []
-        for result in results:
-            role = roles.Role(result)
-            allRoles.append(role)
+        allRoles = self._fetchModels(roles.Role, query)
+        roleCache.cache.load(allRoles, generation)
         return allRoles
     
     def updateRole(self, role: roles.Role):
@@ -209,15 +466,11 @@ class Requests:
             role.name,
             role.id
         ]
-        result = self.psql_database.execute(query, values)
-        if result:
-            return roles.Role(result[0])
+        return self._fetchModel(roles.Role, query, values)
         
     def createRole(self, role_name: str):
         query = "INSERT INTO roles (name) VALUES (%s) RETURNING *"
-        result = self.psql_database.execute(query, [role_name])
-        if result:
-            return roles.Role(result[0])
+        return self._fetchModel(roles.Role, query, [role_name])
         
     def deleteRole(self, role: roles.Role):
         query = "DELETE FROM roles WHERE id = %s"
@@ -0,0 +1,56 @@
+# Custom imports
+from psql.config import Logging
+from psql.operations import database
+
+###################################################################### SESSIONS ######################################################################
+
+# Django sessions (backend/core/sessions.py) in the project database instead of db.sqlite3.
+# session_data is Django's signed encoding; expired rows are ignored and removed by deleteExpiredSessions.
+
+class Requests:
+    def __init__(self, psql_connection):
+
+        # Logger
+        self.logger = Logging.Logger(__name__).get()
+
+        # Initialize database connection
+        self.psql_database = database.main(psql_connection.conn)
+
+    ################################################ GETTERS ################################################
+
+    def getSession(self, session_key: str):
+        # (session_data, expire_date), or None when missing or expired
+        query = "SELECT session_data, expire_date FROM sessions WHERE session_key = %s AND expire_date > now()"
+        _, rows = self.psql_database.executeRows(query, [session_key])
+        return rows[0] if rows else None
+
+    def sessionExists(self, session_key: str):
+        query = "SELECT 1 FROM sessions WHERE session_key = %s AND expire_date > now()"
+        _, rows = self.psql_database.executeRows(query, [session_key])
+        return bool(rows)
+
+    ################################################ FUNCTIONS ################################################
+
+    def createSession(self, session_key: str, session_data: str, expire_date):
+        # False when the key is already taken
+        query = """
+            INSERT INTO sessions (session_key, session_data, expire_date) VALUES (%s, %s, %s)
+            ON CONFLICT (session_key) DO NOTHING
+            RETURNING 1
+        """
+        _, rows = self.psql_database.executeRows(query, [session_key, session_data, expire_date])
+        return bool(rows)
+
+    def updateSession(self, session_key: str, session_data: str, expire_date):
+        # False when the session no longer exists (deleted by a concurrent request)
+        query = "UPDATE sessions SET session_data = %s, expire_date = %s WHERE session_key = %s RETURNING 1"
+        _, rows = self.psql_database.executeRows(query, [session_data, expire_date, session_key])
+        return bool(rows)
+
+    def deleteSession(self, session_key: str):
+        self.psql_database.executeRows("DELETE FROM sessions WHERE session_key = %s", [session_key])
+
+    def deleteExpiredSessions(self):
+        query = "WITH expired AS (DELETE FROM sessions WHERE expire_date <= now() RETURNING 1) SELECT count(*) FROM expired"
+        _, rows = self.psql_database.executeRows(query)
+        return rows[0][0]
@@ -3,56 +3,176 @@
 -- Run this script to add triggers to existing database
 -- ============================================
 
--- Function to send notifications on table changes
-CREATE OR REPLACE FUNCTION notify_table_change()
+-- Durable log of every change sent, so clients can catch up after a disconnect (resume_from)
+CREATE TABLE IF NOT EXISTS change_log (
+    seq BIGSERIAL PRIMARY KEY,
+    table_name VARCHAR(63) NOT NULL,
+    operation VARCHAR(6) NOT NULL,
+    data JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    -- Writing transaction, and the oldest transaction still running when the row was written:
+    -- a change numbered below seq can only commit after this one if its txid >= horizon
+    txid XID8 NOT NULL DEFAULT pg_current_xact_id(),
+    horizon XID8 NOT NULL DEFAULT pg_snapshot_xmin(pg_current_snapshot())
+);
+
+CREATE INDEX IF NOT EXISTS change_log_table_seq_idx ON change_log (table_name, seq);
+CREATE INDEX IF NOT EXISTS change_log_created_idx ON change_log (created_at);
+
+-- change_log from before txid/horizon: existing rows get this transaction's ids
+ALTER TABLE change_log ADD COLUMN IF NOT EXISTS txid XID8 NOT NULL DEFAULT pg_current_xact_id();
+ALTER TABLE change_log ADD COLUMN IF NOT EXISTS horizon XID8 NOT NULL DEFAULT pg_snapshot_xmin(pg_current_snapshot());
+CREATE INDEX IF NOT EXISTS change_log_txid_idx ON change_log (txid);
+
+-- Function to send notifications on table changes.
+-- Runs once per statement: the changed rows come from the statement's transition tables and
+-- go out as a few batched notifications instead of one per row, each below the 8000 byte
+-- NOTIFY limit. Trigger arguments:
+--   TG_ARGV[0]  comma separated key columns, always sent along with id
+--   TG_ARGV[1]  comma separated columns never sent (sensitive or large)
+-- Row shapes in "data":
+--   INSERT / DELETE  the whole row minus the excluded columns
+--   UPDATE           key columns plus the columns whose value changed; rows that did not change are skipped,
+--                    rows where only excluded columns changed carry "_excluded": true and nothing else
+--   any              key columns plus "_refetch": true when the row alone would not fit in a payload
+-- Every row is also written to change_log, in one INSERT per statement, and carries its sequence
+-- number as "_seq". Numbers are taken before commit, so transactions can commit out of seq order;
+-- txid and horizon let a resuming client be sent those too (psql/requests/asyncPsqlChangesReq.py).
+CREATE OR REPLACE FUNCTION notify_table_change_batch()
 RETURNS TRIGGER AS $$
 DECLARE
-    payload JSON;
-    record_data JSON;
+    max_bytes CONSTANT INTEGER := 7500;
+    key_columns TEXT[] := array_append(string_to_array(COALESCE(TG_ARGV[0], ''), ','), 'id');
+    excluded_columns TEXT[] := string_to_array(COALESCE(TG_ARGV[1], ''), ',');
+    query TEXT;
+    header TEXT;
+    chunk TEXT := '';
+    record_text TEXT;
 BEGIN
-    -- Build the record data based on operation type
+    header := '{"table":' || to_json(TG_TABLE_NAME)::text
+        || ',"operation":' || to_json(TG_OP)::text
+        || ',"batch":true,"data":[';
+
+    -- Dynamic SQL: each trigger only has the transition tables of its own event
     IF TG_OP = 'DELETE' THEN
-        record_data := row_to_json(OLD);
+        query := 'SELECT to_jsonb(old_row) - $2 AS data FROM old_rows old_row';
+    ELSIF TG_OP = 'INSERT' THEN
+        query := 'SELECT to_jsonb(new_row) - $2 AS data FROM new_rows new_row';
     ELSE
-        record_data := row_to_json(NEW);
+        query := 'SELECT ('
+            || '  SELECT jsonb_object_agg(changed.key, changed.value)'
+            || '  FROM jsonb_each(to_jsonb(new_row)) changed'
+            || '  WHERE changed.key = ANY($1)'
+            || '     OR (NOT changed.key = ANY($2) AND changed.value IS DISTINCT FROM to_jsonb(old_row) -> changed.key)'
+            || ') || CASE WHEN to_jsonb(new_row) - $2 = to_jsonb(old_row) - $2'
+            || '     THEN ''{"_excluded": true}''::jsonb ELSE ''{}''::jsonb END AS data'
+            || ' FROM new_rows new_row JOIN old_rows old_row ON old_row.id = new_row.id'
+            || ' WHERE new_row IS DISTINCT FROM old_row';
     END IF;
-    
-    -- Build the notification payload
-    payload := json_build_object(
-        'table', TG_TABLE_NAME,
-        'operation', TG_OP,
-        'data', record_data
-    );
-    
-    -- Send the notification
-    PERFORM pg_notify('db_changes', payload::text);
-    
-    -- Return appropriate record
-    IF TG_OP = 'DELETE' THEN
-        RETURN OLD;
-    ELSE
-        RETURN NEW;
+
+    -- Rows too large to send are reduced to their keys (clients fetch them themselves), numbered,
+    -- and logged in one INSERT; what it returns is exactly what goes out
+    query := 'WITH changed AS (' || query || '),'
+        || ' fitted AS ('
+        || '  SELECT CASE WHEN octet_length(data::text) > $3 THEN ('
+        || '    SELECT jsonb_object_agg(kept.key, kept.value) FROM jsonb_each(data) kept WHERE kept.key = ANY($1)'
+        || '  ) || ''{"_refetch": true}''::jsonb ELSE data END AS data'
+        || '  FROM changed'
+        || ' ),'
+        || ' numbered AS (SELECT nextval(''change_log_seq_seq'') AS seq, data FROM fitted)'
+        || ' INSERT INTO change_log (seq, table_name, operation, data, txid, horizon)'
+        || ' SELECT seq, $4, $5, data || jsonb_build_object(''_seq'', seq), $6, $7 FROM numbered'
+        || ' RETURNING data::text';
+
+    FOR record_text IN EXECUTE query USING
+        key_columns, excluded_columns, max_bytes - octet_length(header) - 2, TG_TABLE_NAME, TG_OP,
+        pg_current_xact_id(), pg_snapshot_xmin(pg_current_snapshot())
+    LOOP
+        -- Flush the current chunk when this row would push it over the limit
+        IF chunk <> '' AND octet_length(header) + octet_length(chunk) + octet_length(record_text) + 3 > max_bytes THEN
+            PERFORM pg_notify('db_changes', header || chunk || ']}');
+            chunk := '';
+        END IF;
+
+        IF chunk = '' THEN
+            chunk := record_text;
+        ELSE
+            chunk := chunk || ',' || record_text;
+        END IF;
+    END LOOP;
+
+    IF chunk <> '' THEN
+        PERFORM pg_notify('db_changes', header || chunk || ']}');
     END IF;
+
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
--- Create triggers for profiles table
+-- Row-level triggers from earlier versions of this script
 DROP TRIGGER IF EXISTS profiles_notify_trigger ON profiles;
-CREATE TRIGGER profiles_notify_trigger
-    AFTER INSERT OR UPDATE OR DELETE ON profiles
-    FOR EACH ROW EXECUTE FUNCTION notify_table_change();
-
--- Create triggers for registrations table  
 DROP TRIGGER IF EXISTS registrations_notify_trigger ON registrations;
-CREATE TRIGGER registrations_notify_trigger
-    AFTER INSERT OR UPDATE OR DELETE ON registrations
-    FOR EACH ROW EXECUTE FUNCTION notify_table_change();
+DROP TRIGGER IF EXISTS roles_notify_trigger ON roles;
+DROP FUNCTION IF EXISTS notify_table_change();
+
+-- Transition tables allow a single event per trigger, hence three triggers per table
+
+-- Create triggers for profiles table
+DROP TRIGGER IF EXISTS profiles_insert_notify_trigger ON profiles;
+CREATE TRIGGER profiles_insert_notify_trigger
+    AFTER INSERT ON profiles
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change_batch('unique_identifier,email', 'password');
+
+DROP TRIGGER IF EXISTS profiles_update_notify_trigger ON profiles;
+CREATE TRIGGER profiles_update_notify_trigger
+    AFTER UPDATE ON profiles
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change_batch('unique_identifier,email', 'password');
+
+DROP TRIGGER IF EXISTS profiles_delete_notify_trigger ON profiles;
+CREATE TRIGGER profiles_delete_notify_trigger
+    AFTER DELETE ON profiles
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change_batch('unique_identifier,email', 'password');
+
+-- Create triggers for registrations table
+DROP TRIGGER IF EXISTS registrations_insert_notify_trigger ON registrations;
+CREATE TRIGGER registrations_insert_notify_trigger
+    AFTER INSERT ON registrations
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change_batch('unique_identifier,email');
+
+DROP TRIGGER IF EXISTS registrations_update_notify_trigger ON registrations;
+CREATE TRIGGER registrations_update_notify_trigger
+    AFTER UPDATE ON registrations
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change_batch('unique_identifier,email');
+
+DROP TRIGGER IF EXISTS registrations_delete_notify_trigger ON registrations;
+CREATE TRIGGER registrations_delete_notify_trigger
+    AFTER DELETE ON registrations
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change_batch('unique_identifier,email');
 
 -- Create triggers for roles table
-DROP TRIGGER IF EXISTS roles_notify_trigger ON roles;
-CREATE TRIGGER roles_notify_trigger
-    AFTER INSERT OR UPDATE OR DELETE ON roles
-    FOR EACH ROW EXECUTE FUNCTION notify_table_change();
+DROP TRIGGER IF EXISTS roles_insert_notify_trigger ON roles;
+CREATE TRIGGER roles_insert_notify_trigger
+    AFTER INSERT ON roles
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change_batch('name');
+
+DROP TRIGGER IF EXISTS roles_update_notify_trigger ON roles;
+CREATE TRIGGER roles_update_notify_trigger
+    AFTER UPDATE ON roles
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change_batch('name');
+
+DROP TRIGGER IF EXISTS roles_delete_notify_trigger ON roles;
+CREATE TRIGGER roles_delete_notify_trigger
+    AFTER DELETE ON roles
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change_batch('name');
 
 -- Verify triggers were created
 SELECT 
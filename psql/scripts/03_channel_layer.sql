@@ -0,0 +1,23 @@
+-- ============================================
+-- CHANNEL LAYER (backend/core/layers.py)
+-- Shared group membership and message bodies too large for a NOTIFY payload
+-- Run this script to add the tables to an existing database
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS channels_group (
+    group_name VARCHAR(100) NOT NULL,
+    channel VARCHAR(100) NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (group_name, channel)
+);
+
+CREATE TABLE IF NOT EXISTS channels_message (
+    id BIGSERIAL PRIMARY KEY,
+    channel VARCHAR(100) NOT NULL,
+    message TEXT NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS channels_message_channel_idx ON channels_message (channel, id);
+CREATE INDEX IF NOT EXISTS channels_message_expires_idx ON channels_message (expires_at);
+CREATE INDEX IF NOT EXISTS channels_group_expires_idx ON channels_group (expires_at);
@@ -0,0 +1,13 @@
+-- ============================================
+-- SESSIONS (backend/core/sessions.py)
+-- Django sessions for SESSION_ENGINE=core.sessions
+-- Run this script to add the table to an existing database
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS sessions (
+    session_key VARCHAR(40) PRIMARY KEY,
+    session_data TEXT NOT NULL,
+    expire_date TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS sessions_expire_idx ON sessions (expire_date);